@@ -10,6 +10,7 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 import os
 from dotenv import load_dotenv
@@ -20,7 +21,11 @@ from src.api.routes import auth, personas, knowledge_base, content_generation, h
 # Importar configurações e utilitários
 from src.core.config import settings
 from src.core.database import init_db
-from src.services.vector_store import init_vector_store
+from src.services.vector_store import init_vector_store, close_vector_store
+from src.services.http_clients import init_http_clients, close_http_clients
+from src.services.job_queue import job_queue
+from src.services.ai_service import ai_service
+from src.services.usage_tracker import usage_tracker
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -28,6 +33,7 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerencia o ciclo de vida da aplicação"""
+    warmup_task = None
     try:
         # Inicializar banco de dados
         print("🔧 Inicializando banco de dados...")
@@ -37,6 +43,18 @@ async def lifespan(app: FastAPI):
         print("🧠 Inicializando banco vetorial...")
         await init_vector_store()
 
+        # Inicializar clientes HTTP compartilhados (pool de conexões)
+        print("🔌 Inicializando clientes HTTP...")
+        await init_http_clients()
+
+        # Iniciar workers de geração (retoma jobs interrompidos)
+        print("👷 Iniciando workers de geração...")
+        await job_queue.start()
+
+        # Aquecer modelos locais em segundo plano (não atrasa o startup)
+        print("🔥 Aquecendo providers de IA...")
+        warmup_task = asyncio.create_task(ai_service.warm_up())
+
         print("✅ Aplicação inicializada com sucesso!")
         yield
     except Exception as e:
@@ -44,6 +62,14 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         print("🔄 Finalizando aplicação...")
+        if warmup_task is not None and not warmup_task.done():
+            warmup_task.cancel()
+        await job_queue.stop()
+        # Gravar o uso ainda na fila antes de encerrar
+        await usage_tracker.flush()
+        usage_tracker.shutdown()
+        await close_http_clients()
+        close_vector_store()
 
 # Criar aplicação FastAPI
 app = FastAPI(
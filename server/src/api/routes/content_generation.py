@@ -3,18 +3,32 @@ Rotas para geração de conteúdo usando IA.
 Endpoints principais para criar legendas, hashtags e ideias de posts.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
+import json
 import logging
+import math
 from datetime import datetime
 
+from ...core.config import settings
 from ...core.database import get_db
+from ...core.timing import RequestTimer, activate_timer, stage_timer, start_request_timer
 from ...models.user import User
 from ...models.persona import Persona
+from ...models.generation_job import GenerationJob
+from ...models.generation_history import GenerationRecord
+from ...services.admission import RateLimitExceededError, admission, set_current_client
 from ...services.ai_service import ai_service
+from ...services.hashtag_engine import MIX_STRATEGIES, hashtag_engine
+from ...services.persona_context import persona_context_cache
+from ...services.provider_router import ProviderUnavailableError
+from ...services.refine_sessions import refine_sessions
+from ...services.usage_tracker import GENERATION_TYPES, usage_tracker
 from ...services.image_service import image_service
-from ...services.vector_store import vector_store
+from ...services.job_queue import JobQueueUnavailableError, job_queue
+from ...services.vector_store import vector_store, RETRIEVAL_MODES
 from ..routes.auth import get_current_user
 
 router = APIRouter()
@@ -41,7 +55,15 @@ def get_user_persona(db: Session, persona_id: int, user_id: int) -> Persona:
     return persona
 
 def prepare_persona_data_for_ai(persona: Persona) -> Dict[str, Any]:
-    """Prepara dados da persona para envio ao serviço de IA"""
+    """Prepara dados da persona para envio ao serviço de IA (em cache por versão da persona)"""
+    return persona_context_cache.get_persona_data(
+        persona.id,
+        persona.updated_at.isoformat() if persona.updated_at else None,
+        lambda: build_persona_data_for_ai(persona)
+    )
+
+def build_persona_data_for_ai(persona: Persona) -> Dict[str, Any]:
+    """Monta o dicionário da persona a partir das colunas do modelo"""
     return {
         'id': persona.id,
         'name': persona.name,
@@ -50,9 +72,432 @@ def prepare_persona_data_for_ai(persona: Persona) -> Dict[str, Any]:
         'target_audience': persona.target_audience or {},
         'visual_guidelines': persona.visual_guidelines or {},
         'content_guidelines': persona.content_guidelines or {},
-        'instagram_settings': persona.instagram_settings or {}
+        'instagram_settings': persona.instagram_settings or {},
+        # Versão da persona (usada para invalidar caches de geração)
+        'updated_at': persona.updated_at.isoformat() if persona.updated_at else None
     }
 
+VALID_CONTENT_TYPES = ['posts', 'stories', 'reels', 'igtv', 'carrossel']
+
+# Cabeçalhos para Server-Sent Events (evita buffering em proxies como nginx)
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+def admit_generation(user: User, route: str, cost: int = 1):
+    """
+    Controle de admissão: consome tokens do bucket do usuário e o registra
+    como cliente da fila justa dos providers (429 com Retry-After se esgotado)
+    """
+    try:
+        admission.admit(user.id, cost, route)
+    except RateLimitExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Limite de gerações atingido. Tente novamente em instantes.",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+
+def parse_caption_request(generation_request: dict) -> Dict[str, Any]:
+    """Valida e normaliza o corpo de uma solicitação de legenda"""
+    persona_id = generation_request.get('persona_id')
+    topic = generation_request.get('topic')
+
+    if not persona_id or not topic:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="persona_id e topic são obrigatórios"
+        )
+
+    # Parâmetros opcionais
+    style = generation_request.get('style', 'engajamento')
+    include_hashtags = generation_request.get('include_hashtags', True)
+    additional_context = generation_request.get('additional_context', '')
+
+    # Enriquecer tópico com contexto adicional
+    enriched_topic = topic
+    if additional_context:
+        enriched_topic = f"{topic}. Contexto adicional: {additional_context}"
+
+    return {
+        'persona_id': persona_id,
+        'topic': topic,
+        'enriched_topic': enriched_topic,
+        'style': style,
+        'include_hashtags': include_hashtags,
+        'use_cache': generation_request.get('use_cache', True),
+        'include_timings': bool(generation_request.get('include_timings', False))
+    }
+
+def parse_ideas_request(generation_request: dict) -> Dict[str, Any]:
+    """Valida e normaliza o corpo de uma solicitação de ideias"""
+    persona_id = generation_request.get('persona_id')
+
+    if not persona_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="persona_id é obrigatório"
+        )
+
+    # Parâmetros
+    content_type = generation_request.get('content_type', 'posts')
+    count = min(generation_request.get('count', 5), 10)  # Máximo 10 ideias
+    focus_area = generation_request.get('focus_area', '')
+
+    # Validar tipo de conteúdo
+    if content_type not in VALID_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tipo de conteúdo inválido. Tipos válidos: {', '.join(VALID_CONTENT_TYPES)}"
+        )
+
+    return {
+        'persona_id': persona_id,
+        'content_type': content_type,
+        'count': count,
+        'focus_area': focus_area,
+        'include_timings': bool(generation_request.get('include_timings', False))
+    }
+
+def attach_timings(
+    result: Dict[str, Any],
+    timer: RequestTimer,
+    include_timings: bool,
+    response: Optional[Response] = None
+) -> Dict[str, Any]:
+    """
+    Encerra a cronometragem da requisição e expõe as durações por etapa:
+    bloco timings no corpo (se pedido) e cabeçalho Server-Timing
+    """
+    timer.finish()
+    if include_timings:
+        result['timings'] = timer.to_dict()
+    if response is not None and settings.SERVER_TIMING_ENABLED:
+        response.headers['Server-Timing'] = timer.server_timing()
+    return result
+
+def parse_retrieval_mode(value: Any, field: str = "mode") -> str:
+    """Modo de recuperação do RAG ("hybrid" ou "vector"; padrão: RETRIEVAL_MODE)"""
+    mode = str(value or settings.RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{field} deve ser um de: {', '.join(RETRIEVAL_MODES)}"
+        )
+    return mode
+
+def parse_batch_request(generation_request: dict) -> Dict[str, Any]:
+    """Valida e normaliza o corpo de uma solicitação de legendas em lote"""
+    persona_id = generation_request.get('persona_id')
+    raw_items = generation_request.get('items') or []
+
+    if not persona_id or not isinstance(raw_items, list) or not raw_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="persona_id e items são obrigatórios"
+        )
+
+    if len(raw_items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.BATCH_MAX_ITEMS} itens por lote"
+        )
+
+    # Valores padrão aplicados a cada item
+    defaults = {
+        'style': generation_request.get('style', 'engajamento'),
+        'include_hashtags': generation_request.get('include_hashtags', True),
+        'use_cache': generation_request.get('use_cache', True)
+    }
+
+    items = []
+    for raw_item in raw_items:
+        item = {'topic': raw_item} if isinstance(raw_item, str) else dict(raw_item or {})
+        params = parse_caption_request({**defaults, **item, 'persona_id': persona_id})
+        items.append({
+            'topic': params['enriched_topic'],
+            'original_topic': params['topic'],
+            'style': params['style'],
+            'include_hashtags': params['include_hashtags'],
+            'use_cache': params['use_cache']
+        })
+
+    max_concurrency = generation_request.get('max_concurrency')
+    if max_concurrency is None:
+        max_concurrency = settings.BATCH_MAX_CONCURRENCY
+    elif isinstance(max_concurrency, bool) or not isinstance(max_concurrency, int) or max_concurrency < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="max_concurrency deve ser um inteiro maior ou igual a 1"
+        )
+
+    return {
+        'persona_id': persona_id,
+        'items': items,
+        'max_concurrency': min(max_concurrency, settings.BATCH_MAX_CONCURRENCY),
+        'retrieval_mode': parse_retrieval_mode(
+            generation_request.get('retrieval_mode'), 'retrieval_mode'),
+        'include_timings': bool(generation_request.get('include_timings', False))
+    }
+
+def parse_hashtags_request(generation_request: dict) -> Dict[str, Any]:
+    """Valida e normaliza o corpo de uma solicitação de hashtags"""
+    persona_id = generation_request.get('persona_id')
+    topic = generation_request.get('topic')
+
+    if not persona_id or not topic:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="persona_id e topic são obrigatórios"
+        )
+
+    count = max(1, min(generation_request.get('count', 15), 30))  # Máximo 30 hashtags (limite do Instagram)
+    mix_strategy = generation_request.get('mix_strategy', 'balanced')
+
+    if mix_strategy not in MIX_STRATEGIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Estratégia inválida. Estratégias válidas: {', '.join(MIX_STRATEGIES)}"
+        )
+
+    return {
+        'persona_id': persona_id,
+        'topic': topic,
+        'count': count,
+        'mix_strategy': mix_strategy,
+        'include_timings': bool(generation_request.get('include_timings', False))
+    }
+
+def parse_image_request(generation_request: dict) -> Dict[str, Any]:
+    """Valida e normaliza o corpo de uma solicitação de imagem"""
+    persona_id = generation_request.get('persona_id')
+    prompt = generation_request.get('prompt')
+
+    if not persona_id or not prompt:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="persona_id e prompt são obrigatórios"
+        )
+
+    return {
+        'persona_id': persona_id,
+        'prompt': prompt,
+        'ratio': generation_request.get('ratio', 'square'),
+        'include_timings': bool(generation_request.get('include_timings', False))
+    }
+
+def sse_event(event: str, data: Any) -> str:
+    """Formata um evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+# =============================================================================
+# EXECUÇÃO DAS GERAÇÕES (compartilhada entre as rotas síncronas e os jobs)
+# =============================================================================
+
+async def run_caption_generation(params: Dict[str, Any], user: User, db: Session) -> Dict[str, Any]:
+    """Gera a legenda de uma solicitação já validada (parse_caption_request)"""
+    with stage_timer("persona"):
+        # Buscar persona
+        persona = get_user_persona(db, params['persona_id'], user.id)
+
+        # Preparar dados para IA
+        persona_data = prepare_persona_data_for_ai(persona)
+
+    # Gerar legenda
+    logger.info(f"🤖 Gerando legenda para persona {persona.name}: {params['topic']}")
+
+    # Cópia: solicitações idênticas simultâneas recebem o mesmo resultado
+    result = dict(await ai_service.generate_instagram_caption(
+        persona_data=persona_data,
+        topic=params['enriched_topic'],
+        style=params['style'],
+        include_hashtags=params['include_hashtags'],
+        use_cache=params['use_cache']
+    ))
+
+    # Adicionar informações da solicitação
+    result['request_info'] = {
+        'persona_id': params['persona_id'],
+        'persona_name': persona.name,
+        'original_topic': params['topic'],
+        'style': params['style'],
+        'include_hashtags': params['include_hashtags'],
+        'user_id': user.id
+    }
+
+    usage_tracker.record_caption(user.id, persona.id, result, topic=params['topic'])
+    logger.info(f"✅ Legenda gerada com sucesso para {persona.name}")
+    return result
+
+async def run_ideas_generation(params: Dict[str, Any], user: User, db: Session) -> Dict[str, Any]:
+    """Gera as ideias de uma solicitação já validada (parse_ideas_request)"""
+    with stage_timer("persona"):
+        # Buscar persona
+        persona = get_user_persona(db, params['persona_id'], user.id)
+
+        # Preparar dados para IA
+        persona_data = prepare_persona_data_for_ai(persona)
+
+    # Gerar ideias
+    logger.info(f"💡 Gerando {params['count']} ideias de {params['content_type']} para {persona.name}")
+
+    ideas = await ai_service.generate_content_ideas(
+        persona_data=persona_data,
+        content_type=params['content_type'],
+        count=params['count'],
+        focus_area=params['focus_area']
+    )
+
+    logger.info(f"✅ {len(ideas)} ideias geradas para {persona.name}")
+    usage_tracker.record_ideas(user.id, persona.id, params['content_type'], ideas)
+
+    return {
+        'ideas': ideas,
+        'request_info': {
+            'persona_id': params['persona_id'],
+            'persona_name': persona.name,
+            'content_type': params['content_type'],
+            'requested_count': params['count'],
+            'generated_count': len(ideas),
+            'focus_area': params['focus_area'],
+            'user_id': user.id
+        },
+        'generated_at': datetime.now().isoformat()
+    }
+
+async def run_hashtags_generation(params: Dict[str, Any], user: User, db: Session) -> Dict[str, Any]:
+    """Sugere as hashtags de uma solicitação já validada (parse_hashtags_request)"""
+    # Buscar persona
+    with stage_timer("persona"):
+        persona = get_user_persona(db, params['persona_id'], user.id)
+        persona_data = prepare_persona_data_for_ai(persona)
+
+    # Índice local da persona primeiro; o modelo só completa o que faltar
+    result = await hashtag_engine.suggest(
+        persona_data=persona_data,
+        topic=params['topic'],
+        count=params['count'],
+        mix_strategy=params['mix_strategy']
+    )
+    hashtags = result['hashtags']
+
+    logger.info(f"🏷️ {len(hashtags)} hashtags geradas para {persona.name}")
+    usage_tracker.record_hashtags(user.id, persona.id, params['topic'], result)
+
+    return {
+        'hashtags': hashtags,
+        'topic': params['topic'],
+        'strategy': params['mix_strategy'],
+        'sources': result['sources'],
+        'persona_name': persona.name,
+        'generated_at': datetime.now().isoformat()
+    }
+
+async def run_image_generation(params: Dict[str, Any], user: User, db: Session) -> Dict[str, Any]:
+    """Gera a imagem de uma solicitação já validada (parse_image_request)"""
+    with stage_timer("persona"):
+        persona = get_user_persona(db, params['persona_id'], user.id)
+        persona_data = prepare_persona_data_for_ai(persona)
+
+    result = await image_service.generate_image(
+        persona_data=persona_data,
+        prompt=params['prompt'],
+        ratio=params['ratio'],
+    )
+    usage_tracker.record_image(user.id, persona.id, params['prompt'], result)
+
+    return {
+        "image": result,
+        "persona": {"id": persona.id, "name": persona.name},
+    }
+
+async def run_caption_batch(params: Dict[str, Any], user: User, db: Session) -> Dict[str, Any]:
+    """Gera um lote de legendas (parse_batch_request) e devolve todos os itens de uma vez"""
+    with stage_timer("persona"):
+        persona = get_user_persona(db, params['persona_id'], user.id)
+        persona_data = prepare_persona_data_for_ai(persona)
+
+    items = params['items']
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    async for index, outcome in ai_service.generate_instagram_captions_batch(
+        persona_data=persona_data,
+        items=items,
+        max_concurrency=params['max_concurrency'],
+        # Jobs gravados antes da opção não têm retrieval_mode
+        retrieval_mode=params.get('retrieval_mode')
+    ):
+        entry = {'index': index, 'topic': items[index]['original_topic']}
+        if 'result' in outcome:
+            entry['result'] = outcome['result']
+            usage_tracker.record_caption(
+                user.id, persona.id, outcome['result'], topic=items[index]['original_topic'],
+                latency_seconds=outcome['latency_seconds'])
+        else:
+            entry['detail'] = "Erro interno na geração de conteúdo"
+        outcomes[index] = entry
+
+    succeeded = sum(1 for entry in outcomes if entry and 'result' in entry)
+    logger.info(f"✅ Lote concluído para {persona.name}: {succeeded}/{len(items)} legendas")
+
+    return {
+        'items': outcomes,
+        'total': len(items),
+        'succeeded': succeeded,
+        'failed': len(items) - succeeded,
+        'request_info': {
+            'persona_id': params['persona_id'],
+            'persona_name': persona.name,
+            'user_id': user.id
+        },
+        'generated_at': datetime.now().isoformat()
+    }
+
+# Tipos de job: validação do corpo (a mesma da rota síncrona), custo no token
+# bucket do usuário e execução
+JOB_TYPES: Dict[str, Dict[str, Any]] = {
+    'caption': {
+        'parse': parse_caption_request,
+        'cost': lambda params: 1,
+        'run': run_caption_generation,
+    },
+    'ideas': {
+        'parse': parse_ideas_request,
+        'cost': lambda params: 1,
+        'run': run_ideas_generation,
+    },
+    'hashtags': {
+        'parse': parse_hashtags_request,
+        'cost': lambda params: 1,
+        'run': run_hashtags_generation,
+    },
+    'image': {
+        'parse': parse_image_request,
+        'cost': lambda params: settings.RATE_LIMIT_IMAGE_COST,
+        'run': run_image_generation,
+    },
+    'caption_batch': {
+        'parse': parse_batch_request,
+        'cost': lambda params: len(params['items']),
+        'run': run_caption_batch,
+    },
+}
+
+def make_job_handler(job_type: str):
+    """Handler do pool de workers para um tipo de job"""
+    spec = JOB_TYPES[job_type]
+
+    async def handler(payload: Dict[str, Any], user: User, db: Session) -> Dict[str, Any]:
+        timer = start_request_timer(f"job_{job_type}")
+        params = spec['parse'](payload)
+        result = await spec['run'](params, user, db)
+        return attach_timings(result, timer, params['include_timings'])
+
+    return handler
+
+for _job_type in JOB_TYPES:
+    job_queue.register(_job_type, make_job_handler(_job_type))
+
 # =============================================================================
 # ROTAS DE GERAÇÃO DE CONTEÚDO
 # =============================================================================
@@ -60,6 +505,7 @@ def prepare_persona_data_for_ai(persona: Persona) -> Dict[str, Any]:
 @router.post("/generate-caption", summary="Gerar legenda para Instagram")
 async def generate_instagram_caption(
     generation_request: dict,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -72,62 +518,29 @@ async def generate_instagram_caption(
         "topic": "lançamento de produto",
         "style": "engajamento", // "engajamento", "informativo", "storytelling"
         "include_hashtags": true,
-        "additional_context": "produto é um app mobile para fitness"
+        "additional_context": "produto é um app mobile para fitness",
+        "use_cache": true, // opcional, reaproveita legendas de tópicos similares
+        "include_timings": false // opcional, duração de cada etapa em "timings"
     }
     """
+    timer = start_request_timer("caption")
     try:
         # Validar dados de entrada
-        persona_id = generation_request.get('persona_id')
-        topic = generation_request.get('topic')
-
-        if not persona_id or not topic:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="persona_id e topic são obrigatórios"
-            )
-
-        # Buscar persona
-        persona = get_user_persona(db, persona_id, current_user.id)
-
-        # Preparar dados para IA
-        persona_data = prepare_persona_data_for_ai(persona)
-
-        # Parâmetros opcionais
-        style = generation_request.get('style', 'engajamento')
-        include_hashtags = generation_request.get('include_hashtags', True)
-        additional_context = generation_request.get('additional_context', '')
-
-        # Enriquecer tópico com contexto adicional
-        enriched_topic = topic
-        if additional_context:
-            enriched_topic = f"{topic}. Contexto adicional: {additional_context}"
-
-        # Gerar legenda
-        logger.info(f"🤖 Gerando legenda para persona {persona.name}: {topic}")
-
-        result = await ai_service.generate_instagram_caption(
-            persona_data=persona_data,
-            topic=enriched_topic,
-            style=style,
-            include_hashtags=include_hashtags
-        )
-
-        # Adicionar informações da solicitação
-        result['request_info'] = {
-            'persona_id': persona_id,
-            'persona_name': persona.name,
-            'original_topic': topic,
-            'style': style,
-            'include_hashtags': include_hashtags,
-            'user_id': current_user.id
-        }
+        params = parse_caption_request(generation_request)
+        admit_generation(current_user, "caption")
 
-        logger.info(f"✅ Legenda gerada com sucesso para {persona.name}")
+        result = await run_caption_generation(params, current_user, db)
 
-        return result
+        return attach_timings(result, timer, params['include_timings'], response)
 
     except HTTPException:
         raise
+    except ProviderUnavailableError as e:
+        logger.error(f"❌ Providers de IA indisponíveis: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço de IA temporariamente indisponível"
+        )
     except Exception as e:
         logger.error(f"❌ Erro ao gerar legenda: {e}")
         raise HTTPException(
@@ -138,6 +551,7 @@ async def generate_instagram_caption(
 @router.post("/generate-ideas", summary="Gerar ideias de conteúdo")
 async def generate_content_ideas(
     generation_request: dict,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -149,93 +563,319 @@ async def generate_content_ideas(
         "persona_id": 1,
         "content_type": "posts", // "posts", "stories", "reels"
         "count": 5,
-        "focus_area": "educacional" // opcional
+        "focus_area": "educacional", // opcional
+        "include_timings": false // opcional, duração de cada etapa em "timings"
     }
     """
+    timer = start_request_timer("ideas")
     try:
         # Validar dados de entrada
-        persona_id = generation_request.get('persona_id')
+        params = parse_ideas_request(generation_request)
+        admit_generation(current_user, "ideas")
 
-        if not persona_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="persona_id é obrigatório"
-            )
+        result = await run_ideas_generation(params, current_user, db)
 
-        # Buscar persona
-        persona = get_user_persona(db, persona_id, current_user.id)
+        return attach_timings(result, timer, params['include_timings'], response)
 
-        # Preparar dados para IA
+    except HTTPException:
+        raise
+    except ProviderUnavailableError as e:
+        logger.error(f"❌ Providers de IA indisponíveis: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço de IA temporariamente indisponível"
+        )
+    except Exception as e:
+        logger.error(f"❌ Erro ao gerar ideias: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno na geração de ideias"
+        )
+
+@router.post("/generate-caption/stream", summary="Gerar legenda com streaming (SSE)")
+async def stream_instagram_caption(
+    generation_request: dict,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Versão em streaming de /generate-caption (text/event-stream)
+
+    Mesmo body de /generate-caption. Eventos emitidos:
+    - token: {"text": "..."} a cada trecho gerado pelo modelo
+    - result: legenda final estruturada (mesmo formato de /generate-caption)
+    - error: {"detail": "..."} se a geração falhar no meio do stream
+
+    Com include_timings, as durações vão no evento result (não há
+    Server-Timing: os cabeçalhos são enviados antes da geração).
+    """
+    timer = start_request_timer("caption_stream")
+    params = parse_caption_request(generation_request)
+    admit_generation(current_user, "caption_stream")
+    with stage_timer("persona"):
+        persona = get_user_persona(db, params['persona_id'], current_user.id)
+        persona_data = prepare_persona_data_for_ai(persona)
+
+    request_info = {
+        'persona_id': params['persona_id'],
+        'persona_name': persona.name,
+        'original_topic': params['topic'],
+        'style': params['style'],
+        'include_hashtags': params['include_hashtags'],
+        'user_id': current_user.id
+    }
+
+    logger.info(f"🤖 Gerando legenda (stream) para persona {persona.name}: {params['topic']}")
+
+    async def event_stream() -> AsyncIterator[str]:
+        activate_timer(timer)
+        set_current_client(current_user.id)
+        try:
+            async for event in ai_service.stream_instagram_caption(
+                persona_data=persona_data,
+                topic=params['enriched_topic'],
+                style=params['style'],
+                include_hashtags=params['include_hashtags'],
+                use_cache=params['use_cache']
+            ):
+                if event['event'] == 'result':
+                    event['data']['request_info'] = request_info
+                    usage_tracker.record_caption(
+                        current_user.id, persona.id, event['data'], topic=params['topic'])
+                    attach_timings(event['data'], timer, params['include_timings'])
+                yield sse_event(event['event'], event['data'])
+        except Exception as e:
+            logger.error(f"❌ Erro ao gerar legenda (stream): {e}")
+            yield sse_event('error', {'detail': "Erro interno na geração de conteúdo"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/generate-ideas/stream", summary="Gerar ideias com streaming (SSE)")
+async def stream_content_ideas(
+    generation_request: dict,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Versão em streaming de /generate-ideas (text/event-stream)
+
+    Mesmo body de /generate-ideas. Emite eventos token durante a geração e um
+    evento result final com o mesmo formato da resposta de /generate-ideas
+    (com include_timings, as durações vão no evento result).
+    """
+    timer = start_request_timer("ideas_stream")
+    params = parse_ideas_request(generation_request)
+    admit_generation(current_user, "ideas_stream")
+    with stage_timer("persona"):
+        persona = get_user_persona(db, params['persona_id'], current_user.id)
         persona_data = prepare_persona_data_for_ai(persona)
 
-        # Parâmetros
-        content_type = generation_request.get('content_type', 'posts')
-        count = min(generation_request.get('count', 5), 10)  # Máximo 10 ideias
-        focus_area = generation_request.get('focus_area', '')
+    logger.info(f"💡 Gerando {params['count']} ideias de {params['content_type']} (stream) para {persona.name}")
+
+    async def event_stream() -> AsyncIterator[str]:
+        activate_timer(timer)
+        set_current_client(current_user.id)
+        try:
+            async for event in ai_service.stream_content_ideas(
+                persona_data=persona_data,
+                content_type=params['content_type'],
+                count=params['count'],
+                focus_area=params['focus_area']
+            ):
+                if event['event'] != 'result':
+                    yield sse_event(event['event'], event['data'])
+                    continue
+
+                ideas = event['data']['ideas']
+                usage_tracker.record_ideas(current_user.id, persona.id, params['content_type'], ideas)
+                yield sse_event('result', attach_timings({
+                    'ideas': ideas,
+                    'request_info': {
+                        'persona_id': params['persona_id'],
+                        'persona_name': persona.name,
+                        'content_type': params['content_type'],
+                        'requested_count': params['count'],
+                        'generated_count': len(ideas),
+                        'focus_area': params['focus_area'],
+                        'user_id': current_user.id
+                    },
+                    'generated_at': datetime.now().isoformat()
+                }, timer, params['include_timings']))
+        except Exception as e:
+            logger.error(f"❌ Erro ao gerar ideias (stream): {e}")
+            yield sse_event('error', {'detail': "Erro interno na geração de ideias"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/generate-captions/batch", summary="Gerar legendas em lote (SSE)")
+async def generate_instagram_captions_batch(
+    generation_request: dict,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Gera legendas para vários tópicos da mesma persona (text/event-stream)
+
+    A persona e o contexto RAG são resolvidos uma única vez para o lote e as
+    chamadas ao modelo rodam com concorrência limitada. Cada item é enviado
+    assim que fica pronto.
+
+    Body esperado:
+    {
+        "persona_id": 1,
+        "items": [
+            {"topic": "lançamento de produto", "style": "storytelling"},
+            "dicas de treino em casa"
+        ],
+        "style": "engajamento", // padrão para itens sem estilo
+        "include_hashtags": true, // padrão para itens sem include_hashtags
+        "max_concurrency": 4, // opcional
+        "retrieval_mode": "hybrid", // opcional: "hybrid" ou "vector" (padrão: RETRIEVAL_MODE)
+        "include_timings": false // opcional, durações somadas do lote no evento done
+    }
+
+    Eventos emitidos:
+    - item: {"index": 0, "topic": "...", "result": {...}}
+    - item_error: {"index": 1, "topic": "...", "detail": "..."}
+    - done: resumo do lote
+    """
+    timer = start_request_timer("caption_batch")
+    params = parse_batch_request(generation_request)
+    persona_id = params['persona_id']
+    items = params['items']
+    max_concurrency = params['max_concurrency']
+
+    # Cada item consome um token (limitado à capacidade do bucket)
+    admit_generation(current_user, "caption_batch", cost=len(items))
+
+    with stage_timer("persona"):
+        persona = get_user_persona(db, persona_id, current_user.id)
+        persona_data = prepare_persona_data_for_ai(persona)
+
+    logger.info(f"📦 Gerando lote de {len(items)} legendas para persona {persona.name}")
+
+    async def event_stream() -> AsyncIterator[str]:
+        activate_timer(timer)
+        set_current_client(current_user.id)
+        succeeded = 0
+        try:
+            async for index, outcome in ai_service.generate_instagram_captions_batch(
+                persona_data=persona_data,
+                items=items,
+                max_concurrency=max_concurrency,
+                retrieval_mode=params['retrieval_mode']
+            ):
+                topic = items[index]['original_topic']
+                if 'result' in outcome:
+                    succeeded += 1
+                    usage_tracker.record_caption(
+                        current_user.id, persona.id, outcome['result'], topic=topic,
+                        latency_seconds=outcome['latency_seconds'])
+                    yield sse_event('item', {'index': index, 'topic': topic, 'result': outcome['result']})
+                else:
+                    yield sse_event('item_error', {
+                        'index': index,
+                        'topic': topic,
+                        'detail': "Erro interno na geração de conteúdo"
+                    })
+
+            yield sse_event('done', attach_timings({
+                'total': len(items),
+                'succeeded': succeeded,
+                'failed': len(items) - succeeded,
+                'request_info': {
+                    'persona_id': persona_id,
+                    'persona_name': persona.name,
+                    'user_id': current_user.id
+                },
+                'generated_at': datetime.now().isoformat()
+            }, timer, params['include_timings']))
+            logger.info(f"✅ Lote concluído para {persona.name}: {succeeded}/{len(items)} legendas")
+        except Exception as e:
+            logger.error(f"❌ Erro ao gerar lote de legendas: {e}")
+            yield sse_event('error', {'detail': "Erro interno na geração de conteúdo"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/refine-caption", summary="Refinar legenda gerada")
+async def refine_instagram_caption(
+    refine_request: dict,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Refina uma legenda gerada seguindo uma instrução curta
+
+    Com Ollama, continua a partir dos tokens de contexto da geração original
+    (sem reprocessar persona e RAG); com os demais providers, reenvia a
+    persona e a legenda atual. A resposta traz um novo refine_id, permitindo
+    encadear refinamentos.
 
-        # Validar tipo de conteúdo
-        valid_types = ['posts', 'stories', 'reels', 'igtv', 'carrossel']
-        if content_type not in valid_types:
+    Body esperado:
+    {
+        "refine_id": "…", // retornado pelas rotas de legenda
+        "instruction": "mais curta e com mais emojis",
+        "include_timings": false // opcional, duração de cada etapa em "timings"
+    }
+    """
+    timer = start_request_timer("refine")
+    try:
+        refine_id = refine_request.get('refine_id')
+        instruction = (refine_request.get('instruction') or '').strip()
+        if not refine_id or not instruction:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Tipo de conteúdo inválido. Tipos válidos: {', '.join(valid_types)}"
+                detail="refine_id e instruction são obrigatórios"
+            )
+
+        session = refine_sessions.get(refine_id)
+        if session is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Sessão de refinamento expirada ou inexistente"
             )
 
-        # Gerar ideias
-        logger.info(f"💡 Gerando {count} ideias de {content_type} para {persona.name}")
+        with stage_timer("persona"):
+            persona = get_user_persona(db, session.persona_id, current_user.id)
+            persona_data = prepare_persona_data_for_ai(persona)
 
-        ideas = await ai_service.generate_content_ideas(
-            persona_data=persona_data,
-            content_type=content_type,
-            count=count
-        )
+        admit_generation(current_user, "refine")
 
-        # Filtrar por área de foco se especificada
-        if focus_area and ideas:
-            filtered_ideas = []
-            focus_lower = focus_area.lower()
-
-            for idea in ideas:
-                title_lower = idea.get('title', '').lower()
-                description_lower = idea.get('description', '').lower()
-
-                if focus_lower in title_lower or focus_lower in description_lower:
-                    filtered_ideas.append(idea)
-
-            # Se encontrou ideias filtradas, use elas
-            if filtered_ideas:
-                ideas = filtered_ideas
-
-        result = {
-            'ideas': ideas,
-            'request_info': {
-                'persona_id': persona_id,
-                'persona_name': persona.name,
-                'content_type': content_type,
-                'requested_count': count,
-                'generated_count': len(ideas),
-                'focus_area': focus_area,
-                'user_id': current_user.id
-            },
-            'generated_at': datetime.now().isoformat()
-        }
+        logger.info(f"✏️ Refinando legenda para persona {persona.name}: {instruction}")
+        result = await ai_service.refine_caption(persona_data, session, instruction)
+        usage_tracker.record_caption(current_user.id, persona.id, result, generation_type="refine")
 
-        logger.info(f"✅ {len(ideas)} ideias geradas para {persona.name}")
+        result['request_info'] = {
+            'persona_id': persona.id,
+            'persona_name': persona.name,
+            'refined_from': refine_id,
+            'instruction': instruction,
+            'user_id': current_user.id
+        }
 
-        return result
+        return attach_timings(
+            result, timer, bool(refine_request.get('include_timings', False)), response)
 
     except HTTPException:
         raise
+    except ProviderUnavailableError as e:
+        logger.error(f"❌ Providers de IA indisponíveis: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço de IA temporariamente indisponível"
+        )
     except Exception as e:
-        logger.error(f"❌ Erro ao gerar ideias: {e}")
+        logger.error(f"❌ Erro ao refinar legenda: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Erro interno na geração de ideias"
+            detail="Erro interno na geração de conteúdo"
         )
 
 @router.post("/generate-hashtags", summary="Gerar hashtags personalizadas")
 async def generate_hashtags(
     generation_request: dict,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -247,62 +887,126 @@ async def generate_hashtags(
         "persona_id": 1,
         "topic": "alimentação saudável",
         "count": 15,
-        "mix_strategy": "balanced" // "popular", "niche", "balanced"
+        "mix_strategy": "balanced", // "popular", "niche", "balanced"
+        "include_timings": false // opcional, duração de cada etapa em "timings"
     }
     """
+    timer = start_request_timer("hashtags")
     try:
         # Validar dados de entrada
-        persona_id = generation_request.get('persona_id')
-        topic = generation_request.get('topic')
+        params = parse_hashtags_request(generation_request)
+        admit_generation(current_user, "hashtags")
 
-        if not persona_id or not topic:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="persona_id e topic são obrigatórios"
-            )
+        result = await run_hashtags_generation(params, current_user, db)
 
-        # Buscar persona
-        persona = get_user_persona(db, persona_id, current_user.id)
+        return attach_timings(result, timer, params['include_timings'], response)
 
-        # Por enquanto, gerar hashtags usando a função de legenda
-        # Em uma versão futura, criar função específica para hashtags
-        persona_data = prepare_persona_data_for_ai(persona)
-
-        result = await ai_service.generate_instagram_caption(
-            persona_data=persona_data,
-            topic=f"gerar apenas hashtags sobre: {topic}",
-            style="hashtags",
-            include_hashtags=True
+    except HTTPException:
+        raise
+    except ProviderUnavailableError as e:
+        logger.error(f"❌ Providers de IA indisponíveis: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serviço de IA temporariamente indisponível"
+        )
+    except Exception as e:
+        logger.error(f"❌ Erro ao gerar hashtags: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erro interno na geração de hashtags"
         )
 
-        # Extrair apenas as hashtags
-        hashtags = result.get('hashtags', [])
+# =============================================================================
+# ROTAS DE JOBS (GERAÇÃO ASSÍNCRONA)
+# =============================================================================
 
-        count = generation_request.get('count', 15)
-        if len(hashtags) > count:
-            hashtags = hashtags[:count]
+def format_job(job: GenerationJob) -> Dict[str, Any]:
+    """Representação de um job para a API"""
+    return {
+        'job_id': job.id,
+        'type': job.job_type,
+        'status': job.status,
+        'persona_id': job.persona_id,
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'status_url': f"/api/v1/content/jobs/{job.id}"
+    }
 
-        response = {
-            'hashtags': hashtags,
-            'topic': topic,
-            'strategy': generation_request.get('mix_strategy', 'balanced'),
-            'persona_name': persona.name,
-            'generated_at': datetime.now().isoformat()
-        }
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED, summary="Enfileirar geração assíncrona")
+async def submit_generation_job(
+    job_request: dict,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Enfileira uma geração longa e retorna imediatamente o id do job
 
-        logger.info(f"🏷️ {len(hashtags)} hashtags geradas para {persona.name}")
+    O resultado é obtido por polling em GET /jobs/{job_id}; a conexão não
+    fica aberta durante a geração.
 
-        return response
+    Body esperado:
+    {
+        "type": "ideas", // caption, ideas, hashtags, image, caption_batch
+        "params": {"persona_id": 1, "content_type": "reels", "count": 8} // corpo da rota síncrona
+    }
+    """
+    job_type = job_request.get('type')
+    payload = job_request.get('params')
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"❌ Erro ao gerar hashtags: {e}")
+    if job_type not in JOB_TYPES or not isinstance(payload, dict):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Erro interno na geração de hashtags"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"type e params são obrigatórios. Tipos válidos: {', '.join(JOB_TYPES)}"
+        )
+
+    # Validar agora para não enfileirar um job que falharia de imediato
+    spec = JOB_TYPES[job_type]
+    params = spec['parse'](payload)
+    persona = get_user_persona(db, params['persona_id'], current_user.id)
+    route = f"job_{job_type}"
+    cost = spec['cost'](params)
+    admit_generation(current_user, route, cost=cost)
+
+    try:
+        job = job_queue.submit(db, current_user.id, job_type, payload, persona.id)
+    except JobQueueUnavailableError as e:
+        logger.error(f"❌ Fila de jobs indisponível: {e}")
+        # O job não foi aceito: o usuário não paga por ele
+        admission.refund(current_user.id, cost, route)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Fila de geração temporariamente indisponível"
+        )
+
+    return format_job(job)
+
+@router.get("/jobs/{job_id}", summary="Consultar job de geração")
+async def get_generation_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Retorna o status do job e, quando status for completed, o resultado no
+    mesmo formato da rota síncrona correspondente
+    """
+    job = db.query(GenerationJob).filter(
+        GenerationJob.id == job_id,
+        GenerationJob.owner_id == current_user.id
+    ).first()
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job não encontrado"
         )
 
+    return format_job(job)
+
 # =============================================================================
 # ROTAS DE BUSCA E CONTEXTO
 # =============================================================================
@@ -320,7 +1024,8 @@ async def search_knowledge_base(
     {
         "persona_id": 1,
         "query": "estratégias de marketing digital",
-        "limit": 5
+        "limit": 5,
+        "mode": "hybrid"  // opcional: "hybrid" ou "vector" (padrão: RETRIEVAL_MODE)
     }
     """
     try:
@@ -334,6 +1039,8 @@ async def search_knowledge_base(
                 detail="persona_id e query são obrigatórios"
             )
 
+        mode = parse_retrieval_mode(search_request.get('mode'))
+
         # Buscar persona
         persona = get_user_persona(db, persona_id, current_user.id)
 
@@ -343,11 +1050,13 @@ async def search_knowledge_base(
         # Buscar no banco vetorial
         logger.info(f"🔍 Buscando '{query}' na base de conhecimento de {persona.name}")
 
-        results = await vector_store.search_similar_content(
+        search = await vector_store.search(
             persona_id=persona_id,
             query=query,
-            n_results=limit
+            n_results=limit,
+            mode=mode
         )
+        results = search['results']
 
         # Preparar resposta
         response = {
@@ -355,6 +1064,10 @@ async def search_knowledge_base(
             'persona_name': persona.name,
             'results_count': len(results),
             'results': results,
+            'retrieval': {
+                'mode': search['mode'],
+                'timings_ms': search['timings_ms']
+            },
             'searched_at': datetime.now().isoformat()
         }
 
@@ -459,38 +1172,57 @@ async def get_content_generation_stats(
 ):
     """
     Retorna estatísticas de uso das funcionalidades de geração de conteúdo
+
+    Lê os contadores agregados (hoje, semana, mês e total) do usuário ou da
+    persona filtrada; o histórico não é varrido.
     """
-    # Por enquanto, retornar estatísticas simuladas
-    # Em produção, seria implementado tracking de uso real
+    now = datetime.utcnow()
+    persona = None
+    if persona_id:
+        persona = get_user_persona(db, persona_id, current_user.id)
+        summary = usage_tracker.summary(db, "persona", persona_id, now)
+    else:
+        summary = usage_tracker.summary(db, "user", current_user.id, now)
+
+    totals = summary['totals']
+    by_type = summary['by_type']
+    total = sum(totals['all'].values())
+
+    # Personas mais usadas (contadores totais de cada persona do usuário)
+    personas = db.query(Persona.id, Persona.name).filter(Persona.owner_id == current_user.id).all()
+    persona_counts = usage_tracker.persona_counts(db, [p.id for p in personas])
+    most_used_personas = sorted(
+        (
+            {'persona_id': p.id, 'name': p.name, 'usage_count': persona_counts[p.id]}
+            for p in personas if persona_counts.get(p.id)
+        ),
+        key=lambda entry: entry['usage_count'],
+        reverse=True
+    )[:5]
 
     stats = {
         'user_id': current_user.id,
         'generation_summary': {
-            'total_captions_generated': 45,
-            'total_ideas_generated': 23,
-            'total_hashtag_sets_generated': 12,
-            'total_searches_performed': 67
+            'total_captions_generated': totals['all']['caption'],
+            'total_refinements': totals['all']['refine'],
+            'total_ideas_generated': by_type.get('ideas', {}).get('items', 0),
+            'total_hashtag_sets_generated': totals['all']['hashtags'],
+            'total_images_generated': totals['all']['image'],
+            'total_generations': total
         },
-        'most_used_personas': [
-            {'persona_id': 1, 'name': 'Marca Principal', 'usage_count': 34},
-            {'persona_id': 2, 'name': 'Produto X', 'usage_count': 23}
-        ],
-        'popular_content_types': [
-            {'type': 'posts', 'count': 28},
-            {'type': 'stories', 'count': 15},
-            {'type': 'reels', 'count': 12}
-        ],
+        'by_type': by_type,
+        'most_used_personas': most_used_personas,
         'generation_trends': {
-            'this_week': 12,
-            'this_month': 45,
-            'average_per_week': 8.5
+            'today': sum(totals['day'].values()),
+            'this_week': sum(totals['week'].values()),
+            'this_month': sum(totals['month'].values()),
+            'average_per_week': round(
+                total / usage_tracker.weeks_since(summary['first_generated_at'], now), 1)
         },
         'generated_at': datetime.now().isoformat()
     }
 
-    # Se persona específica foi solicitada, filtrar dados
-    if persona_id:
-        persona = get_user_persona(db, persona_id, current_user.id)
+    if persona is not None:
         stats['filtered_by_persona'] = {
             'persona_id': persona_id,
             'persona_name': persona.name
@@ -498,6 +1230,61 @@ async def get_content_generation_stats(
 
     return stats
 
+def format_generation_record(record: GenerationRecord) -> Dict[str, Any]:
+    """Representação de um registro do histórico"""
+    return {
+        'id': record.id,
+        'generation_type': record.generation_type,
+        'persona_id': record.persona_id,
+        'topic': record.topic,
+        'provider': record.provider,
+        'latency_ms': record.latency_ms,
+        'prompt_tokens': record.prompt_tokens,
+        'output_tokens': record.output_tokens,
+        'items': record.items,
+        'cached': record.cached,
+        'created_at': record.created_at.isoformat() if record.created_at else None
+    }
+
+@router.get("/history", summary="Histórico de gerações")
+async def get_generation_history(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    persona_id: Optional[int] = Query(None, description="Filtrar por persona específica"),
+    generation_type: Optional[str] = Query(None, description="caption, ideas, hashtags, image ou refine"),
+    cursor: Optional[int] = Query(None, description="next_cursor da página anterior"),
+    limit: int = Query(20, ge=1, le=100, description="Itens por página")
+):
+    """
+    Lista as gerações do usuário, das mais recentes para as mais antigas
+
+    Paginação por cursor: cada página devolve next_cursor (id do último item),
+    e a próxima começa logo abaixo dele, sem OFFSET.
+    """
+    if generation_type and generation_type not in GENERATION_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"generation_type deve ser um de: {', '.join(GENERATION_TYPES)}"
+        )
+
+    query = db.query(GenerationRecord).filter(GenerationRecord.user_id == current_user.id)
+    if persona_id:
+        query = query.filter(GenerationRecord.persona_id == persona_id)
+    if generation_type:
+        query = query.filter(GenerationRecord.generation_type == generation_type)
+    if cursor:
+        query = query.filter(GenerationRecord.id < cursor)
+
+    records = query.order_by(GenerationRecord.id.desc()).limit(limit + 1).all()
+    has_more = len(records) > limit
+    records = records[:limit]
+
+    return {
+        'items': [format_generation_record(record) for record in records],
+        'next_cursor': records[-1].id if has_more else None,
+        'limit': limit
+    }
+
 # =============================================================================
 # ROTA DE GERAÇÃO DE IMAGENS
 # =============================================================================
@@ -519,29 +1306,10 @@ async def generate_image(
     }
     """
     try:
-        persona_id = generation_request.get('persona_id')
-        prompt = generation_request.get('prompt')
-        ratio = generation_request.get('ratio', 'square')
+        params = parse_image_request(generation_request)
+        admit_generation(current_user, "image", cost=settings.RATE_LIMIT_IMAGE_COST)
 
-        if not persona_id or not prompt:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="persona_id e prompt são obrigatórios"
-            )
-
-        persona = get_user_persona(db, persona_id, current_user.id)
-        persona_data = prepare_persona_data_for_ai(persona)
-
-        result = await image_service.generate_image(
-            persona_data=persona_data,
-            prompt=prompt,
-            ratio=ratio,
-        )
-
-        return {
-            "image": result,
-            "persona": {"id": persona.id, "name": persona.name},
-        }
+        return await run_image_generation(params, current_user, db)
 
     except HTTPException:
         raise
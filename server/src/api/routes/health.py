@@ -11,7 +11,13 @@ import datetime
 
 from ...core.database import get_db
 from ...core.config import settings
+from ...core.metrics import metrics
 from ...services.vector_store import vector_store
+from ...services.generation_cache import generation_cache
+from ...services.persona_context import persona_context_cache
+from ...services.admission import admission
+from ...services.job_queue import job_queue
+from ...services.refine_sessions import refine_sessions
 
 router = APIRouter()
 
@@ -60,7 +66,7 @@ async def detailed_health_check(db: Session = Depends(get_db)) -> Dict[str, Any]
     try:
         if vector_store.client:
             # Tentar uma operação simples
-            collections = vector_store.client.list_collections()
+            collections = await vector_store.list_collections()
             health_status["services"]["vector_store"] = {
                 "status": "healthy",
                 "type": "ChromaDB",
@@ -79,11 +85,12 @@ async def detailed_health_check(db: Session = Depends(get_db)) -> Dict[str, Any]
     # Verificar IA Service
     try:
         from ...services.ai_service import ai_service
-        if ai_service.model:
+        if ai_service.providers:
             health_status["services"]["ai_service"] = {
                 "status": "healthy",
-                "model": settings.DEFAULT_MODEL,
-                "message": "Gemini Pro conectado"
+                "provider": ai_service.provider,
+                "model": ai_service.providers[ai_service.provider].model_name,
+                "routing": ai_service.router.snapshot()
             }
         else:
             raise Exception("Modelo não inicializado")
@@ -94,6 +101,9 @@ async def detailed_health_check(db: Session = Depends(get_db)) -> Dict[str, Any]
         }
         health_status["status"] = "degraded"
 
+    # Cache semântico de gerações
+    health_status["services"]["generation_cache"] = generation_cache.stats()
+
     # Informações do sistema
     try:
         health_status["system"] = {
@@ -120,6 +130,22 @@ async def detailed_health_check(db: Session = Depends(get_db)) -> Dict[str, Any]
 
     return health_status
 
+@router.get("/metrics", summary="Métricas internas")
+async def get_metrics() -> Dict[str, Any]:
+    """
+    Retorna contadores internos (caches, providers, filas)
+    """
+    return {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "generation_cache": generation_cache.stats(),
+        "persona_context_cache": persona_context_cache.stats(),
+        "admission": admission.stats(),
+        "jobs": job_queue.stats(),
+        "refine_sessions": refine_sessions.stats(),
+        "vector_store_pools": vector_store.pool_stats(),
+        **metrics.snapshot()
+    }
+
 @router.get("/api-info", summary="Informações da API")
 async def api_info() -> Dict[str, Any]:
     """
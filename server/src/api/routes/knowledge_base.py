@@ -18,7 +18,9 @@ from ...models.user import User
 from ...models.persona import Persona
 from ...models.knowledge_base import KnowledgeBase, ProcessingStatus
 from ...services.document_processor import document_processor
-from ...services.vector_store import vector_store
+from ...services.vector_store import vector_store, RETRIEVAL_MODES
+from ...services.generation_cache import generation_cache
+from ...services.hashtag_engine import hashtag_engine
 from ..routes.auth import get_current_user
 
 router = APIRouter()
@@ -140,6 +142,9 @@ async def process_document_async(kb_id: int, file_path: Path, db: Session):
             from datetime import datetime
             kb.processed_at = datetime.utcnow()
 
+            generation_cache.invalidate_persona(kb.persona_id)
+            hashtag_engine.invalidate_persona(kb.persona_id)
+
             logger.info(f"✅ Documento {kb.title} processado com sucesso")
         else:
             # Erro na vetorização
@@ -414,6 +419,8 @@ async def delete_knowledge_base_document(
         if kb.vector_store_id:
             try:
                 await vector_store.delete_document(kb.persona_id, kb.vector_store_id)
+                generation_cache.invalidate_persona(kb.persona_id)
+                hashtag_engine.invalidate_persona(kb.persona_id)
                 logger.info(f"🧹 Dados vetoriais removidos para documento {kb.title}")
             except Exception as e:
                 logger.warning(f"⚠️ Erro ao remover dados vetoriais: {e}")
@@ -457,6 +464,8 @@ async def search_in_document(
 ):
     """
     Busca conteúdo específico dentro de um documento
+
+    "mode" opcional: "hybrid" ou "vector" (padrão: RETRIEVAL_MODE)
     """
     kb = get_knowledge_base_by_id(db, kb_id, current_user.id)
     validate_knowledge_base_ownership(kb, current_user)
@@ -474,14 +483,23 @@ async def search_in_document(
             detail="Query de busca é obrigatória"
         )
 
+    mode = str(search_data.get('mode') or settings.RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"mode deve ser um de: {', '.join(RETRIEVAL_MODES)}"
+        )
+
     # Buscar no banco vetorial
     try:
-        results = await vector_store.search_similar_content(
+        search = await vector_store.search(
             persona_id=kb.persona_id,
             query=query,
             n_results=search_data.get('limit', 5),
-            filter_metadata={'kb_id': kb.id}
+            filter_metadata={'kb_id': kb.id},
+            mode=mode
         )
+        results = search['results']
 
         # Incrementar contador de uso
         kb.increment_usage()
@@ -491,7 +509,11 @@ async def search_in_document(
             "query": query,
             "document_title": kb.title,
             "results_count": len(results),
-            "results": results
+            "results": results,
+            "retrieval": {
+                "mode": search['mode'],
+                "timings_ms": search['timings_ms']
+            }
         }
 
     except Exception as e:
@@ -12,6 +12,9 @@ from ...core.database import get_db
 from ...models.user import User
 from ...models.persona import Persona
 from ...schemas.common import PersonaCreate, PersonaUpdate, PersonaResponse
+from ...services.generation_cache import generation_cache
+from ...services.hashtag_engine import hashtag_engine
+from ...services.persona_context import persona_context_cache
 from ..routes.auth import get_current_user
 
 router = APIRouter()
@@ -174,6 +177,10 @@ async def update_persona(
         db.commit()
         db.refresh(persona)
 
+        generation_cache.invalidate_persona(persona.id)
+        hashtag_engine.invalidate_persona(persona.id)
+        persona_context_cache.invalidate_persona(persona.id)
+
         logger.info(f"✅ Persona atualizada: {persona.name} (ID: {persona.id})")
 
         return persona
@@ -226,6 +233,10 @@ async def delete_persona(
         db.delete(persona)
         db.commit()
 
+        generation_cache.invalidate_persona(persona_id)
+        hashtag_engine.invalidate_persona(persona_id)
+        persona_context_cache.invalidate_persona(persona_id)
+
         logger.info(f"🗑️ Persona deletada: {persona.name} (ID: {persona_id})")
 
         return {"message": "Persona deletada com sucesso"}
@@ -357,6 +368,9 @@ async def duplicate_persona(
         db.commit()
         db.refresh(duplicated_persona)
 
+        # O SQLite pode reaproveitar o id de uma persona deletada
+        persona_context_cache.invalidate_persona(duplicated_persona.id)
+
         logger.info(f"📋 Persona duplicada: {original_persona.name} -> {new_name}")
 
         return duplicated_persona
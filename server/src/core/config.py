@@ -28,10 +28,64 @@ class Settings(BaseSettings):
     STABILITY_API_KEY: str = ""  # Para geração de imagens
 
     # Provider de IA para texto (google, openrouter, ou ollama)
-    AI_TEXT_PROVIDER: str = "google"  # google | openrouter | ollama
+    AI_TEXT_PROVIDER: str = "google"  # google | openrouter | ollama | replay
     OPENROUTER_MODEL: str = "google/gemma-2-9b-it:free"  # modelo gratuito do OpenRouter
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3.1"
+    OLLAMA_KEEP_ALIVE: str = "30m"  # tempo que o modelo fica carregado após o uso ("-1" = sempre)
+    OLLAMA_WARMUP: bool = True  # carrega o modelo no startup
+
+    # Limite de chamadas simultâneas por provider (evita saturar cotas e o event loop);
+    # as vagas são distribuídas em rodízio entre os usuários que estão esperando
+    AI_MAX_CONCURRENCY_GOOGLE: int = 4
+    AI_MAX_CONCURRENCY_OPENROUTER: int = 8
+    AI_MAX_CONCURRENCY_OLLAMA: int = 2
+    AI_MAX_CONCURRENCY_REPLAY: int = 64
+    AI_MAX_CONCURRENCY_IMAGE: int = 2  # Stability AI
+
+    # Saída estruturada nativa (JSON) por provider; desligada, o formato vai descrito no prompt
+    AI_STRUCTURED_OUTPUT_GOOGLE: bool = True  # response_schema (Gemini 1.5 ou superior)
+    AI_STRUCTURED_OUTPUT_OPENROUTER: bool = True  # response_format json_schema
+    AI_STRUCTURED_OUTPUT_OLLAMA: bool = True  # format "json"
+
+    # Provider "replay": respostas gravadas ou geradas a partir do schema, sem
+    # chamadas externas (testes de carga e benchmarks reproduzíveis)
+    AI_REPLAY_FILE: str = "./replay_responses.jsonl"
+    AI_REPLAY_RECORD: bool = False  # grava as respostas dos providers reais em AI_REPLAY_FILE
+    AI_REPLAY_LATENCY_DISTRIBUTION: str = "lognormal"  # fixed | normal | lognormal
+    AI_REPLAY_LATENCY_MS: float = 800.0  # média (mediana na lognormal)
+    AI_REPLAY_LATENCY_STDDEV_MS: float = 200.0
+    AI_REPLAY_TOKENS_PER_SECOND: float = 40.0  # ritmo do streaming
+    AI_REPLAY_SEED: int = 42
+
+    # Roteamento entre providers (latência p50/p95 e taxa de erro em janela móvel)
+    AI_TEXT_PROVIDERS: str = ""  # providers adicionais, ex.: "openrouter,ollama"
+    AI_ROUTER_WINDOW_SIZE: int = 50
+    AI_ROUTER_MAX_ERROR_RATE: float = 0.5
+    AI_HEDGE_ENABLED: bool = False  # dispara um segundo provider se o primeiro demorar
+    AI_HEDGE_DELAY_MS: int = 0  # 0 = usar o p95 observado do provider
+    AI_ROUTER_EXPLORE_RATE: float = 0.05  # fração das requisições que mede providers pouco amostrados
+    AI_ROUTER_MIN_SAMPLES: int = 5  # abaixo disso o provider conta como saudável e é candidato à exploração
+    AI_ROUTER_STALE_SECONDS: float = 300.0  # sem amostras há mais tempo = candidato à exploração
+
+    # Circuit breaker e ordem de fallback entre providers de texto
+    AI_FALLBACK_ORDER: str = ""  # ex.: "google,openrouter,ollama" (vazio = ranking por latência)
+    AI_BREAKER_FAILURE_THRESHOLD: int = 3  # falhas consecutivas para abrir o circuito
+    AI_BREAKER_RECOVERY_SECONDS: float = 30.0  # tempo aberto antes da requisição de teste
+
+    # =============================================================================
+    # CLIENTES HTTP (pool compartilhado por upstream)
+    # =============================================================================
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 10.0
+    HTTP2_ENABLED: bool = True  # requer o pacote h2 (httpx[http2])
+
+    # Timeouts de leitura por provider (segundos)
+    OPENROUTER_TIMEOUT: float = 60.0
+    OLLAMA_TIMEOUT: float = 120.0
+    STABILITY_TIMEOUT: float = 120.0
 
     @validator('GOOGLE_API_KEY')
     def validate_google_api_key(cls, v, values):
@@ -82,14 +136,85 @@ class Settings(BaseSettings):
     # =============================================================================
     # CONFIGURAÇÕES DE IA
     # =============================================================================
-    DEFAULT_MODEL: str = "gemini-pro"
+    DEFAULT_MODEL: str = "gemini-1.5-pro-latest"  # 1.5+ para saída estruturada (response_schema)
     MAX_TOKENS: int = 2048
     TEMPERATURE: float = 0.7
 
     # Configurações específicas do RAG
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
-    TOP_K_RETRIEVAL: int = 5
+    TOP_K_RETRIEVAL: int = 5  # trechos candidatos; quantos entram depende do orçamento
+
+    # Pools de threads do banco vetorial (ChromaDB e embeddings fora do event loop)
+    VECTOR_STORE_QUERY_WORKERS: int = 4  # buscas RAG e embeddings de consultas
+    VECTOR_STORE_QUERY_MAX_PENDING: int = 64  # fila acima das threads; além disso, quem chama aguarda
+    VECTOR_STORE_INGEST_WORKERS: int = 1  # inserções e remoções de documentos
+    VECTOR_STORE_INGEST_MAX_PENDING: int = 8
+    VECTOR_STORE_INGEST_BATCH_SIZE: int = 128  # chunks por chamada ao ChromaDB na ingestão
+
+    # Processos dedicados aos embeddings da ingestão (0 = modelo do próprio processo)
+    # Opcional: cada processo carrega sua própria cópia do torch + MiniLM (~400-600 MB)
+    EMBEDDING_WORKERS: int = 0
+    EMBEDDING_WORKER_THREADS: int = 2  # threads do torch em cada processo
+
+    # Cache de embeddings por conteúdo (SHA-256 do texto normalizado + modelo)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache.db"  # arquivo SQLite local
+
+    # Recuperação híbrida: índice lexical FTS5 + vetores, fundidos por reciprocal rank fusion
+    RETRIEVAL_MODE: str = "hybrid"  # "hybrid" ou "vector" (pode ser trocado por consulta)
+    HYBRID_CANDIDATES: int = 20  # candidatos de cada lado antes da fusão
+    RRF_K: int = 60  # constante do RRF: score = soma de 1 / (k + posição)
+    LEXICAL_INDEX_PATH: str = "./lexical_index.db"  # arquivo SQLite local (FTS5)
+
+    # Micro-batching dos embeddings de consultas (requisições concorrentes em uma passada do modelo)
+    EMBEDDING_BATCH_ENABLED: bool = True
+    EMBEDDING_BATCH_WINDOW_MS: float = 3.0  # espera máxima para juntar consultas
+    EMBEDDING_BATCH_MAX_SIZE: int = 64  # lote cheio é enviado sem esperar a janela
+
+    # Orçamento de tokens do prompt (contagem aproximada, ver prompt_assembler)
+    AI_CONTEXT_WINDOW_TOKENS: int = 8192  # janela do modelo, incluindo a resposta (MAX_TOKENS)
+    RAG_CONTEXT_MAX_TOKENS: int = 1500  # teto para o bloco de contexto RAG
+    RAG_MIN_CHUNK_TOKENS: int = 40  # trecho truncado menor que isso é descartado
+
+    # Cache semântico de gerações (reaproveita legendas de tópicos quase idênticos)
+    GENERATION_CACHE_ENABLED: bool = True
+    GENERATION_CACHE_SIMILARITY_THRESHOLD: float = 0.92  # similaridade de cosseno mínima
+    GENERATION_CACHE_TTL_SECONDS: int = 86400
+    GENERATION_CACHE_MAX_ENTRIES_PER_PERSONA: int = 200  # total da persona, somando estilos e versões
+
+    # Motor de hashtags (índice local por persona, modelo só para completar)
+    HASHTAG_MIN_SIMILARITY: float = 0.3  # similaridade mínima com o tópico
+    HASHTAG_INDEX_MAX_CHUNKS: int = 2000  # chunks da base analisados por persona
+
+    # Geração de ideias (sobregeração em paralelo + seleção diversificada por MMR)
+    IDEAS_OVERGENERATION_FACTOR: float = 1.5  # ideias pedidas por ideia entregue
+    IDEAS_SUBREQUEST_SIZE: int = 5  # ideias por chamada paralela ao modelo
+    IDEAS_MAX_ROUNDS: int = 2  # rodadas de geração até completar count
+    IDEAS_MMR_LAMBDA: float = 0.7  # peso da relevância frente à diversidade
+    IDEAS_DUPLICATE_SIMILARITY: float = 0.9  # similaridade a partir da qual é duplicata
+
+    # Geração em lote de legendas
+    BATCH_MAX_ITEMS: int = 50
+    BATCH_MAX_CONCURRENCY: int = 4
+
+    # Controle de admissão das rotas de geração (token bucket por usuário, 429 se esgotado)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS_PER_MINUTE: float = 30.0  # reposição do bucket de cada usuário
+    RATE_LIMIT_BURST: int = 10  # gerações seguidas com o bucket cheio
+    RATE_LIMIT_IMAGE_COST: int = 5  # tokens consumidos por imagem (legenda/ideias/hashtags: 1)
+
+    # Refinamento de legendas ("mais curta", "mais emojis") a partir da legenda gerada
+    REFINE_SESSION_TTL_SECONDS: int = 1800
+    REFINE_SESSION_MAX_ENTRIES: int = 500
+
+    # Jobs de geração assíncrona (POST /content/jobs + polling)
+    JOB_WORKERS: int = 2  # workers no próprio processo
+    JOB_TIMEOUT_SECONDS: float = 600.0  # tempo máximo de execução de um job
+    JOB_MAX_ATTEMPTS: int = 3  # execuções iniciadas antes de desistir de um job interrompido
+
+    # Instrumentação da geração (durações por etapa em /health/metrics)
+    SERVER_TIMING_ENABLED: bool = True  # cabeçalho Server-Timing nas rotas de geração
 
     # =============================================================================
     # CONFIGURAÇÕES DE AMBIENTE
@@ -100,6 +225,24 @@ class Settings(BaseSettings):
     def is_production(self) -> bool:
         return self.ENVIRONMENT.lower() == "production"
 
+    @property
+    def text_providers(self) -> List[str]:
+        """Providers de texto adicionais configurados em AI_TEXT_PROVIDERS"""
+        return [
+            name.strip().lower()
+            for name in self.AI_TEXT_PROVIDERS.split(',')
+            if name.strip()
+        ]
+
+    @property
+    def fallback_order(self) -> List[str]:
+        """Ordem de fallback entre providers configurada em AI_FALLBACK_ORDER"""
+        return [
+            name.strip().lower()
+            for name in self.AI_FALLBACK_ORDER.split(',')
+            if name.strip()
+        ]
+
     @property
     def upload_path(self) -> Path:
         """Retorna o caminho completo para a pasta de uploads"""
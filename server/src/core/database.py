@@ -30,6 +30,24 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base para modelos
 Base = declarative_base()
 
+def create_dedicated_session_factory() -> sessionmaker:
+    """
+    Sessões com conexão própria, para gravações em threads de trabalho
+
+    O engine principal usa StaticPool: todas as sessões compartilham uma
+    única conexão, e uma transação em outra thread se misturaria com as das
+    requisições. Banco SQLite em memória só existe nessa conexão e continua
+    usando o engine principal.
+    """
+    if settings.DATABASE_URL.startswith("sqlite") and ":memory:" in settings.DATABASE_URL:
+        return SessionLocal
+    dedicated_engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False, "timeout": 20},
+        echo=settings.DEBUG
+    )
+    return sessionmaker(autocommit=False, autoflush=False, bind=dedicated_engine)
+
 def get_db() -> Generator:
     """
     Dependency para obter sessão do banco de dados.
@@ -51,7 +69,7 @@ async def init_db():
     """
     try:
         # Importar todos os modelos para garantir que sejam registrados
-        from ..models import persona, knowledge_base, user
+        from ..models import persona, knowledge_base, user, generation_job, generation_history
 
         print(" Criando tabelas do banco de dados...")
         Base.metadata.create_all(bind=engine)
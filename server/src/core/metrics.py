@@ -0,0 +1,174 @@
+"""
+Métricas internas da aplicação.
+Registro simples em memória (thread-safe) de contadores, gauges e
+histogramas, exposto em /api/v1/health/metrics para acompanhar caches, filas,
+chamadas aos providers e a duração de cada etapa da geração.
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Limites (em segundos) dos buckets padrão: de 5 ms a 2 minutos
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    """Normaliza labels em uma chave ordenada e hashable"""
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 6) if value is not None else None
+
+
+class Histogram:
+    """Distribuição de observações em buckets cumulativos (estilo Prometheus)"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # último: acima do maior limite
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimativa do quantil por interpolação linear dentro do bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets: List[Dict[str, Any]] = []
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += bucket_count
+            buckets.append({"le": "+Inf" if bound == float("inf") else bound, "count": cumulative})
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else None,
+            "p50": _round(self.quantile(0.5)),
+            "p95": _round(self.quantile(0.95)),
+            "p99": _round(self.quantile(0.99)),
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas em memória
+
+    - Contadores: valores monotônicos identificados por nome + labels
+    - Gauges: valor atual (ex.: profundidade de uma fila)
+    - Histogramas: distribuição de durações (ou tamanhos) por nome + labels
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = defaultdict(dict)
+        self._gauges: Dict[str, Dict[LabelKey, float]] = defaultdict(dict)
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = defaultdict(dict)
+
+    def increment(self, name: str, value: float = 1, **labels: Any):
+        """Incrementa um contador"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def get_counter(self, name: str, **labels: Any) -> float:
+        """Retorna o valor atual de um contador (0 se inexistente)"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def set_gauge(self, name: str, value: float, **labels: Any):
+        """Define o valor atual de um gauge"""
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges[name][key] = value
+
+    def get_gauge(self, name: str, **labels: Any) -> float:
+        """Retorna o valor atual de um gauge (0 se inexistente)"""
+        with self._lock:
+            return self._gauges.get(name, {}).get(_label_key(labels), 0)
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        **labels: Any
+    ):
+        """Registra uma observação em um histograma (buckets só valem na criação)"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def get_histogram(self, name: str, **labels: Any) -> Optional[Dict[str, Any]]:
+        """Resumo de um histograma (None se inexistente)"""
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(_label_key(labels))
+            return histogram.to_dict() if histogram else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna uma cópia serializável de todas as métricas"""
+        with self._lock:
+            return {
+                "counters": {
+                    name: [
+                        {"labels": dict(key), "value": value}
+                        for key, value in series.items()
+                    ]
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: [
+                        {"labels": dict(key), "value": value}
+                        for key, value in series.items()
+                    ]
+                    for name, series in self._gauges.items()
+                },
+                "histograms": {
+                    name: [
+                        {"labels": dict(key), **histogram.to_dict()}
+                        for key, histogram in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                }
+            }
+
+    def reset(self):
+        """Remove todas as métricas (útil em testes e benchmarks)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Instância global
+metrics = MetricsRegistry()
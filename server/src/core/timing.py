@@ -0,0 +1,116 @@
+"""
+Cronometragem das etapas da geração de conteúdo.
+Cada etapa (busca da persona, consulta ao cache, recuperação RAG, montagem do
+prompt, chamada ao modelo, parsing) alimenta o histograma
+generation_stage_seconds e, se houver uma requisição cronometrada em
+andamento, o resumo devolvido no bloco timings e no cabeçalho Server-Timing.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from .metrics import metrics
+
+# Cronômetro da requisição em andamento (propagado para as tasks filhas)
+_current_timer: ContextVar[Optional["RequestTimer"]] = ContextVar("current_request_timer", default=None)
+
+# Tempo gasto em etapas filhas da etapa em andamento (para descontar do tempo dela)
+_parent_children: ContextVar[Optional[List[float]]] = ContextVar("stage_children", default=None)
+
+
+class RequestTimer:
+    """
+    Acumula a duração de cada etapa de uma requisição
+
+    Cada etapa registra apenas o próprio tempo: etapas aninhadas (a chamada
+    de reparo de JSON dentro do parsing, a recuperação RAG dentro da montagem
+    do prompt) são descontadas da etapa externa. Etapas repetidas somam suas
+    durações e contam as ocorrências; como etapas em paralelo também somam,
+    o total das etapas pode passar do tempo de parede da requisição.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def finish(self):
+        """Registra a duração total da requisição no histograma"""
+        metrics.observe("generation_request_seconds", self.elapsed, operation=self.operation)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Bloco timings da resposta (milissegundos)"""
+        return {
+            "total_ms": round(self.elapsed * 1000, 1),
+            "stages": {
+                stage: {"ms": round(seconds * 1000, 1), "count": self.counts[stage]}
+                for stage, seconds in self.stages.items()
+            },
+        }
+
+    def server_timing(self) -> str:
+        """Valor do cabeçalho Server-Timing (https://www.w3.org/TR/server-timing/)"""
+        entries = [
+            f'{stage};dur={seconds * 1000:.1f}' + (
+                f';desc="{self.counts[stage]}x"' if self.counts[stage] > 1 else "")
+            for stage, seconds in self.stages.items()
+        ]
+        entries.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def start_request_timer(operation: str) -> RequestTimer:
+    """Inicia a cronometragem da requisição atual (chamar na rota)"""
+    timer = RequestTimer(operation)
+    _current_timer.set(timer)
+    return timer
+
+
+def activate_timer(timer: RequestTimer):
+    """Torna o cronômetro o atual em outro contexto (ex.: gerador de uma StreamingResponse)"""
+    _current_timer.set(timer)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+def record_stage(stage: str, seconds: float):
+    """Registra a duração de uma etapa já medida"""
+    timer = _current_timer.get()
+    metrics.observe(
+        "generation_stage_seconds",
+        seconds,
+        stage=stage,
+        operation=timer.operation if timer else "background"
+    )
+    if timer is not None:
+        timer.add(stage, seconds)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Mede o bloco como uma etapa, descontando as etapas aninhadas (também em caso de exceção)"""
+    children = [0.0]
+    token = _parent_children.set(children)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _parent_children.reset(token)
+        parent = _parent_children.get()
+        if parent is not None:
+            parent[0] += elapsed
+        record_stage(stage, max(0.0, elapsed - children[0]))
@@ -6,11 +6,17 @@ Centraliza as importações de todos os modelos para facilitar o uso.
 from .user import User
 from .persona import Persona
 from .knowledge_base import KnowledgeBase, DocumentType, ProcessingStatus
+from .generation_job import GenerationJob, JobStatus
+from .generation_history import GenerationRecord, UsageRollup
 
 __all__ = [
     "User",
     "Persona",
     "KnowledgeBase",
     "DocumentType",
-    "ProcessingStatus"
+    "ProcessingStatus",
+    "GenerationJob",
+    "JobStatus",
+    "GenerationRecord",
+    "UsageRollup"
 ]
\ No newline at end of file
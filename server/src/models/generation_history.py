@@ -0,0 +1,85 @@
+"""
+Modelos de dados para o histórico de gerações e os contadores de uso.
+Cada geração (legenda, ideias, hashtags, imagem) vira um registro no
+histórico; os contadores agregados por usuário e por persona em janelas de
+tempo (dia, semana, mês e total) são atualizados a cada registro, de modo que
+as estatísticas de uso são leituras pela chave primária, sem varrer o histórico.
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Index
+from sqlalchemy.sql import func
+
+from ..core.database import Base
+
+class GenerationRecord(Base):
+    """
+    Modelo para o histórico de gerações
+
+    Consultado com paginação por cursor (id decrescente), por isso os índices
+    compostos terminam em id.
+    """
+
+    __tablename__ = "generation_history"
+    __table_args__ = (
+        Index("ix_generation_history_user_id_id", "user_id", "id"),
+        Index("ix_generation_history_user_type_id", "user_id", "generation_type", "id"),
+        Index("ix_generation_history_persona_id_id", "persona_id", "id"),
+    )
+
+    # Campos básicos
+    id = Column(Integer, primary_key=True)
+    generation_type = Column(String(20), nullable=False)  # caption, ideas, hashtags, image, refine
+    topic = Column(String(255))  # Tópico, tipo de conteúdo ou prompt da imagem
+
+    # Relacionamentos
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    persona_id = Column(Integer, ForeignKey("personas.id"))
+
+    # Execução
+    provider = Column(String(100))  # provider:modelo que atendeu
+    latency_ms = Column(Float, default=0.0)
+    prompt_tokens = Column(Integer, default=0)  # Estimativa (prompt_assembler.estimate_tokens)
+    output_tokens = Column(Integer, default=0)  # Estimativa
+    items = Column(Integer, default=1)  # Ideias, hashtags ou imagens geradas
+    cached = Column(Boolean, default=False)  # Atendida pelo cache semântico
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<GenerationRecord(id={self.id}, type='{self.generation_type}', user_id={self.user_id})>"
+
+class UsageRollup(Base):
+    """
+    Contadores de uso agregados
+
+    Chave: escopo (user ou persona) + id, período (day, week, month, all) +
+    bucket ("2025-01-31", "2025-W05", "2025-01", "all") e tipo de geração.
+    """
+
+    __tablename__ = "usage_rollups"
+
+    # Chave
+    scope = Column(String(10), primary_key=True)  # user, persona
+    scope_id = Column(Integer, primary_key=True)
+    period = Column(String(10), primary_key=True)  # day, week, month, all
+    bucket = Column(String(10), primary_key=True)
+    generation_type = Column(String(20), primary_key=True)
+
+    # Contadores
+    count = Column(Integer, default=0, nullable=False)
+    cached_count = Column(Integer, default=0, nullable=False)
+    items = Column(Integer, default=0, nullable=False)
+    total_latency_ms = Column(Float, default=0.0, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    output_tokens = Column(Integer, default=0, nullable=False)
+
+    # Timestamps
+    first_generated_at = Column(DateTime(timezone=True))
+    last_generated_at = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return (
+            f"<UsageRollup({self.scope}={self.scope_id}, {self.period}={self.bucket}, "
+            f"type='{self.generation_type}', count={self.count})>"
+        )
@@ -0,0 +1,57 @@
+"""
+Modelo de dados para jobs de geração assíncrona.
+Registra solicitações longas (ideias, imagens, lotes de legendas) executadas
+pelo pool de workers, permitindo consultar o resultado depois (submit/poll).
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey
+from sqlalchemy.sql import func
+from enum import Enum as PyEnum
+
+from ..core.database import Base
+
+class JobStatus(PyEnum):
+    """Status de um job de geração"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class GenerationJob(Base):
+    """
+    Modelo para jobs de geração
+
+    O corpo da solicitação fica em payload (mesmo formato das rotas
+    síncronas) e o resultado, ao terminar, em result. Jobs em queued ou
+    running quando o servidor reinicia são recolocados na fila no startup.
+    """
+
+    __tablename__ = "generation_jobs"
+
+    # Campos básicos
+    id = Column(String(36), primary_key=True, index=True)  # UUID
+    job_type = Column(String(30), nullable=False)  # caption, ideas, hashtags, image, caption_batch
+
+    # Relacionamentos
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    persona_id = Column(Integer, ForeignKey("personas.id"))
+
+    # Execução
+    status = Column(String(20), default=JobStatus.QUEUED.value, index=True)
+    payload = Column(JSON, nullable=False)
+    result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, default=0)  # Execuções iniciadas (inclui as interrompidas)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<GenerationJob(id='{self.id}', type='{self.job_type}', status='{self.status}')>"
+
+    @property
+    def is_finished(self) -> bool:
+        """Verifica se o job terminou (com sucesso ou falha)"""
+        return self.status in (JobStatus.COMPLETED.value, JobStatus.FAILED.value)
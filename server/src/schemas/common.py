@@ -4,6 +4,7 @@ Define a estrutura dos dados que a API aceita e retorna.
 """
 
 from pydantic import BaseModel, EmailStr, validator
+import re
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -181,4 +182,65 @@ class PersonaResponse(BaseSchema):
         if not self.brand_voice:
             return "Não definido"
         traits = self.brand_voice.get('traits', [])
-        return ', '.join(traits[:3]) if traits else "Não definido"
\ No newline at end of file
+        return ', '.join(traits[:3]) if traits else "Não definido"
+
+# =============================================================================
+# CONTENT GENERATION SCHEMAS (respostas do modelo)
+# =============================================================================
+
+def _split_list(v):
+    """Aceita listas ou strings separadas por vírgula/espaço vindas do modelo"""
+    if v is None:
+        return []
+    if isinstance(v, str):
+        return [item for item in re.split(r"[,\s]+", v) if item]
+    return [str(item).strip() for item in v if str(item).strip()]
+
+def _normalize_hashtags(v):
+    """Garante o prefixo # em cada hashtag"""
+    return [tag if tag.startswith('#') else f"#{tag}" for tag in _split_list(v)]
+
+class GeneratedCaption(BaseSchema):
+    """Legenda retornada pelo modelo"""
+    caption: str
+    hashtags: List[str]
+    call_to_action: str
+    emoji_suggestions: List[str] = []
+    tone_analysis: str = ""
+
+    @validator('hashtags', pre=True)
+    def normalize_hashtags(cls, v):
+        return _normalize_hashtags(v)
+
+    @validator('emoji_suggestions', pre=True)
+    def normalize_emojis(cls, v):
+        return _split_list(v)
+
+    @validator('caption')
+    def validate_caption(cls, v):
+        if not v.strip():
+            raise ValueError('Legenda vazia')
+        return v.strip()
+
+class GeneratedIdea(BaseSchema):
+    """Ideia de conteúdo retornada pelo modelo"""
+    title: str
+    description: str
+    content_type: str = ""
+    engagement_goal: str = ""
+    key_elements: List[str] = []
+    trending_potential: str = ""
+
+    @validator('key_elements', pre=True)
+    def normalize_key_elements(cls, v):
+        if isinstance(v, str):
+            return [item.strip() for item in v.split(',') if item.strip()]
+        return v or []
+
+class GeneratedHashtags(BaseSchema):
+    """Hashtags retornadas pelo modelo"""
+    hashtags: List[str]
+
+    @validator('hashtags', pre=True)
+    def normalize_hashtags(cls, v):
+        return _normalize_hashtags(v)
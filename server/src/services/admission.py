@@ -0,0 +1,237 @@
+"""
+Controle de admissão das rotas de geração.
+Cada usuário tem um token bucket (rajada curta + reposição contínua) e cada
+upstream (provider de texto, API de imagens) tem um limite global de chamadas
+simultâneas servido por uma fila justa: as vagas são distribuídas em rodízio
+entre os usuários que estão esperando, e não por ordem de chegada, para que
+um script disparando dezenas de requisições não deixe os demais sem vez.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict
+
+from ..core.config import settings
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Cliente (usuário) da requisição em andamento, usado na fila justa
+_current_client: ContextVar[str] = ContextVar("admission_client", default="anonymous")
+
+# Limite de buckets em memória antes de descartar os que já estão cheios
+MAX_TRACKED_CLIENTS = 10000
+
+
+class RateLimitExceededError(Exception):
+    """Usuário sem tokens no bucket; retry_after em segundos"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Limite de requisições atingido, tente em {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def set_current_client(client: Any):
+    """Define o usuário da requisição atual (propagado para as tasks filhas)"""
+    _current_client.set(str(client))
+
+
+def current_client() -> str:
+    return _current_client.get()
+
+
+class TokenBucket:
+    """Bucket com capacidade fixa, reabastecido a rate tokens por segundo"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float) -> float:
+        """
+        Consome cost tokens
+
+        Returns:
+            0 se admitido ou os segundos até haver tokens suficientes
+        """
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def give_back(self, cost: float):
+        """Devolve tokens consumidos (limitado à capacidade)"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class FairSemaphore:
+    """
+    Semáforo com fila justa entre clientes
+
+    Até capacity chamadas simultâneas; quem não consegue vaga entra na fila
+    do seu cliente (current_client) e, a cada vaga liberada, o próximo
+    cliente do rodízio é atendido. Sem fila, a vaga é concedida direto.
+    """
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self._active = 0
+        self._depth = 0
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    def _publish(self):
+        metrics.set_gauge("admission_queue_depth", self._depth, upstream=self.name)
+        metrics.set_gauge("admission_in_flight", self._active, upstream=self.name)
+
+    def _observe_wait(self, seconds: float):
+        metrics.observe("admission_queue_wait_seconds", seconds, upstream=self.name)
+
+    async def acquire(self):
+        if self._active < self.capacity and not self._depth:
+            self._active += 1
+            self._publish()
+            self._observe_wait(0.0)
+            return
+
+        client = current_client()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client, deque()).append(future)
+        self._depth += 1
+        self._publish()
+
+        started = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # A vaga já tinha sido repassada: devolvê-la ao próximo da fila
+                self.release()
+            else:
+                self._discard(client, future)
+            raise
+        finally:
+            self._observe_wait(time.perf_counter() - started)
+
+    def _discard(self, client: str, future: asyncio.Future):
+        queue = self._waiters.get(client)
+        if queue and future in queue:
+            queue.remove(future)
+            self._depth -= 1
+            if not queue:
+                del self._waiters[client]
+            self._publish()
+
+    def release(self):
+        """Repassa a vaga ao próximo cliente do rodízio (ou a libera)"""
+        while self._waiters:
+            client, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            self._depth -= 1
+            if queue:
+                self._waiters.move_to_end(client)
+            else:
+                del self._waiters[client]
+            if not future.done():
+                future.set_result(None)
+                self._publish()
+                return
+
+        self._active -= 1
+        self._publish()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "in_flight": self._active,
+            "queued": self._depth,
+            "queued_clients": len(self._waiters),
+        }
+
+
+class AdmissionController:
+    """Token bucket por usuário na entrada das rotas de geração"""
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_CLIENTS:
+                # Buckets cheios equivalem a um bucket novo
+                self._buckets = {
+                    key: value for key, value in self._buckets.items() if not value.full
+                }
+            bucket = self._buckets[client] = TokenBucket(
+                settings.RATE_LIMIT_REQUESTS_PER_MINUTE / 60.0,
+                max(1, settings.RATE_LIMIT_BURST)
+            )
+        return bucket
+
+    def admit(self, client: Any, cost: float = 1, route: str = "") -> None:
+        """
+        Admite a requisição do usuário e o define como cliente atual
+
+        O custo é limitado à capacidade do bucket (um lote grande esvazia o
+        bucket, mas continua possível).
+
+        Raises:
+            RateLimitExceededError: bucket sem tokens suficientes
+        """
+        client = str(client)
+        set_current_client(client)
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        retry_after = self._bucket(client).take(min(cost, max(1, settings.RATE_LIMIT_BURST)))
+        if retry_after:
+            metrics.increment("admission_rejected_total", route=route or "unknown")
+            logger.warning(f"🚦 Usuário {client} acima do limite ({route}), retry em {retry_after:.1f}s")
+            raise RateLimitExceededError(retry_after)
+        metrics.increment("admission_admitted_total", route=route or "unknown")
+
+    def refund(self, client: Any, cost: float = 1, route: str = "") -> None:
+        """Devolve os tokens de uma requisição admitida que não chegou a ser atendida"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        bucket = self._buckets.get(str(client))
+        if bucket is not None:
+            bucket.give_back(min(cost, max(1, settings.RATE_LIMIT_BURST)))
+            metrics.increment("admission_refunded_total", route=route or "unknown")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.RATE_LIMIT_ENABLED,
+            "requests_per_minute": settings.RATE_LIMIT_REQUESTS_PER_MINUTE,
+            "burst": settings.RATE_LIMIT_BURST,
+            "tracked_clients": len(self._buckets),
+        }
+
+
+# Instância global
+admission = AdmissionController()
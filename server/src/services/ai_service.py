@@ -1,21 +1,115 @@
 """
 Serviço de IA para geração de texto.
-Suporta múltiplos providers: Google Gemini, OpenRouter (modelos free) e Ollama (local).
+Suporta múltiplos providers: Google Gemini, OpenRouter (modelos free), Ollama (local)
+e replay (respostas gravadas, para testes de carga).
 """
 
+import asyncio
 import json
 import logging
+import math
+import time
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
 
-import google.generativeai as genai
-import httpx
+from pydantic import BaseModel, ValidationError
 
 from ..core.config import settings
+from ..core.metrics import metrics
+from ..core.timing import record_stage, stage_timer
+from ..schemas.common import GeneratedCaption, GeneratedHashtags, GeneratedIdea
+from .generation_cache import CacheTicket, generation_cache
+from .idea_selector import select_diverse
+from .json_extractor import StreamingJSONExtractor, extract_json
+from .persona_context import CompiledPersonaContext, persona_context_cache
+from .prompt_assembler import estimate_tokens, prompt_assembler
+from .provider_router import ProviderRouter
+from .refine_sessions import RefineSession, refine_sessions
+from .single_flight import SingleFlight
+from .text_providers import (
+    PROVIDER_CLASSES,
+    TextProvider,
+    create_text_provider,
+    start_continuation_capture,
+    stop_continuation_capture,
+)
 from .vector_store import vector_store
 
 logger = logging.getLogger(__name__)
 
+# Marca as legendas em que o modelo não retornou JSON válido
+FREE_TEXT_TONE_ANALYSIS = "Geração em texto livre"
+
+# Provider/modelo que respondeu à geração em andamento (por task)
+_current_model_used: ContextVar[Optional[str]] = ContextVar("current_model_used", default=None)
+_current_provider: ContextVar[Optional[TextProvider]] = ContextVar("current_provider", default=None)
+
+# Schemas das respostas em JSON (enviados aos providers com saída estruturada;
+# nos demais, o exemplo gerado a partir das descrições vai no prompt)
+CAPTION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "caption": {"type": "string", "description": "Legenda principal aqui..."},
+        "hashtags": {"type": "array", "items": {"type": "string", "description": "#hashtag"}},
+        "call_to_action": {"type": "string", "description": "Call to action específica"},
+        "emoji_suggestions": {"type": "array", "items": {"type": "string", "description": "😊"}},
+        "tone_analysis": {"type": "string", "description": "análise do tom usado"},
+    },
+    "required": ["caption", "hashtags", "call_to_action", "emoji_suggestions", "tone_analysis"],
+}
+
+IDEA_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "description": "Título da ideia"},
+        "description": {"type": "string", "description": "Descrição detalhada"},
+        "content_type": {"type": "string", "description": "tipo específico"},
+        "engagement_goal": {"type": "string", "description": "objetivo de engajamento"},
+        "key_elements": {"type": "array", "items": {"type": "string", "description": "elemento"}},
+        "trending_potential": {"type": "string", "description": "alto/médio/baixo"},
+    },
+    "required": ["title", "description", "content_type", "engagement_goal",
+                 "key_elements", "trending_potential"],
+}
+
+CAPTION_RESPONSE = {"name": "instagram_caption", "schema": CAPTION_SCHEMA}
+HASHTAGS_RESPONSE = {
+    "name": "hashtags",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "hashtags": {"type": "array", "items": {"type": "string", "description": "#hashtag"}}
+        },
+        "required": ["hashtags"],
+    },
+}
+
+# Orientação do prompt de hashtags para cada mix_strategy
+HASHTAG_STRATEGY_HINTS = {
+    "popular": "hashtags populares, de alto alcance",
+    "niche": "hashtags de nicho, específicas e com menos concorrência",
+    "balanced": "mistura equilibrada de hashtags populares e de nicho",
+}
+
+# Ângulos distribuídos entre sub-requisições paralelas de ideias (diversidade)
+IDEA_ANGLES = [
+    "educativo, ensinando algo útil",
+    "bastidores e humanização da marca",
+    "interação com a audiência (perguntas, enquetes, desafios)",
+    "entretenimento e tendências",
+    "prova social e resultados",
+]
+
+IDEAS_RESPONSE = {
+    "name": "content_ideas",
+    "schema": {
+        "type": "object",
+        "properties": {"ideas": {"type": "array", "items": IDEA_SCHEMA}},
+        "required": ["ideas"],
+    },
+}
+
 
 class AIService:
     """
@@ -25,150 +119,118 @@ class AIService:
     - google: Google Gemini via AI Studio (grátis, requer GOOGLE_API_KEY)
     - openrouter: OpenRouter com modelos gratuitos (requer OPENROUTER_API_KEY)
     - ollama: Modelos locais via Ollama (100% grátis, sem API key)
+    - replay: Respostas gravadas/simuladas, sem chamadas externas (testes de carga)
+
+    AI_TEXT_PROVIDER define o provider principal; AI_TEXT_PROVIDERS permite
+    manter outros ativos ao mesmo tempo para o roteamento por latência.
     """
 
     def __init__(self):
         self.provider = settings.AI_TEXT_PROVIDER.lower()
-        self.model = None
-        self._initialize_provider()
-
-    def _initialize_provider(self):
-        """Inicializa o provider configurado"""
-        try:
-            if self.provider == "google":
-                self._initialize_gemini()
-            elif self.provider == "openrouter":
-                self._initialize_openrouter()
-            elif self.provider == "ollama":
-                self._initialize_ollama()
-            else:
-                logger.warning(
-                    f"Provider desconhecido '{self.provider}', usando google como fallback")
-                self.provider = "google"
-                self._initialize_gemini()
-        except Exception as e:
-            logger.error(
-                f"❌ Erro ao inicializar provider {self.provider}: {e}")
-            raise
+        self.providers: Dict[str, TextProvider] = {}
+        self._caption_flights = SingleFlight("caption")
+        self._initialize_providers()
+        self.router = ProviderRouter(self.providers, primary=self.provider)
 
-    def _initialize_gemini(self):
-        """Inicializa Google Gemini"""
-        if not settings.GOOGLE_API_KEY:
-            raise ValueError(
-                "GOOGLE_API_KEY não configurada!\n"
-                "Obtenha GRÁTIS em: https://aistudio.google.com/app/apikey"
-            )
-
-        genai.configure(api_key=settings.GOOGLE_API_KEY)
+    def _initialize_providers(self):
+        """
+        Inicializa o provider principal e os adicionais de AI_TEXT_PROVIDERS
 
-        generation_config = {
-            "temperature": settings.TEMPERATURE,
-            "top_p": 0.95,
-            "top_k": 64,
-            "max_output_tokens": settings.MAX_TOKENS,
-        }
+        Falha no provider principal interrompe a inicialização; providers
+        adicionais mal configurados são apenas ignorados.
+        """
+        if self.provider not in PROVIDER_CLASSES:
+            logger.warning(
+                f"Provider desconhecido '{self.provider}', usando google como fallback")
+            self.provider = "google"
 
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+        names = [self.provider] + [
+            name for name in settings.text_providers if name != self.provider
         ]
 
-        self.model = genai.GenerativeModel(
-            model_name=settings.DEFAULT_MODEL,
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
-
-        logger.info(f"✅ Google Gemini inicializado: {settings.DEFAULT_MODEL}")
-
-    def _initialize_openrouter(self):
-        """Inicializa OpenRouter"""
-        if not settings.OPENROUTER_API_KEY:
-            raise ValueError(
-                "OPENROUTER_API_KEY não configurada!\n"
-                "Crie conta GRÁTIS em: https://openrouter.ai/\n"
-                "Modelos gratuitos disponíveis!"
-            )
-
-        self.model = {
-            "api_key": settings.OPENROUTER_API_KEY,
-            "model": settings.OPENROUTER_MODEL,
-            "base_url": "https://openrouter.ai/api/v1"
-        }
-
-        logger.info(f"✅ OpenRouter inicializado: {settings.OPENROUTER_MODEL}")
+        for name in names:
+            try:
+                self.providers[name] = create_text_provider(name)
+            except Exception as e:
+                if name == self.provider:
+                    logger.error(
+                        f"❌ Erro ao inicializar provider {name}: {e}")
+                    raise
+                logger.warning(f"⚠️ Provider adicional {name} ignorado: {e}")
+
+    async def warm_up(self):
+        """
+        Aquece os providers que suportam (Ollama carrega o modelo e o mantém
+        por OLLAMA_KEEP_ALIVE); falhas são apenas registradas
+        """
+        for name, provider in self.providers.items():
+            try:
+                if await provider.warm_up():
+                    logger.info(f"🔥 Provider {provider.label} aquecido")
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao aquecer provider {name}: {e}")
 
-    def _initialize_ollama(self):
-        """Inicializa Ollama (local)"""
-        self.model = {
-            "base_url": settings.OLLAMA_BASE_URL,
-            "model": settings.OLLAMA_MODEL
-        }
+    def _model_used(self) -> str:
+        """Provider/modelo que atendeu a geração atual"""
+        return _current_model_used.get() or self.providers[self.provider].label
 
-        logger.info(
-            f"✅ Ollama inicializado: {settings.OLLAMA_MODEL} @ {settings.OLLAMA_BASE_URL}")
-
-    async def _generate_text(self, prompt: str) -> str:
-        """Gera texto usando o provider configurado"""
-        if self.provider == "google":
-            response = self.model.generate_content(prompt)
-            return response.text
-
-        elif self.provider == "openrouter":
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.post(
-                    f"{self.model['base_url']}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.model['api_key']}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": self.model['model'],
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": settings.TEMPERATURE,
-                        "max_tokens": settings.MAX_TOKENS,
-                    }
-                )
+    def current_model_used(self) -> str:
+        """Provider/modelo da última geração desta requisição (para o histórico de uso)"""
+        return self._model_used()
 
-                if response.status_code != 200:
-                    logger.error(f"OpenRouter error: {response.text}")
-                    raise ValueError("Erro ao gerar texto via OpenRouter")
-
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
-
-        elif self.provider == "ollama":
-            async with httpx.AsyncClient(timeout=120) as client:
-                response = await client.post(
-                    f"{self.model['base_url']}/api/generate",
-                    json={
-                        "model": self.model['model'],
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "temperature": settings.TEMPERATURE,
-                            "num_predict": settings.MAX_TOKENS,
-                        }
-                    }
-                )
+    def _sent_prompt_tokens(self, prompt: str, response_schema: Optional[Dict[str, Any]]) -> int:
+        """
+        Tokens do prompt como foi enviado ao provider que respondeu, incluindo
+        a descrição do formato JSON quando ela vai no prompt (chamar logo após
+        a geração, antes de reparos de JSON)
+        """
+        provider = _current_provider.get() or self.providers[self.provider]
+        return estimate_tokens(provider.prepare_prompt(prompt, response_schema))
 
-                if response.status_code != 200:
-                    logger.error(f"Ollama error: {response.text}")
-                    raise ValueError(
-                        "Erro ao conectar ao Ollama.\n"
-                        "Certifique-se de que está rodando: ollama serve"
-                    )
+    def _schema_overhead_tokens(self, response_schema: Dict[str, Any]) -> int:
+        """
+        Tokens que a descrição do formato pode acrescentar ao prompt
 
-                data = response.json()
-                return data["response"]
+        O provider só é escolhido na hora da chamada: reserva o maior
+        acréscimo entre os providers ativos.
+        """
+        return max(
+            (estimate_tokens(provider.schema_instructions(response_schema))
+             for provider in self.providers.values()),
+            default=0
+        )
 
-        raise ValueError(f"Provider não suportado: {self.provider}")
+    async def _generate_text(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Gera texto no provider escolhido pelo roteador (JSON se response_schema for dado)"""
+        with stage_timer("llm"):
+            text, provider = await self.router.generate(prompt, response_schema)
+        _current_model_used.set(provider.label)
+        _current_provider.set(provider)
+        return text
+
+    async def _stream_text(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Gera texto em streaming, repassando os tokens conforme chegam"""
+        started = time.perf_counter()
+        first_token = True
+        try:
+            async for token, provider in self.router.stream(prompt, response_schema):
+                if first_token:
+                    first_token = False
+                    metrics.observe(
+                        "llm_time_to_first_token_seconds", time.perf_counter() - started)
+                _current_model_used.set(provider.label)
+                _current_provider.set(provider)
+                yield token
+        finally:
+            record_stage("llm", time.perf_counter() - started)
 
     def _build_persona_context(self, persona_data: Dict[str, Any]) -> str:
         """Constrói contexto detalhado da persona para o prompt"""
@@ -237,72 +299,103 @@ class AIService:
 
         return "\\n".join(context_parts)
 
-    async def _get_relevant_context(self, persona_id: int, query: str) -> str:
-        """Recupera contexto relevante do banco vetorial (RAG)"""
-        try:
-            # Buscar documentos similares
-            similar_docs = await vector_store.search_similar_content(
-                persona_id=persona_id,
-                query=query,
-                n_results=settings.TOP_K_RETRIEVAL
-            )
-
-            if not similar_docs:
-                return ""
-
-            # Construir contexto
-            context_parts = ["CONTEXTO DA BASE DE CONHECIMENTO:"]
-
-            # Limitar a 3 documentos
-            for i, doc in enumerate(similar_docs[:3], 1):
-                content = doc['content'][:500]  # Limitar tamanho
-                metadata = doc.get('metadata', {})
+    def _compiled_persona_context(self, persona_data: Dict[str, Any]) -> CompiledPersonaContext:
+        """Contexto da persona pré-compilado por versão (ver persona_context_cache)"""
+        return persona_context_cache.get_context(persona_data, self._build_persona_context)
 
-                doc_info = f"Documento {i}"
-                if metadata.get('title'):
-                    doc_info += f" - {metadata['title']}"
+    async def _get_relevant_context(
+        self,
+        persona_id: int,
+        query: str,
+        base_prompt: str = "",
+        reserved_tokens: int = 0
+    ) -> str:
+        """
+        Recupera contexto relevante do banco vetorial (RAG)
 
-                context_parts.append(f"{doc_info}:")
-                context_parts.append(content)
-                context_parts.append("---")
+        base_prompt é o prompt já montado sem o contexto RAG e reserved_tokens
+        o que ainda será inserido nele (contexto da persona e a descrição do
+        formato JSON, quando vai no prompt); o que sobra da janela de
+        contexto define quantos trechos cabem.
+        """
+        try:
+            # Buscar documentos relevantes (vetorial + lexical, conforme RETRIEVAL_MODE)
+            with stage_timer("retrieval"):
+                similar_docs = await vector_store.search_similar_content(
+                    persona_id=persona_id,
+                    query=query,
+                    n_results=settings.TOP_K_RETRIEVAL
+                )
 
-            return "\\n".join(context_parts)
+            return self._format_rag_context(
+                similar_docs, prompt_assembler.rag_budget(base_prompt, reserved_tokens))
 
         except Exception as e:
             logger.error(f"❌ Erro ao recuperar contexto RAG: {e}")
             return ""
 
-    async def generate_instagram_caption(
+    def _format_rag_context(
         self,
-        persona_data: Dict[str, Any],
-        topic: str,
-        style: str = "engajamento",
-        include_hashtags: bool = True
-    ) -> Dict[str, Any]:
-        """
-        Gera legenda para post do Instagram
+        similar_docs: List[Dict[str, Any]],
+        budget_tokens: int
+    ) -> str:
+        """Formata os documentos recuperados que cabem no orçamento de tokens"""
+        selected = prompt_assembler.select_chunks(similar_docs, budget_tokens)
+        if not selected:
+            return ""
 
-        Args:
-            persona_data: Dados da persona
-            topic: Tópico/tema do post
-            style: Estilo da legenda (engajamento, informativo, storytelling)
-            include_hashtags: Se deve incluir hashtags
+        # Construir contexto
+        context_parts = ["CONTEXTO DA BASE DE CONHECIMENTO:"]
 
-        Returns:
-            Dict com legenda, hashtags e metadados
-        """
-        try:
-            # Construir contexto da persona
-            persona_context = self._build_persona_context(persona_data)
+        # Documentos em ordem de relevância, o último possivelmente truncado
+        for i, (doc, content) in enumerate(selected, 1):
+            metadata = doc.get('metadata', {})
+
+            doc_info = f"Documento {i}"
+            if metadata.get('title'):
+                doc_info += f" - {metadata['title']}"
 
-            # Recuperar contexto RAG
+            context_parts.append(f"{doc_info}:")
+            context_parts.append(content)
+            context_parts.append("---")
+
+        return "\\n".join(context_parts)
+
+    async def _prepare_caption_prompt(
+        self,
+        persona_data: Dict[str, Any],
+        topic: str,
+        style: str,
+        include_hashtags: bool
+    ) -> str:
+        """Monta o prompt de legenda com contexto da persona e RAG"""
+        with stage_timer("prompt"):
+            # Contexto da persona (pré-compilado por versão)
+            persona_context = self._compiled_persona_context(persona_data)
+
+            # Recuperar contexto RAG dentro do espaço que sobra no prompt
+            base_prompt = self._render_caption_prompt(
+                "", "", topic, style, include_hashtags)
             rag_context = await self._get_relevant_context(
                 persona_data.get('id'),
-                topic
+                topic,
+                base_prompt,
+                persona_context.token_count + self._schema_overhead_tokens(CAPTION_RESPONSE)
             )
 
-        # Construir prompt
-            prompt = f"""
+            return self._render_caption_prompt(
+                persona_context.text, rag_context, topic, style, include_hashtags)
+
+    def _render_caption_prompt(
+        self,
+        persona_context: str,
+        rag_context: str,
+        topic: str,
+        style: str,
+        include_hashtags: bool
+    ) -> str:
+        """Preenche o template do prompt de legenda"""
+        return f"""
 Você é um especialista em criação de conteúdo para Instagram. Sua tarefa é gerar uma legenda autêntica e envolvente baseada na persona e contexto fornecidos.
 
 {persona_context}
@@ -321,87 +414,717 @@ INSTRUÇÕES:
 5. Se incluir hashtags, misture hashtags populares e de nicho
 6. Use emojis conforme as preferências da persona
 7. Inclua uma call-to-action apropriada
+"""
+
+    def _extract_response_json(
+        self,
+        response_text: str,
+        kind: str,
+        extractor: Optional[StreamingJSONExtractor] = None,
+        allow_list: bool = False
+    ) -> Any:
+        """
+        Extrai o JSON da resposta do modelo (blocos ```json, texto em volta,
+        resposta truncada), registrando recuperações e falhas por tipo
+        """
+        if extractor is None:
+            extractor = StreamingJSONExtractor(allow_list=allow_list)
+            extractor.feed(response_text)
+        data = extractor.finish()
+
+        if data is None:
+            metrics.increment("llm_json_parse_failures_total", kind=kind)
+            logger.warning(f"⚠️ Resposta sem JSON válido ({kind})")
+        elif extractor.recovered:
+            metrics.increment("llm_json_recovered_total", kind=kind)
+        return data
+
+    @staticmethod
+    def _validate_fields(
+        schema: Type[BaseModel],
+        data: Dict[str, Any]
+    ) -> Tuple[Optional[BaseModel], List[str]]:
+        """Valida o JSON no schema: (objeto, []) ou (None, campos ausentes ou inválidos)"""
+        try:
+            return schema(**data), []
+        except ValidationError as e:
+            return None, sorted({str(error['loc'][0]) for error in e.errors() if error['loc']})
 
-FORMATO DE RESPOSTA (JSON):
-{{
-    "caption": "Legenda principal aqui...",
-    "hashtags": ["#hashtag1", "#hashtag2", "..."],
-    "call_to_action": "Call to action específica",
-    "emoji_suggestions": ["😊", "🚀", "..."],
-    "tone_analysis": "análise do tom usado"
-}}
+    async def _complete_missing_fields(
+        self,
+        schema: Type[BaseModel],
+        data: Dict[str, Any],
+        kind: str,
+        task: str,
+        json_schema: Dict[str, Any]
+    ) -> Optional[BaseModel]:
+        """
+        Valida o JSON no schema; se faltarem campos (ou vierem inválidos),
+        pede ao modelo apenas esses campos em uma chamada curta
 
-Gere apenas o JSON, sem texto adicional.
+        Returns:
+            Objeto validado ou None se continuar incompleto
+        """
+        validated, missing = self._validate_fields(schema, data)
+        if validated is not None:
+            return validated
+
+        metrics.increment("llm_json_field_repairs_total", kind=kind)
+        logger.info(f"🩹 Completando campos ausentes ({kind}): {', '.join(missing)}")
+
+        partial = {key: value for key, value in data.items() if key not in missing}
+        prompt = f"""
+{task}
+
+O JSON abaixo está incompleto:
+{json.dumps(partial, ensure_ascii=False)}
+
+Gere apenas os campos ausentes: {", ".join(missing)}.
 """
+        missing_schema = {
+            "name": f"{kind}_missing_fields",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    key: json_schema["properties"][key]
+                    for key in missing if key in json_schema["properties"]
+                },
+                "required": [key for key in missing if key in json_schema["properties"]],
+            }
+        }
+        try:
+            patch = extract_json(await self._generate_text(prompt, missing_schema))
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível completar os campos ({kind}): {e}")
+            patch = None
 
-            # Gerar resposta usando provider configurado
-            response_text = await self._generate_text(prompt)
+        if isinstance(patch, dict):
+            partial.update({key: patch[key] for key in missing if key in patch})
+
+        try:
+            return schema(**partial)
+        except ValidationError:
+            metrics.increment("llm_json_parse_failures_total", kind=kind)
+            return None
+
+    async def _complete_missing_fields_batch(
+        self,
+        schema: Type[BaseModel],
+        items: List[Dict[str, Any]],
+        kind: str,
+        task: str,
+        json_schema: Dict[str, Any]
+    ) -> List[Optional[BaseModel]]:
+        """
+        Como _complete_missing_fields para uma lista de objetos: os incompletos
+        são completados juntos em uma única chamada, que devolve uma lista de
+        {index, campos ausentes}
+
+        Returns:
+            Um objeto validado (ou None, se continuar incompleto) por item
+        """
+        validated: List[Optional[BaseModel]] = []
+        incomplete: Dict[int, List[str]] = {}
+        for index, data in enumerate(items):
+            model, missing = self._validate_fields(schema, data)
+            validated.append(model)
+            if model is None:
+                incomplete[index] = missing
+        if not incomplete:
+            return validated
+
+        fields = sorted({
+            key for missing in incomplete.values() for key in missing
+            if key in json_schema["properties"]
+        })
+        metrics.increment("llm_json_field_repairs_total", len(incomplete), kind=kind)
+        logger.info(f"🩹 Completando campos ausentes de {len(incomplete)} itens ({kind}): {', '.join(fields)}")
+
+        partials = {
+            index: {key: value for key, value in items[index].items() if key not in missing}
+            for index, missing in incomplete.items()
+        }
+        listing = "\n".join(
+            f"{index}: {json.dumps(partial, ensure_ascii=False)} (ausentes: {', '.join(incomplete[index])})"
+            for index, partial in partials.items()
+        )
+        prompt = f"""
+{task}
+
+Os itens abaixo estão incompletos (índice: JSON):
+{listing}
+
+Para cada item, gere apenas os campos ausentes indicados, com o mesmo índice.
+"""
+        missing_schema = {
+            "name": f"{kind}_missing_fields",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "items": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "index": {"type": "integer", "description": "índice do item"},
+                                **{key: json_schema["properties"][key] for key in fields},
+                            },
+                            "required": ["index"],
+                        },
+                    }
+                },
+                "required": ["items"],
+            }
+        }
+        try:
+            patch = extract_json(await self._generate_text(prompt, missing_schema), allow_list=True)
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível completar os campos ({kind}): {e}")
+            patch = None
+
+        # Aceitar {"items": [...]} ou a lista diretamente
+        patches = patch.get('items') if isinstance(patch, dict) else patch
+        for entry in patches if isinstance(patches, list) else []:
+            index = entry.get('index') if isinstance(entry, dict) else None
+            if isinstance(index, int) and index in partials:
+                partials[index].update({key: entry[key] for key in incomplete[index] if key in entry})
+
+        for index, partial in partials.items():
+            try:
+                validated[index] = schema(**partial)
+            except ValidationError:
+                metrics.increment("llm_json_parse_failures_total", kind=kind)
+        return validated
+
+    async def _parse_caption_response(
+        self,
+        response_text: str,
+        persona_data: Dict[str, Any],
+        topic: str,
+        style: str,
+        include_hashtags: bool = True,
+        extractor: Optional[StreamingJSONExtractor] = None
+    ) -> Dict[str, Any]:
+        """Converte a resposta do modelo no dicionário de legenda"""
+        with stage_timer("parse"):
+            data = self._extract_response_json(response_text, "caption", extractor)
+
+            caption = None
+            if isinstance(data, dict):
+                if not include_hashtags:
+                    data.setdefault('hashtags', [])
+                caption = await self._complete_missing_fields(
+                    GeneratedCaption, data, "caption",
+                    f'Legenda para Instagram sobre "{topic}" (estilo: {style}).',
+                    CAPTION_SCHEMA)
+
+        if caption is not None:
+            result = caption.dict()
+
+            # Adicionar metadados
+            result['generated_at'] = datetime.now().isoformat()
+            result['model_used'] = self._model_used()
+            result['persona_id'] = persona_data.get('id')
+            result['topic'] = topic
+            result['style'] = style
+
+            logger.info(
+                f"✅ Legenda gerada para persona {persona_data.get('id')}")
+            return result
+
+        else:
+            # Fallback se não conseguir parsear JSON
+            return {
+                "caption": response_text,
+                "hashtags": [],
+                "call_to_action": "",
+                "emoji_suggestions": [],
+                "tone_analysis": FREE_TEXT_TONE_ANALYSIS,
+                "generated_at": datetime.now().isoformat(),
+                "model_used": self._model_used(),
+                "persona_id": persona_data.get('id'),
+                "topic": topic,
+                "style": style
+            }
+
+    async def generate_instagram_caption(
+        self,
+        persona_data: Dict[str, Any],
+        topic: str,
+        style: str = "engajamento",
+        include_hashtags: bool = True,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Gera legenda para post do Instagram
+
+        Args:
+            persona_data: Dados da persona
+            topic: Tópico/tema do post
+            style: Estilo da legenda (engajamento, informativo, storytelling)
+            include_hashtags: Se deve incluir hashtags
+            use_cache: Se pode reaproveitar legendas de tópicos similares
+
+        Returns:
+            Dict com legenda, hashtags e metadados
+        """
+        # Solicitações idênticas em andamento compartilham a mesma geração
+        flight_key = (
+            persona_data.get('id'),
+            str(persona_data.get('updated_at') or ''),
+            topic,
+            style,
+            bool(include_hashtags),
+            bool(use_cache),
+        )
+        (shared_result, continuation), _ = await self._caption_flights.run(
+            flight_key,
+            lambda: self._generate_instagram_caption(
+                persona_data, topic, style, include_hashtags, use_cache)
+        )
+        # Sessão de refinamento própria de cada chamador, sobre uma cópia do resultado
+        return self._attach_refine_session(
+            dict(shared_result), persona_data, topic, style, include_hashtags, continuation)
+
+    async def _generate_instagram_caption(
+        self,
+        persona_data: Dict[str, Any],
+        topic: str,
+        style: str,
+        include_hashtags: bool,
+        use_cache: bool
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Executa de fato a geração de legenda (ver generate_instagram_caption)
+
+        Returns:
+            (legenda, estado de continuação do provider ou None), sem
+            refine_id: a sessão de refinamento é criada por chamador
+        """
+        try:
+            cache_ticket = generation_cache.ticket(persona_data, style, include_hashtags)
+            if use_cache:
+                with stage_timer("cache_lookup"):
+                    cached, cache_ticket = await generation_cache.lookup(
+                        persona_data, topic, style, include_hashtags)
+                if cached:
+                    return cached, None
 
-            # Tentar parsear JSON
+            prompt = await self._prepare_caption_prompt(
+                persona_data, topic, style, include_hashtags)
+
+            # Gerar resposta usando provider configurado
+            continuation = start_continuation_capture()
             try:
-                result = json.loads(response_text)
-
-                # Adicionar metadados
-                result['generated_at'] = datetime.now().isoformat()
-                result[
-                    'model_used'] = f"{self.provider}:{settings.DEFAULT_MODEL if self.provider == 'google' else self.model.get('model', 'unknown')}"
-                result['persona_id'] = persona_data.get('id')
-                result['topic'] = topic
-                result['style'] = style
-
-                logger.info(
-                    f"✅ Legenda gerada para persona {persona_data.get('id')}")
-                return result
-
-            except json.JSONDecodeError:
-                # Fallback se não conseguir parsear JSON
-                return {
-                    "caption": response_text,
-                    "hashtags": [],
-                    "call_to_action": "",
-                    "emoji_suggestions": [],
-                    "tone_analysis": "Geração em texto livre",
-                    "generated_at": datetime.now().isoformat(),
-                    "model_used": f"{self.provider}",
-                    "persona_id": persona_data.get('id'),
-                    "topic": topic,
-                    "style": style
-                }
+                response_text = await self._generate_text(prompt, CAPTION_RESPONSE)
+            finally:
+                stop_continuation_capture()
+
+            prompt_tokens = self._sent_prompt_tokens(prompt, CAPTION_RESPONSE)
+            result = await self._parse_caption_response(
+                response_text, persona_data, topic, style, include_hashtags)
+            result['prompt_tokens'] = prompt_tokens
+
+            await self._store_in_cache(
+                persona_data, topic, style, include_hashtags, result, cache_ticket)
+            return result, continuation
 
         except Exception as e:
             logger.error(f"❌ Erro ao gerar legenda: {e}")
             raise
 
-    async def generate_content_ideas(
+    async def stream_instagram_caption(
         self,
         persona_data: Dict[str, Any],
-        content_type: str = "posts",
-        count: int = 5
-    ) -> List[Dict[str, Any]]:
+        topic: str,
+        style: str = "engajamento",
+        include_hashtags: bool = True,
+        use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        Gera ideias de conteúdo baseadas na persona
+        Gera legenda em streaming
+
+        Emite eventos {"event": "token", "data": {"text": ...}} conforme o
+        modelo responde e, ao final, {"event": "result", "data": legenda}
+        com o mesmo formato de generate_instagram_caption. Em caso de hit no
+        cache semântico, apenas o evento "result" é emitido.
+        """
+        cache_ticket = generation_cache.ticket(persona_data, style, include_hashtags)
+        if use_cache:
+            with stage_timer("cache_lookup"):
+                cached, cache_ticket = await generation_cache.lookup(
+                    persona_data, topic, style, include_hashtags)
+            if cached:
+                yield {"event": "result", "data": self._attach_refine_session(
+                    cached, persona_data, topic, style, include_hashtags)}
+                return
+
+        prompt = await self._prepare_caption_prompt(
+            persona_data, topic, style, include_hashtags)
+
+        extractor = StreamingJSONExtractor()
+        continuation = start_continuation_capture()
+        try:
+            async for token in self._stream_text(prompt, CAPTION_RESPONSE):
+                extractor.feed(token)
+                yield {"event": "token", "data": {"text": token}}
+        finally:
+            stop_continuation_capture()
+
+        prompt_tokens = self._sent_prompt_tokens(prompt, CAPTION_RESPONSE)
+        result = await self._parse_caption_response(
+            extractor.text, persona_data, topic, style, include_hashtags, extractor)
+        result['prompt_tokens'] = prompt_tokens
+        await self._store_in_cache(
+            persona_data, topic, style, include_hashtags, result, cache_ticket)
+
+        yield {"event": "result", "data": self._attach_refine_session(
+            result, persona_data, topic, style, include_hashtags, continuation)}
+
+    async def _store_in_cache(
+        self,
+        persona_data: Dict[str, Any],
+        topic: str,
+        style: str,
+        include_hashtags: bool,
+        result: Dict[str, Any],
+        ticket: Optional[CacheTicket] = None
+    ):
+        """Guarda a legenda no cache semântico (apenas respostas em JSON válido)"""
+        if result.get('tone_analysis') == FREE_TEXT_TONE_ANALYSIS:
+            return
+        with stage_timer("cache_store"):
+            await generation_cache.store(
+                persona_data, topic, style, include_hashtags, result, ticket)
+
+    def _attach_refine_session(
+        self,
+        result: Dict[str, Any],
+        persona_data: Dict[str, Any],
+        topic: str,
+        style: str,
+        include_hashtags: bool,
+        continuation: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Registra a legenda para refinamento e adiciona o refine_id (chamar depois do cache)"""
+        result['refine_id'] = refine_sessions.create(
+            persona_data, topic, style, include_hashtags, result, continuation)
+        return result
+
+    def _render_refine_prompt(
+        self,
+        instruction: str,
+        session: Optional[RefineSession] = None,
+        persona_context: str = ""
+    ) -> str:
+        """
+        Prompt de refinamento: só a instrução quando continua do contexto do
+        provider; com persona e legenda atual quando não há contexto (session)
+        """
+        if session is None:
+            return f"""
+Reescreva a legenda da sua resposta anterior seguindo esta instrução: "{instruction}"
+Mantenha o tom de voz da persona e o que a instrução não pedir para mudar.
+Responda no mesmo formato JSON, com todos os campos.
+"""
+        return f"""
+Você é um especialista em criação de conteúdo para Instagram. Sua tarefa é reescrever uma legenda seguindo a instrução do usuário.
+
+{persona_context}
+
+LEGENDA ATUAL (JSON):
+{json.dumps(session.caption, ensure_ascii=False)}
+
+TAREFA: Reescrever a legenda sobre "{session.topic}" seguindo a instrução: "{instruction}"
+ESTILO: {session.style}
+INCLUIR HASHTAGS: {"Sim" if session.include_hashtags else "Não"}
+
+INSTRUÇÕES:
+1. Mantenha o tom de voz da persona
+2. Altere apenas o que a instrução pedir
+3. Mantenha a call-to-action, a menos que a instrução peça outra
+"""
+
+    async def refine_caption(
+        self,
+        persona_data: Dict[str, Any],
+        session: RefineSession,
+        instruction: str
+    ) -> Dict[str, Any]:
+        """
+        Refina uma legenda gerada ("mais curta", "mais emojis"...)
+
+        Se a sessão guardou tokens de contexto do Ollama e o provider segue
+        ativo, a geração continua a partir deles com um prompt contendo só a
+        instrução, sem reprocessar persona e RAG. Sem contexto (outros
+        providers, sessão antiga) ou se a continuação falhar, usa um prompt
+        com a persona e a legenda atual pelo roteador.
+
+        Returns:
+            Dict no formato de generate_instagram_caption, com novo refine_id
+        """
+        provider = self.providers.get(session.provider) if session.has_context else None
+        response_text = None
+        mode = "context"
+
+        if provider is not None and provider.supports_continuation:
+            prompt = self._render_refine_prompt(instruction)
+            continuation = start_continuation_capture(session.context)
+            try:
+                with stage_timer("llm"):
+                    response_text = await provider.generate(prompt, CAPTION_RESPONSE)
+                _current_model_used.set(provider.label)
+                _current_provider.set(provider)
+            except Exception as e:
+                logger.warning(f"⚠️ Refinamento com contexto falhou, usando prompt completo: {e}")
+            finally:
+                stop_continuation_capture()
+
+        if response_text is None:
+            mode = "stateless"
+            with stage_timer("prompt"):
+                prompt = self._render_refine_prompt(
+                    instruction, session, self._compiled_persona_context(persona_data).text)
+            continuation = start_continuation_capture()
+            try:
+                response_text = await self._generate_text(prompt, CAPTION_RESPONSE)
+            finally:
+                stop_continuation_capture()
+
+        metrics.increment("refine_requests_total", mode=mode)
+        prompt_tokens = self._sent_prompt_tokens(prompt, CAPTION_RESPONSE)
+        result = await self._parse_caption_response(
+            response_text, persona_data, session.topic, session.style, session.include_hashtags)
+        result['prompt_tokens'] = prompt_tokens
+        result['refine_mode'] = mode
+        return self._attach_refine_session(
+            result, persona_data, session.topic, session.style,
+            session.include_hashtags, continuation)
+
+    async def generate_instagram_captions_batch(
+        self,
+        persona_data: Dict[str, Any],
+        items: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+        retrieval_mode: Optional[str] = None
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Gera legendas para vários tópicos da mesma persona
+
+        O contexto da persona é montado uma única vez, os tópicos são
+        convertidos em embeddings em um só lote (reaproveitados no cache
+        semântico e na busca RAG) e a recuperação vetorial usa uma única
+        consulta ao ChromaDB, fundida com a busca lexical de cada tópico no
+        modo híbrido. As chamadas ao modelo rodam com concorrência limitada.
 
         Args:
             persona_data: Dados da persona
-            content_type: Tipo de conteúdo (posts, stories, reels)
-            count: Número de ideias a gerar
+            items: Itens com topic, style, include_hashtags e use_cache
+            max_concurrency: Limite de gerações simultâneas (padrão: BATCH_MAX_CONCURRENCY)
+            retrieval_mode: "hybrid" ou "vector" (padrão: RETRIEVAL_MODE)
 
-        Returns:
-            List[Dict]: Lista de ideias de conteúdo
+        Yields:
+            (índice do item, {"result": legenda} ou {"error": mensagem}) na ordem
+            de conclusão; ambos com latency_seconds, o tempo de geração do item
         """
+        persona_id = persona_data.get('id')
+        persona_context = self._compiled_persona_context(persona_data)
+        topics = [item['topic'] for item in items]
+        # Versões do cache capturadas antes da busca RAG do lote
+        cache_tickets = [
+            generation_cache.ticket(
+                persona_data, item.get('style', 'engajamento'), item.get('include_hashtags', True))
+            for item in items
+        ]
+
+        # Embeddings em lote para cache e RAG
+        with stage_timer("retrieval"):
+            try:
+                embeddings = await vector_store.embed_texts(topics)
+            except Exception as e:
+                logger.error(f"❌ Erro ao gerar embeddings do lote: {e}")
+                embeddings = None
+
+            # Vetorial em uma consulta ao ChromaDB + lexical por tópico (RETRIEVAL_MODE)
+            similar_docs = await vector_store.search_similar_content_batch(
+                persona_id=persona_id,
+                queries=topics,
+                query_embeddings=embeddings,
+                n_results=settings.TOP_K_RETRIEVAL,
+                mode=retrieval_mode
+            )
+
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or settings.BATCH_MAX_CONCURRENCY))
+
+        async def generate_item(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+            topic = item['topic']
+            style = item.get('style', 'engajamento')
+            include_hashtags = item.get('include_hashtags', True)
+            try:
+                cache_ticket = cache_tickets[index]
+                if item.get('use_cache', True):
+                    with stage_timer("cache_lookup"):
+                        cached, cache_ticket = await generation_cache.lookup(
+                            persona_data, topic, style, include_hashtags,
+                            embedding=embeddings[index] if embeddings is not None else None,
+                            ticket=cache_ticket)
+                    if cached:
+                        return {"result": self._attach_refine_session(
+                            cached, persona_data, topic, style, include_hashtags)}
+
+                with stage_timer("prompt"):
+                    base_prompt = self._render_caption_prompt(
+                        "", "", topic, style, include_hashtags)
+                    rag_context = self._format_rag_context(
+                        similar_docs[index],
+                        prompt_assembler.rag_budget(
+                            base_prompt,
+                            persona_context.token_count + self._schema_overhead_tokens(CAPTION_RESPONSE)))
+                    prompt = self._render_caption_prompt(
+                        persona_context.text, rag_context, topic, style, include_hashtags)
+                continuation = start_continuation_capture()
+                try:
+                    response_text = await self._generate_text(prompt, CAPTION_RESPONSE)
+                finally:
+                    stop_continuation_capture()
+
+                prompt_tokens = self._sent_prompt_tokens(prompt, CAPTION_RESPONSE)
+                result = await self._parse_caption_response(
+                    response_text, persona_data, topic, style, include_hashtags)
+                result['prompt_tokens'] = prompt_tokens
+                await self._store_in_cache(
+                    persona_data, topic, style, include_hashtags, result, cache_ticket)
+                return {"result": self._attach_refine_session(
+                    result, persona_data, topic, style, include_hashtags, continuation)}
+
+            except Exception as e:
+                logger.error(f"❌ Erro ao gerar legenda do lote (item {index}): {e}")
+                return {"error": str(e)}
+
+        async def run(index: int, item: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+            async with semaphore:
+                started = time.perf_counter()
+                outcome = await generate_item(index, item)
+                outcome['latency_seconds'] = time.perf_counter() - started
+                return index, outcome
+
+        tasks = [asyncio.create_task(run(i, item)) for i, item in enumerate(items)]
         try:
-            # Construir contexto da persona
-            persona_context = self._build_persona_context(persona_data)
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Cliente desconectou: não continuar gastando chamadas ao modelo
+            for task in tasks:
+                task.cancel()
+
+    async def generate_hashtags(
+        self,
+        persona_data: Dict[str, Any],
+        topic: str,
+        count: int,
+        mix_strategy: str = "balanced",
+        exclude: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Gera apenas hashtags com um prompt curto (sem contexto RAG)
+
+        Usado pelo hashtag_engine quando o índice local da persona não tem
+        hashtags relevantes suficientes.
+
+        Args:
+            exclude: Hashtags já escolhidas, que o modelo não deve repetir
+        """
+        persona_context = self._compiled_persona_context(persona_data)
+        avoid = f"\nNÃO REPETIR: {', '.join(exclude)}" if exclude else ""
+
+        prompt = f"""
+Você é um especialista em hashtags para Instagram.
+
+{persona_context.text}
+
+TAREFA: Sugerir {count} hashtags sobre "{topic}"
+ESTRATÉGIA: {HASHTAG_STRATEGY_HINTS.get(mix_strategy, HASHTAG_STRATEGY_HINTS["balanced"])}{avoid}
+"""
+        response_text = await self._generate_text(prompt, HASHTAGS_RESPONSE)
+        with stage_timer("parse"):
+            data = self._extract_response_json(response_text, "hashtags", allow_list=True)
+        if isinstance(data, list):
+            data = {"hashtags": data}
+        if not isinstance(data, dict):
+            return []
 
-            # Recuperar contexto geral da base de conhecimento
+        try:
+            hashtags = GeneratedHashtags(**data).hashtags
+        except ValidationError:
+            metrics.increment("llm_json_parse_failures_total", kind="hashtags")
+            return []
+
+        excluded = {tag.lower() for tag in exclude or []}
+        unique = []
+        for tag in hashtags:
+            if tag.lower() not in excluded:
+                excluded.add(tag.lower())
+                unique.append(tag)
+        return unique[:count]
+
+    async def _prepare_ideas_context(
+        self,
+        persona_data: Dict[str, Any],
+        content_type: str,
+        focus_area: str = ""
+    ) -> Tuple[str, str]:
+        """
+        Contexto da persona e RAG para os prompts de ideias
+
+        A área de foco entra na consulta ao banco vetorial; o contexto é
+        montado uma vez e reaproveitado por todas as sub-requisições.
+
+        Returns:
+            (contexto da persona, contexto RAG)
+        """
+        with stage_timer("prompt"):
+            # Contexto da persona (pré-compilado por versão)
+            persona_context = self._compiled_persona_context(persona_data)
+
+            # Recuperar contexto da base de conhecimento (direcionado pelo foco, se houver)
+            query = "conteúdo marca estratégia"
+            if focus_area:
+                query = f"{focus_area} {query}"
+
+            base_prompt = self._render_ideas_prompt(
+                "", "", content_type, settings.IDEAS_SUBREQUEST_SIZE, focus_area)
             rag_context = await self._get_relevant_context(
                 persona_data.get('id'),
-                "conteúdo marca estratégia"
+                query,
+                base_prompt,
+                persona_context.token_count + self._schema_overhead_tokens(IDEAS_RESPONSE)
             )
 
-            # Construir prompt
-            prompt = f"""
+            return persona_context.text, rag_context
+
+    def _render_ideas_prompt(
+        self,
+        persona_context: str,
+        rag_context: str,
+        content_type: str,
+        count: int,
+        focus_area: str = "",
+        angle: str = "",
+        avoid_titles: Optional[List[str]] = None
+    ) -> str:
+        """Preenche o template do prompt de ideias"""
+        extra = []
+        if focus_area:
+            extra.append(f"ÁREA DE FOCO: {focus_area} (todas as ideias devem tratar deste tema)")
+        if angle:
+            extra.append(f"ÂNGULO: {angle}")
+        if avoid_titles:
+            extra.append(f"NÃO REPETIR IDEIAS JÁ SUGERIDAS: {'; '.join(avoid_titles)}")
+        extra_block = "\n".join(extra)
+
+        return f"""
 Você é um estrategista de conteúdo para Instagram. Gere {count} ideias criativas de {content_type} baseadas na persona.
+{extra_block}
 
 {persona_context}
 
@@ -413,47 +1136,254 @@ INSTRUÇÕES:
 3. Foque no público-alvo especificado
 4. Varie entre diferentes tipos de engajamento
 5. Use insights da base de conhecimento quando possível
-
-FORMATO DE RESPOSTA (JSON):
-{{
-    "ideas": [
-        {{
-            "title": "Título da ideia",
-            "description": "Descrição detalhada",
-            "content_type": "tipo específico",
-            "engagement_goal": "objetivo de engajamento",
-            "key_elements": ["elemento1", "elemento2"],
-            "trending_potential": "alto/médio/baixo"
-        }}
-    ]
-}}
-
-Gere apenas o JSON, sem texto adicional.
+6. Cada ideia deve ser claramente diferente das demais
 """
 
-            # Gerar resposta
-            response_text = await self._generate_text(prompt)
+    async def _parse_ideas_response(
+        self,
+        response_text: str,
+        persona_data: Dict[str, Any],
+        prompt_tokens: Optional[int] = None,
+        extractor: Optional[StreamingJSONExtractor] = None
+    ) -> List[Dict[str, Any]]:
+        """Converte a resposta do modelo na lista de ideias"""
+        with stage_timer("parse"):
+            data = self._extract_response_json(
+                response_text, "ideas", extractor, allow_list=True)
+
+            # Aceitar {"ideas": [...]} ou a lista diretamente
+            raw_ideas = data.get('ideas') if isinstance(data, dict) else data
+            if not isinstance(raw_ideas, list):
+                logger.error("❌ Erro ao parsear JSON das ideias")
+                return []
 
-            # Parsear resposta
-            try:
-                result = json.loads(response_text)
+            # Ideias sem título são descartadas; os campos faltantes das demais
+            # são completados juntos, em uma única chamada
+            validated = await self._complete_missing_fields_batch(
+                GeneratedIdea,
+                [raw for raw in raw_ideas if isinstance(raw, dict) and raw.get('title')],
+                "idea",
+                "Ideias de conteúdo para Instagram.",
+                IDEA_SCHEMA)
+
+        ideas = []
+        for idea in validated:
+            if idea is None:
+                continue
+            idea = idea.dict()
+
+            # Adicionar metadados a cada ideia
+            idea['generated_at'] = datetime.now().isoformat()
+            idea['persona_id'] = persona_data.get('id')
+            idea['prompt_tokens'] = prompt_tokens
+            idea['model_used'] = self._model_used()
+            ideas.append(idea)
+
+        logger.info(f"✅ {len(ideas)} ideias geradas")
+        return ideas
+
+    async def _generate_ideas_round(
+        self,
+        persona_data: Dict[str, Any],
+        persona_context: str,
+        rag_context: str,
+        content_type: str,
+        total: int,
+        focus_area: str = "",
+        avoid_titles: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Pede total ideias ao modelo em sub-requisições paralelas de até
+        IDEAS_SUBREQUEST_SIZE ideias, cada uma com um ângulo diferente
+        """
+        size = max(1, settings.IDEAS_SUBREQUEST_SIZE)
+        sizes = [min(size, total - start) for start in range(0, total, size)]
+
+        async def request(batch_size: int, angle: str) -> List[Dict[str, Any]]:
+            prompt = self._render_ideas_prompt(
+                persona_context, rag_context, content_type, batch_size,
+                focus_area, angle, avoid_titles)
+            metrics.increment("ideas_llm_calls_total")
+            response_text = await self._generate_text(prompt, IDEAS_RESPONSE)
+            return await self._parse_ideas_response(
+                response_text, persona_data, self._sent_prompt_tokens(prompt, IDEAS_RESPONSE))
+
+        angles = IDEA_ANGLES if len(sizes) > 1 else [""]
+        results = await asyncio.gather(
+            *[request(batch_size, angles[i % len(angles)]) for i, batch_size in enumerate(sizes)],
+            return_exceptions=True
+        )
 
-                # Adicionar metadados a cada ideia
-                for idea in result.get('ideas', []):
-                    idea['generated_at'] = datetime.now().isoformat()
-                    idea['persona_id'] = persona_data.get('id')
+        ideas: List[Dict[str, Any]] = []
+        errors = []
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.warning(f"⚠️ Sub-requisição de ideias falhou: {result}")
+                errors.append(result)
+            else:
+                ideas.extend(result)
 
-                logger.info(f"✅ {len(result.get('ideas', []))} ideias geradas")
-                return result.get('ideas', [])
+        # Só propagar o erro se nenhuma sub-requisição produziu ideias
+        if not ideas and errors:
+            raise errors[0]
+        return ideas
 
-            except json.JSONDecodeError:
-                logger.error("❌ Erro ao parsear JSON das ideias")
-                return []
+    async def _select_ideas(
+        self,
+        persona_data: Dict[str, Any],
+        candidates: List[Dict[str, Any]],
+        count: int,
+        focus_area: str = ""
+    ) -> List[Dict[str, Any]]:
+        """
+        Escolhe count ideias distintas por MMR sobre título + descrição
+
+        A relevância é medida contra a área de foco ou, sem foco, contra o
+        embedding do contexto da persona.
+        """
+        if not candidates:
+            return []
+
+        texts = [f"{idea['title']}. {idea.get('description', '')}" for idea in candidates]
+        try:
+            vectors = await vector_store.embed_texts(texts + ([focus_area] if focus_area else []))
+            if focus_area:
+                query = vectors.pop()
+            else:
+                query = await persona_context_cache.get_embedding(
+                    persona_data, self._build_persona_context)
+        except Exception as e:
+            # Sem embeddings: descartar apenas títulos repetidos
+            logger.warning(f"⚠️ Deduplicação de ideias sem embeddings: {e}")
+            seen, unique = set(), []
+            for idea in candidates:
+                key = idea['title'].strip().lower()
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(idea)
+            return unique[:count]
+
+        selected, duplicates = select_diverse(
+            candidates, vectors, query, count,
+            diversity_lambda=settings.IDEAS_MMR_LAMBDA,
+            duplicate_threshold=settings.IDEAS_DUPLICATE_SIMILARITY
+        )
+        if duplicates:
+            metrics.increment("ideas_duplicates_removed_total", duplicates)
+        return selected
+
+    async def _fill_ideas(
+        self,
+        persona_data: Dict[str, Any],
+        persona_context: str,
+        rag_context: str,
+        content_type: str,
+        count: int,
+        focus_area: str,
+        candidates: List[Dict[str, Any]],
+        rounds_left: int
+    ) -> List[Dict[str, Any]]:
+        """Seleciona as ideias e, se faltarem distintas, pede mais (até rounds_left rodadas)"""
+        with stage_timer("selection"):
+            selected = await self._select_ideas(persona_data, candidates, count, focus_area)
+
+        for _ in range(rounds_left):
+            if len(selected) >= count:
+                break
+            missing = count - len(selected)
+            logger.info(f"💡 Faltam {missing} ideias distintas, gerando mais")
+            candidates = candidates + await self._generate_ideas_round(
+                persona_data, persona_context, rag_context, content_type,
+                math.ceil(missing * settings.IDEAS_OVERGENERATION_FACTOR),
+                focus_area,
+                avoid_titles=[idea['title'] for idea in candidates]
+            )
+            with stage_timer("selection"):
+                selected = await self._select_ideas(persona_data, candidates, count, focus_area)
+
+        if len(selected) < count:
+            metrics.increment("ideas_requests_short_total")
+        return selected
+
+    async def generate_content_ideas(
+        self,
+        persona_data: Dict[str, Any],
+        content_type: str = "posts",
+        count: int = 5,
+        focus_area: str = ""
+    ) -> List[Dict[str, Any]]:
+        """
+        Gera ideias de conteúdo baseadas na persona
+
+        Pede IDEAS_OVERGENERATION_FACTOR vezes mais ideias que o necessário
+        (em sub-requisições paralelas), remove quase duplicatas e escolhe as
+        count mais relevantes e diversas. Se ainda faltarem ideias distintas,
+        faz novas rodadas até IDEAS_MAX_ROUNDS.
+
+        Args:
+            persona_data: Dados da persona
+            content_type: Tipo de conteúdo (posts, stories, reels)
+            count: Número de ideias a gerar
+            focus_area: Tema que as ideias devem abordar (opcional)
+
+        Returns:
+            List[Dict]: Lista de ideias de conteúdo
+        """
+        try:
+            metrics.increment("ideas_requests_total")
+            persona_context, rag_context = await self._prepare_ideas_context(
+                persona_data, content_type, focus_area)
+
+            candidates = await self._generate_ideas_round(
+                persona_data, persona_context, rag_context, content_type,
+                math.ceil(count * settings.IDEAS_OVERGENERATION_FACTOR),
+                focus_area
+            )
+
+            return await self._fill_ideas(
+                persona_data, persona_context, rag_context, content_type, count,
+                focus_area, candidates, settings.IDEAS_MAX_ROUNDS - 1)
 
         except Exception as e:
             logger.error(f"❌ Erro ao gerar ideias de conteúdo: {e}")
             raise
 
+    async def stream_content_ideas(
+        self,
+        persona_data: Dict[str, Any],
+        content_type: str = "posts",
+        count: int = 5,
+        focus_area: str = ""
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Gera ideias de conteúdo em streaming
+
+        Emite eventos "token" durante a geração (uma única requisição com
+        sobregeração) e um evento final "result" com {"ideas": [...]} já
+        deduplicado, como em generate_content_ideas.
+        """
+        metrics.increment("ideas_requests_total")
+        persona_context, rag_context = await self._prepare_ideas_context(
+            persona_data, content_type, focus_area)
+
+        prompt = self._render_ideas_prompt(
+            persona_context, rag_context, content_type,
+            math.ceil(count * settings.IDEAS_OVERGENERATION_FACTOR), focus_area)
+
+        metrics.increment("ideas_llm_calls_total")
+        extractor = StreamingJSONExtractor(allow_list=True)
+        async for token in self._stream_text(prompt, IDEAS_RESPONSE):
+            extractor.feed(token)
+            yield {"event": "token", "data": {"text": token}}
+
+        candidates = await self._parse_ideas_response(
+            extractor.text, persona_data, self._sent_prompt_tokens(prompt, IDEAS_RESPONSE), extractor)
+        ideas = await self._fill_ideas(
+            persona_data, persona_context, rag_context, content_type, count,
+            focus_area, candidates, settings.IDEAS_MAX_ROUNDS - 1)
+
+        yield {"event": "result", "data": {"ideas": ideas}}
+
     async def analyze_content_performance(
         self,
         content_data: Dict[str, Any],
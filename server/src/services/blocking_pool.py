@@ -0,0 +1,128 @@
+"""
+Execução de operações bloqueantes fora do event loop.
+ChromaDB (SQLite + disco) e o modelo de embeddings (CPU) são síncronos: cada
+BlockingPool é um pool de threads de tamanho fixo com um limite de operações
+pendentes. Acima do limite, quem chama aguarda a vez sem bloquear o loop
+(backpressure), e o tempo de espera vai para as métricas.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BlockingPool:
+    """
+    Pool de threads com fila limitada
+
+    Até max_workers operações rodam ao mesmo tempo e até max_pending ficam
+    na fila do executor; as demais aguardam uma vaga. A vaga só é devolvida
+    quando a operação termina na thread, mesmo que quem chamou tenha sido
+    cancelado, para que o limite reflita o trabalho realmente em andamento.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._queued = 0
+        self._active = 0
+
+    def _publish(self):
+        metrics.set_gauge("blocking_pool_waiting", self._waiting, pool=self.name)
+        metrics.set_gauge("blocking_pool_queued", self._queued, pool=self.name)
+        metrics.set_gauge("blocking_pool_active", self._active, pool=self.name)
+
+    def _ensure(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=self.name)
+        if self._slots is None or self._loop is not loop:
+            # Semáforo pertence ao loop (recriado se a aplicação reiniciar em outro loop)
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_pending)
+            self._loop = loop
+        return loop
+
+    def _call(self, fn: Callable[..., Any], args, kwargs, submitted: float) -> Any:
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        metrics.observe("blocking_pool_wait_seconds", started - submitted, pool=self.name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+            metrics.observe("blocking_pool_run_seconds", time.perf_counter() - started, pool=self.name)
+
+    def _release(self, slots: asyncio.Semaphore):
+        slots.release()
+        self._publish()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Executa fn(*args, **kwargs) em uma thread do pool e retorna o resultado"""
+        loop = self._ensure()
+        slots = self._slots
+        submitted = time.perf_counter()
+
+        self._waiting += 1
+        self._publish()
+        try:
+            await slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        with self._lock:
+            self._queued += 1
+        self._publish()
+        try:
+            future = self._executor.submit(self._call, fn, args, kwargs, submitted)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            self._release(slots)
+            raise
+
+        def done(finished):
+            if finished.cancelled():
+                # Cancelada antes de chegar a uma thread (quem chamou foi
+                # cancelado ou shutdown): _call não rodou para tirá-la da fila
+                with self._lock:
+                    self._queued -= 1
+            try:
+                loop.call_soon_threadsafe(self._release, slots)
+            except RuntimeError:
+                # Loop já encerrado (shutdown)
+                pass
+
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        """Encerra o pool: operações em execução terminam, as da fila são canceladas"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "active": self._active,
+            "queued": self._queued,
+            "waiting": self._waiting,
+        }
@@ -0,0 +1,108 @@
+"""
+Circuit breaker para chamadas aos providers de IA.
+Após falhas consecutivas o circuito abre e as requisições passam a ser
+recusadas imediatamente; depois do tempo de recuperação, uma requisição de
+teste (half-open) decide se o circuito fecha novamente.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class CircuitOpenError(Exception):
+    """O circuito do provider está aberto e a requisição foi recusada"""
+
+    def __init__(self, name: str):
+        super().__init__(f"Circuito aberto para o provider {name}")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker com estados closed / open / half_open
+
+    - closed: requisições passam; falhas consecutivas são contadas
+    - open: requisições recusadas até recovery_timeout segundos
+    - half_open: uma única requisição de teste; sucesso fecha o circuito,
+      falha reabre
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._total_opens = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def is_available(self) -> bool:
+        """Indica se uma requisição seria aceita agora (sem reservar a vaga de teste)"""
+        with self._lock:
+            state = self._current_state()
+            return state == self.CLOSED or (state == self.HALF_OPEN and not self._probe_in_flight)
+
+    def allow_request(self) -> bool:
+        """Reserva a passagem de uma requisição; False se o circuito recusar"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if state != self.OPEN:
+                    self._total_opens += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release(self):
+        """Libera a vaga de teste quando a requisição foi cancelada sem resultado"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == self.OPEN:
+                retry_in = round(self.recovery_timeout - (time.monotonic() - self._opened_at), 1)
+            return {
+                "state": state,
+                "consecutive_failures": self._consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "times_opened": self._total_opens,
+                "retry_in_seconds": retry_in,
+            }
@@ -0,0 +1,112 @@
+"""
+Micro-batching de embeddings de consultas.
+Cada busca RAG, consulta ao cache semântico ou tópico de hashtags gera o
+embedding de um único texto, o que roda o modelo com batch 1. O batcher
+junta os textos que chegam dentro de uma janela curta
+(EMBEDDING_BATCH_WINDOW_MS), de requisições diferentes, gera todos em uma
+única passada do modelo e devolve cada vetor a quem pediu.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Tamanhos de lote (potências de 2 até o máximo usual)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+EmbedFunction = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class EmbeddingBatcher:
+    """
+    Agrupa pedidos de embedding concorrentes
+
+    O primeiro texto de um lote abre a janela; o lote é enviado quando a
+    janela fecha ou quando atinge max_batch_size. Textos repetidos no mesmo
+    lote são calculados uma vez. Um erro no lote é repassado a todos os
+    pedidos dele.
+    """
+
+    def __init__(self, name: str, embed: EmbedFunction, window_ms: float, max_batch_size: int):
+        self.name = name
+        self._embed = embed
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: set = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """Embedding de um texto, calculado junto com os demais pedidos da janela"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Pedidos de um loop anterior (aplicação reiniciada) não serão atendidos
+            self._pending, self._timer, self._loop = [], None, loop
+
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Fecha a janela e envia o lote atual"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        if self._pending:
+            self._timer = self._loop.call_later(self.window, self._flush)
+
+        # Quem desistiu (requisição cancelada) não entra no lote
+        batch = [entry for entry in batch if not entry[1].done()]
+        if batch:
+            task = self._loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        started = time.perf_counter()
+        for _, _, queued_at in batch:
+            metrics.observe("embedding_batch_queue_wait_seconds", started - queued_at, batcher=self.name)
+
+        unique: Dict[str, int] = {}
+        for text, _, _ in batch:
+            unique.setdefault(text, len(unique))
+        metrics.observe(
+            "embedding_batch_size", len(unique), buckets=BATCH_SIZE_BUCKETS, batcher=self.name)
+        metrics.increment("embedding_batches_total", batcher=self.name)
+
+        try:
+            vectors = await self._embed(list(unique))
+        except BaseException as e:
+            error = e if isinstance(e, Exception) else RuntimeError("Lote de embeddings cancelado")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            if error is not e:
+                raise
+            return
+
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(vectors[unique[text]])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": round(self.window * 1000, 2),
+            "max_batch_size": self.max_batch_size,
+            "pending": len(self._pending),
+            "batches_in_flight": len(self._tasks),
+        }
@@ -0,0 +1,108 @@
+"""
+Cache persistente de embeddings por conteúdo.
+Manuais de marca reenviados, revisões do mesmo documento e bases duplicadas
+geram muitos chunks idênticos. A chave é o SHA-256 do nome do modelo + texto
+normalizado; o vetor fica em um arquivo SQLite local (float32), de modo que
+um chunk repetido custa só uma leitura, sem passar pelo modelo.
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Limite de parâmetros por consulta do SQLite (versões antigas: 999)
+SQLITE_MAX_PARAMS = 900
+
+
+def normalize_text(text: str) -> str:
+    """Normalização que não altera o embedding: NFC e espaços colapsados"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def content_key(model_name: str, text: str) -> str:
+    """Chave do cache: SHA-256 do modelo + texto normalizado"""
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Vetores por hash de conteúdo em SQLite
+
+    Os métodos são síncronos (SQLite + disco) e devem rodar fora do event
+    loop, no pool de ingestão do banco vetorial.
+    """
+
+    def __init__(self, path: str, model_name: str):
+        self.path = Path(path)
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False, timeout=20)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " created_at TEXT DEFAULT CURRENT_TIMESTAMP"
+                ")"
+            )
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Vetor de cada texto (None quando ausente), na ordem recebida"""
+        keys = [content_key(self.model_name, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+
+        with self._lock:
+            connection = self._connect()
+            for start in range(0, len(unique), SQLITE_MAX_PARAMS):
+                chunk = unique[start:start + SQLITE_MAX_PARAMS]
+                rows = connection.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        """Guarda os vetores (textos já presentes são mantidos)"""
+        rows = []
+        for text, vector in zip(texts, vectors):
+            array = np.asarray(vector, dtype=np.float32)
+            rows.append((content_key(self.model_name, text), self.model_name, int(array.size), array.tobytes()))
+
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, dim, vector) VALUES (?, ?, ?, ?)", rows)
+            connection.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,130 @@
+"""
+Pool de processos para os embeddings da ingestão.
+Gerar embeddings de um PDF grande dentro do processo da API disputa o GIL e
+os núcleos com o atendimento das requisições. Aqui cada processo do pool
+carrega o modelo uma única vez e limita suas threads internas
+(EMBEDDING_WORKER_THREADS); os textos e vetores trafegam pelos pipes do
+ProcessPoolExecutor. O pool é opcional (EMBEDDING_WORKERS=0, o padrão,
+mantém o modelo do próprio processo): cada processo custa uma cópia do
+torch + MiniLM em memória e, iniciado com spawn, reimporta o módulo
+principal (main.py só sobe o servidor sob if __name__ == "__main__").
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Modelo carregado em cada processo do pool (ver _init_worker)
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int):
+    """Inicializador de cada processo: fixa as threads e carrega o modelo"""
+    global _worker_model
+    threads = max(1, threads)
+    # Antes de importar o torch, para que as bibliotecas nativas respeitem o limite
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode(texts: List[str]):
+    """Embeddings dos textos no processo do pool (float32, mesmo formato da coleção)"""
+    return _worker_model.encode(
+        texts, convert_to_numpy=True, normalize_embeddings=False
+    ).astype("float32")
+
+
+class EmbeddingWorkerPool:
+    """
+    Processos dedicados a gerar embeddings
+
+    Criado sob demanda na primeira ingestão. Se um processo morrer
+    (BrokenProcessPool), o pool é recriado na chamada seguinte e o erro é
+    repassado para quem chamou, que pode recorrer ao modelo local; se o
+    pool nunca chegou a funcionar (modelo ou dependências ausentes), ele é
+    desativado.
+    """
+
+    def __init__(self, model_name: str, workers: int, threads: int):
+        self.model_name = model_name
+        self.workers = max(0, workers)
+        self.threads = max(1, threads)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self._succeeded = False
+        self._disabled = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0 and not self._disabled
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: o processo filho não herda threads nem o estado do torch da API
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads)
+            )
+            logger.info(f"🧮 Pool de embeddings iniciado ({self.workers} processos x {self.threads} threads)")
+        return self._executor
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings dos textos calculados em um processo do pool"""
+        if not texts:
+            return []
+
+        executor = self._get_executor()
+        started = time.perf_counter()
+        self._in_flight += 1
+        metrics.set_gauge("embedding_workers_in_flight", self._in_flight)
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(executor, _encode, texts)
+        except BrokenProcessPool:
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+                if not self._succeeded:
+                    self._disabled = True
+                    logger.error("❌ Pool de embeddings não inicializou; usando o modelo local")
+            raise
+        finally:
+            self._in_flight -= 1
+            metrics.set_gauge("embedding_workers_in_flight", self._in_flight)
+
+        self._succeeded = True
+        metrics.observe("embedding_worker_seconds", time.perf_counter() - started)
+        metrics.increment("embedding_worker_texts_total", len(texts))
+        return vectors.tolist()
+
+    def shutdown(self):
+        """Encerra os processos do pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads,
+            "enabled": self.enabled,
+            "started": self._executor is not None,
+            "in_flight": self._in_flight,
+        }
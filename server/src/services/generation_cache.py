@@ -0,0 +1,246 @@
+"""
+Cache semântico de gerações.
+Reaproveita legendas já geradas para tópicos quase idênticos da mesma persona,
+comparando o embedding do tópico (all-MiniLM-L6-v2) por similaridade de cosseno.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import metrics
+from .vector_store import vector_store
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheTicket:
+    """
+    Grupo e embedding capturados no início de uma geração
+
+    O store só grava se o grupo continuar atual: uma invalidação durante a
+    geração (persona editada, documento ingerido) descarta o resultado.
+    """
+    bucket_key: Tuple
+    embedding: Optional[np.ndarray] = None
+
+
+class SemanticGenerationCache:
+    """
+    Cache de legendas por similaridade de tópico
+
+    As entradas são agrupadas por (persona, versão da persona, versão da base
+    de conhecimento, estilo, include_hashtags). A versão da persona vem do
+    updated_at; a versão da base de conhecimento é incrementada a cada
+    invalidate_persona(). Dentro do grupo, a busca é linear sobre embeddings
+    normalizados, o que é suficiente para algumas centenas de entradas.
+    GENERATION_CACHE_MAX_ENTRIES_PER_PERSONA limita o total da persona,
+    somando todos os grupos (estilos livres criam grupos novos).
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Tuple, List[Dict[str, Any]]] = {}
+        self._kb_versions: Dict[int, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.GENERATION_CACHE_ENABLED
+
+    def _bucket_key(
+        self,
+        persona_data: Dict[str, Any],
+        style: str,
+        include_hashtags: bool
+    ) -> Tuple:
+        persona_id = persona_data.get('id')
+        return (
+            persona_id,
+            str(persona_data.get('updated_at') or ''),
+            self._kb_versions.get(persona_id, 0),
+            style,
+            bool(include_hashtags),
+        )
+
+    def _drop_stale_buckets(self, bucket_key: Tuple):
+        """Remove grupos da mesma persona com versões antigas"""
+        persona_id = bucket_key[0]
+        for key in list(self._buckets):
+            if key[0] == persona_id and key[1:3] != bucket_key[1:3]:
+                del self._buckets[key]
+
+    def ticket(
+        self,
+        persona_data: Dict[str, Any],
+        style: str,
+        include_hashtags: bool
+    ) -> CacheTicket:
+        """Captura a versão atual do grupo antes de uma geração sem lookup"""
+        return CacheTicket(self._bucket_key(persona_data, style, include_hashtags))
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    async def _embed(self, text: str) -> np.ndarray:
+        return self._normalize((await vector_store.embed_texts([text]))[0])
+
+    async def lookup(
+        self,
+        persona_data: Dict[str, Any],
+        topic: str,
+        style: str,
+        include_hashtags: bool,
+        embedding: Optional[List[float]] = None,
+        ticket: Optional[CacheTicket] = None
+    ) -> Tuple[Optional[Dict[str, Any]], CacheTicket]:
+        """
+        Procura uma geração anterior similar ao tópico
+
+        Args:
+            embedding: Embedding do tópico já calculado (evita recalcular)
+            ticket: Versão capturada antes (ex.: antes da busca RAG do lote)
+
+        Returns:
+            (resultado em cache ou None, ticket com grupo e embedding para o store)
+        """
+        # Versão capturada antes de qualquer await
+        ticket = ticket or self.ticket(persona_data, style, include_hashtags)
+        if not self.enabled:
+            return None, ticket
+
+        try:
+            if embedding is not None:
+                ticket.embedding = self._normalize(embedding)
+            else:
+                ticket.embedding = await self._embed(topic)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache semântico indisponível: {e}")
+            return None, ticket
+
+        embedding = ticket.embedding
+        entries = self._buckets.get(ticket.bucket_key, [])
+        now = time.time()
+        ttl = settings.GENERATION_CACHE_TTL_SECONDS
+
+        best_entry, best_score = None, -1.0
+        for entry in entries:
+            if now - entry['created_at'] > ttl:
+                continue
+            score = float(np.dot(entry['embedding'], embedding))
+            if score > best_score:
+                best_entry, best_score = entry, score
+
+        if best_entry and best_score >= settings.GENERATION_CACHE_SIMILARITY_THRESHOLD:
+            metrics.increment("generation_cache_hits_total")
+            result = dict(best_entry['result'])
+            result['topic'] = topic
+            result['cached'] = True
+            result['cache_similarity'] = round(best_score, 4)
+            logger.info(
+                f"♻️ Cache semântico: hit para persona {persona_data.get('id')} (similaridade {best_score:.3f})")
+            return result, ticket
+
+        metrics.increment("generation_cache_misses_total")
+        return None, ticket
+
+    async def store(
+        self,
+        persona_data: Dict[str, Any],
+        topic: str,
+        style: str,
+        include_hashtags: bool,
+        result: Dict[str, Any],
+        ticket: Optional[CacheTicket] = None
+    ):
+        """
+        Armazena uma geração no cache
+
+        Args:
+            ticket: Retornado por lookup()/ticket() no início da geração; se o
+                grupo mudou desde então (invalidação), o resultado é descartado
+        """
+        if not self.enabled:
+            return
+
+        ticket = ticket or self.ticket(persona_data, style, include_hashtags)
+        embedding = ticket.embedding
+        try:
+            if embedding is None:
+                embedding = await self._embed(topic)
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível armazenar no cache semântico: {e}")
+            return
+
+        # Conferir depois do await: a invalidação pode ter ocorrido durante o embedding
+        bucket_key = ticket.bucket_key
+        if bucket_key != self._bucket_key(persona_data, style, include_hashtags):
+            metrics.increment("generation_cache_stale_writes_total")
+            logger.info(
+                f"♻️ Cache semântico: geração da persona {persona_data.get('id')} "
+                "descartada (invalidada durante a geração)")
+            return
+
+        if bucket_key not in self._buckets:
+            self._drop_stale_buckets(bucket_key)
+
+        self._buckets.setdefault(bucket_key, []).append({
+            'topic': topic,
+            'embedding': embedding,
+            'result': dict(result),
+            'created_at': time.time(),
+        })
+        self._enforce_persona_limit(bucket_key[0])
+
+    def _enforce_persona_limit(self, persona_id: int):
+        """Remove expiradas e, acima do limite, as mais antigas de todos os grupos da persona"""
+        buckets = [entries for key, entries in self._buckets.items() if key[0] == persona_id]
+        expires_before = time.time() - settings.GENERATION_CACHE_TTL_SECONDS
+        for entries in buckets:
+            entries[:] = [entry for entry in entries if entry['created_at'] >= expires_before]
+
+        overflow = sum(len(entries) for entries in buckets) - settings.GENERATION_CACHE_MAX_ENTRIES_PER_PERSONA
+        while overflow > 0:
+            # Cada grupo está em ordem de inserção: a mais antiga é a primeira de algum grupo
+            oldest = min((entries for entries in buckets if entries), key=lambda entries: entries[0]['created_at'])
+            del oldest[0]
+            overflow -= 1
+
+        for key in [key for key, entries in self._buckets.items() if key[0] == persona_id and not entries]:
+            del self._buckets[key]
+
+    def invalidate_persona(self, persona_id: int):
+        """Invalida todas as gerações de uma persona (persona ou base de conhecimento alterada)"""
+        self._kb_versions[persona_id] = self._kb_versions.get(persona_id, 0) + 1
+        removed = 0
+        for key in list(self._buckets):
+            if key[0] == persona_id:
+                removed += len(self._buckets.pop(key))
+
+        if removed:
+            metrics.increment("generation_cache_invalidations_total", removed)
+            logger.info(f"🧹 Cache semântico: {removed} entradas da persona {persona_id} invalidadas")
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna contadores de hit/miss e tamanho atual do cache"""
+        hits = metrics.get_counter("generation_cache_hits_total")
+        misses = metrics.get_counter("generation_cache_misses_total")
+        total = hits + misses
+        return {
+            "enabled": self.enabled,
+            "hits": int(hits),
+            "misses": int(misses),
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "entries": sum(len(entries) for entries in self._buckets.values()),
+            "similarity_threshold": settings.GENERATION_CACHE_SIMILARITY_THRESHOLD,
+        }
+
+
+# Instância global
+generation_cache = SemanticGenerationCache()
@@ -0,0 +1,231 @@
+"""
+Motor de hashtags da persona.
+Monta um índice local com as hashtags das diretrizes de conteúdo da persona
+e as encontradas nos chunks da base de conhecimento, ranqueia por
+similaridade de embedding com o tópico e só recorre ao modelo de linguagem
+(prompt curto, apenas hashtags) quando o índice não preenche a quantidade pedida.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import metrics
+from ..core.timing import stage_timer
+from .ai_service import ai_service
+from .single_flight import SingleFlight
+from .vector_store import vector_store
+
+logger = logging.getLogger(__name__)
+
+MIX_STRATEGIES = ("popular", "niche", "balanced")
+
+_HASHTAG_PATTERN = re.compile(r"#(\w{2,})", re.UNICODE)
+_CAMEL_CASE = re.compile(r"(?<=[a-zà-ÿ])(?=[A-ZÀ-Þ])")
+
+
+def _hashtag_text(tag: str) -> str:
+    """Texto usado no embedding: #AlimentacaoSaudavel -> "Alimentacao Saudavel" """
+    return _CAMEL_CASE.sub(" ", tag.lstrip("#")).replace("_", " ")
+
+
+@dataclass
+class HashtagIndex:
+    """Hashtags de uma versão da persona com embeddings normalizados"""
+
+    tags: List[str]
+    popularity: np.ndarray  # 0-1, a partir da frequência de uso
+    embeddings: np.ndarray  # uma linha por hashtag
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+
+class HashtagEngine:
+    """
+    Sugestão de hashtags a partir do índice local da persona
+
+    Sem dados externos de alcance, a popularidade de cada hashtag é estimada
+    pela frequência com que aparece na base de conhecimento (hashtags das
+    diretrizes contam como as mais usadas). As hashtags relevantes ao tópico
+    são divididas em populares (popularidade acima da mediana) e de nicho:
+    "popular" prioriza as populares, "niche" as de nicho e "balanced"
+    intercala as duas listas, cada uma ordenada por similaridade.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[int, Tuple[str, HashtagIndex]] = {}
+        self._generations: Dict[int, int] = {}
+        self._builds = SingleFlight("hashtag_index")
+
+    @staticmethod
+    def _version(persona_data: Dict[str, Any]) -> str:
+        return str(persona_data.get('updated_at') or '')
+
+    async def _get_index(self, persona_data: Dict[str, Any]) -> HashtagIndex:
+        persona_id = persona_data.get('id')
+        version = self._version(persona_data)
+
+        cached = self._indexes.get(persona_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        generation = self._generations.get(persona_id, 0)
+        index, _ = await self._builds.run(
+            (persona_id, version, generation),
+            lambda: self._build_index(persona_data)
+        )
+
+        # Não guardar um índice montado antes de uma invalidação
+        if self._generations.get(persona_id, 0) == generation:
+            self._indexes[persona_id] = (version, index)
+        return index
+
+    async def _build_index(self, persona_data: Dict[str, Any]) -> HashtagIndex:
+        """Extrai as hashtags da persona e da base de conhecimento e gera os embeddings"""
+        persona_id = persona_data.get('id')
+        counts: Counter = Counter()
+        display: Dict[str, str] = {}
+
+        documents = await vector_store.get_persona_documents(
+            persona_id, limit=settings.HASHTAG_INDEX_MAX_CHUNKS)
+        for document in documents:
+            for tag in _HASHTAG_PATTERN.findall(document):
+                key = tag.lower()
+                counts[key] += 1
+                display.setdefault(key, f"#{tag}")
+
+        # Hashtags das diretrizes são as padrão da marca: contam como as mais frequentes
+        guideline_tags = (persona_data.get('content_guidelines') or {}).get('hashtags') or []
+        top_count = max(counts.values(), default=0) + 1
+        for tag in guideline_tags:
+            tag = str(tag).strip().lstrip('#')
+            if not tag:
+                continue
+            key = tag.lower()
+            counts[key] = max(counts[key], top_count)
+            display[key] = f"#{tag}"
+
+        if not counts:
+            return HashtagIndex(tags=[], popularity=np.zeros(0), embeddings=np.zeros((0, 0)))
+
+        keys = list(counts)
+        tags = [display[key] for key in keys]
+        embeddings = np.asarray(
+            await vector_store.embed_texts([_hashtag_text(tag) for tag in tags]),
+            dtype=np.float32
+        )
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1, norms)
+
+        max_log = math.log1p(max(counts.values()))
+        popularity = np.asarray(
+            [math.log1p(counts[key]) / max_log for key in keys], dtype=np.float32)
+
+        logger.info(
+            f"🏷️ Índice de hashtags da persona {persona_id}: {len(tags)} hashtags "
+            f"({len(documents)} chunks analisados)")
+        return HashtagIndex(tags=tags, popularity=popularity, embeddings=embeddings)
+
+    def _rank(
+        self,
+        index: HashtagIndex,
+        topic_embedding: np.ndarray,
+        count: int,
+        mix_strategy: str
+    ) -> List[str]:
+        """Hashtags relevantes ao tópico na ordem da estratégia"""
+        if not len(index):
+            return []
+
+        similarities = index.embeddings @ topic_embedding
+        relevant = [
+            i for i in np.argsort(-similarities)
+            if similarities[i] >= settings.HASHTAG_MIN_SIMILARITY
+        ]
+        if not relevant:
+            return []
+
+        median = float(np.median(index.popularity[relevant]))
+        popular = [i for i in relevant if index.popularity[i] > median]
+        niche = [i for i in relevant if index.popularity[i] <= median]
+
+        if mix_strategy == "popular":
+            ordered = popular + niche
+        elif mix_strategy == "niche":
+            ordered = niche + popular
+        else:
+            ordered = []
+            for pair in zip(popular, niche):
+                ordered.extend(pair)
+            shorter = min(len(popular), len(niche))
+            ordered += popular[shorter:] + niche[shorter:]
+
+        return [index.tags[i] for i in ordered[:count]]
+
+    async def suggest(
+        self,
+        persona_data: Dict[str, Any],
+        topic: str,
+        count: int = 15,
+        mix_strategy: str = "balanced"
+    ) -> Dict[str, Any]:
+        """
+        Sugere hashtags para o tópico
+
+        Returns:
+            {"hashtags": [...], "sources": {"index": n, "llm": m}, "model_used": "..."}
+        """
+        if mix_strategy not in MIX_STRATEGIES:
+            mix_strategy = "balanced"
+
+        hashtags: List[str] = []
+        try:
+            with stage_timer("hashtag_index"):
+                index = await self._get_index(persona_data)
+                topic_embedding = np.asarray(
+                    (await vector_store.embed_texts([topic]))[0], dtype=np.float32)
+                norm = np.linalg.norm(topic_embedding)
+                if norm:
+                    topic_embedding = topic_embedding / norm
+                hashtags = self._rank(index, topic_embedding, count, mix_strategy)
+        except Exception as e:
+            logger.warning(f"⚠️ Índice de hashtags indisponível: {e}")
+
+        from_index = len(hashtags)
+        metrics.increment("hashtag_index_suggestions_total", from_index)
+
+        # Completar com o modelo apenas o que o índice não cobriu
+        model_used = "hashtag_index"
+        if from_index < count:
+            metrics.increment("hashtag_llm_fallbacks_total")
+            hashtags += await ai_service.generate_hashtags(
+                persona_data,
+                topic,
+                count - from_index,
+                mix_strategy,
+                exclude=hashtags
+            )
+            model_used = ai_service.current_model_used()
+
+        return {
+            "hashtags": hashtags[:count],
+            "sources": {"index": from_index, "llm": len(hashtags) - from_index},
+            "model_used": model_used,
+        }
+
+    def invalidate_persona(self, persona_id: int):
+        """Descarta o índice da persona (persona ou base de conhecimento alterada)"""
+        self._generations[persona_id] = self._generations.get(persona_id, 0) + 1
+        if self._indexes.pop(persona_id, None):
+            logger.info(f"🧹 Índice de hashtags da persona {persona_id} invalidado")
+
+
+# Instância global
+hashtag_engine = HashtagEngine()
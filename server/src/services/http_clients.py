@@ -0,0 +1,106 @@
+"""
+Clientes HTTP compartilhados para os upstreams de IA.
+Mantém um pool de conexões (keep-alive) por upstream, criado no startup da
+aplicação e fechado no shutdown, evitando DNS + TCP + TLS a cada geração.
+"""
+
+import logging
+from typing import Dict
+
+import httpx
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    """Verifica se o suporte a HTTP/2 (pacote h2) está instalado"""
+    if not settings.HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HTTPClientManager:
+    """
+    Gerencia um httpx.AsyncClient por upstream
+
+    Upstreams:
+    - openrouter: API OpenRouter (HTTPS, HTTP/2 quando disponível)
+    - ollama: servidor Ollama local (HTTP/1.1)
+    - stability: API Stability AI (HTTPS, HTTP/2 quando disponível)
+    """
+
+    def __init__(self):
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _build_client(self, upstream: str) -> httpx.AsyncClient:
+        """Cria o cliente com limites de pool e timeout do upstream"""
+        read_timeouts = {
+            "openrouter": settings.OPENROUTER_TIMEOUT,
+            "ollama": settings.OLLAMA_TIMEOUT,
+            "stability": settings.STABILITY_TIMEOUT,
+        }
+        timeout = httpx.Timeout(
+            read_timeouts.get(upstream, 60.0),
+            connect=settings.HTTP_CONNECT_TIMEOUT
+        )
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+        )
+        # Ollama roda em HTTP puro local, onde HTTP/2 não se aplica
+        http2 = upstream != "ollama" and _http2_available()
+
+        return httpx.AsyncClient(timeout=timeout, limits=limits, http2=http2)
+
+    async def startup(self):
+        """Cria os clientes de todos os upstreams"""
+        for upstream in ("openrouter", "ollama", "stability"):
+            if upstream not in self.clients:
+                self.clients[upstream] = self._build_client(upstream)
+
+        logger.info(
+            f"✅ Clientes HTTP inicializados (HTTP/2: {'sim' if _http2_available() else 'não'})")
+
+    def get(self, upstream: str) -> httpx.AsyncClient:
+        """
+        Retorna o cliente do upstream
+
+        Se a aplicação ainda não passou pelo startup (ex.: scripts), o cliente
+        é criado sob demanda e reaproveitado nas chamadas seguintes.
+        """
+        client = self.clients.get(upstream)
+        if client is None or client.is_closed:
+            client = self._build_client(upstream)
+            self.clients[upstream] = client
+        return client
+
+    async def shutdown(self):
+        """Fecha todos os clientes e libera as conexões"""
+        for upstream, client in list(self.clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao fechar cliente HTTP {upstream}: {e}")
+        self.clients.clear()
+        logger.info("🔌 Clientes HTTP finalizados")
+
+
+# Instância global
+http_clients = HTTPClientManager()
+
+
+async def init_http_clients():
+    """Inicializa os clientes HTTP compartilhados"""
+    await http_clients.startup()
+
+
+async def close_http_clients():
+    """Fecha os clientes HTTP compartilhados"""
+    await http_clients.shutdown()
@@ -0,0 +1,75 @@
+"""
+Seleção diversificada de ideias de conteúdo.
+Aplica Maximal Marginal Relevance (MMR) sobre os embeddings de título +
+descrição: cada escolha equilibra relevância para a consulta (área de foco
+ou persona) e distância das ideias já escolhidas; quase duplicatas são
+descartadas.
+"""
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def select_diverse(
+    items: Sequence[Any],
+    embeddings: Sequence[Sequence[float]],
+    query_embedding: Optional[Sequence[float]],
+    count: int,
+    diversity_lambda: float,
+    duplicate_threshold: float
+) -> Tuple[List[Any], int]:
+    """
+    Escolhe até count itens por MMR
+
+    Args:
+        items: Itens candidatos
+        embeddings: Um embedding por item
+        query_embedding: Embedding da consulta (None: apenas diversidade)
+        count: Quantidade desejada
+        diversity_lambda: Peso da relevância (1 = só relevância, 0 = só diversidade)
+        duplicate_threshold: Similaridade de cosseno a partir da qual um item
+            é considerado duplicata de um já escolhido
+
+    Returns:
+        (itens escolhidos, número de quase duplicatas descartadas)
+    """
+    if not items or count <= 0:
+        return [], 0
+
+    vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    if query_embedding is not None:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        relevance = vectors @ (query / norm if norm else query)
+    else:
+        relevance = np.zeros(len(items), dtype=np.float32)
+
+    remaining = list(range(len(items)))
+    selected: List[int] = []
+    duplicates = 0
+
+    while remaining and len(selected) < count:
+        if selected:
+            redundancy = (vectors[remaining] @ vectors[selected].T).max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+
+        keep = redundancy < duplicate_threshold
+        duplicates += int((~keep).sum())
+        remaining = [index for index, kept in zip(remaining, keep) if kept]
+        redundancy = redundancy[keep]
+        if not remaining:
+            break
+
+        scores = diversity_lambda * relevance[remaining] - (1 - diversity_lambda) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+
+    return [items[index] for index in selected], duplicates
@@ -11,11 +11,12 @@ from pathlib import Path
 from datetime import datetime
 import logging
 
-import httpx
 from PIL import Image
 from io import BytesIO
 
 from ..core.config import settings
+from .admission import FairSemaphore
+from .http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +25,8 @@ class ImageService:
     """
     Text-to-Image com Stability AI (SDXL 1024)
 
-    - Usa httpx (já no requirements) para chamadas REST
+    - Usa o cliente httpx compartilhado (pool de conexões) para chamadas REST
+    - Limita as chamadas simultâneas (AI_MAX_CONCURRENCY_IMAGE) com fila justa entre usuários
     - Salva a imagem em /uploads/images e retorna URL relativa servida pelo FastAPI StaticFiles
     """
 
@@ -35,6 +37,7 @@ class ImageService:
         # Diretório de saída
         self.output_dir = Path("uploads") / "images"
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._slots = FairSemaphore("stability", settings.AI_MAX_CONCURRENCY_IMAGE)
 
     def _ensure_api_key(self):
         if not self.api_key:
@@ -115,12 +118,13 @@ class ImageService:
         if seed is not None:
             payload["seed"] = seed
 
-        async with httpx.AsyncClient(timeout=120) as client:
+        client = http_clients.get("stability")
+        async with self._slots:
             resp = await client.post(url, headers=headers, json=payload)
-            if resp.status_code != 200:
-                logger.error(f"Stability API error {resp.status_code}: {resp.text}")
-                raise ValueError("Falha ao gerar imagem na API de imagens.")
-            data = resp.json()
+        if resp.status_code != 200:
+            logger.error(f"Stability API error {resp.status_code}: {resp.text}")
+            raise ValueError("Falha ao gerar imagem na API de imagens.")
+        data = resp.json()
 
         artifacts = data.get("artifacts") or []
         if not artifacts:
@@ -0,0 +1,233 @@
+"""
+Pool de workers para jobs de geração assíncrona.
+As rotas gravam o job na tabela generation_jobs e o enfileiram; workers no
+próprio processo (JOB_WORKERS) executam o handler registrado para o tipo e
+gravam o resultado, que o cliente consulta por polling. No startup, jobs que
+estavam na fila ou em execução quando o servidor parou voltam para a fila.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.metrics import metrics
+from ..models.generation_job import GenerationJob, JobStatus
+from ..models.user import User
+from .admission import set_current_client
+from .provider_router import ProviderUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# handler(payload, usuário, sessão) -> resultado serializável
+JobHandler = Callable[[Dict[str, Any], User, Session], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueUnavailableError(Exception):
+    """Pool de workers ainda não iniciado (startup não concluído)"""
+
+
+class JobQueue:
+    """
+    Fila em memória + pool de workers, com estado persistido no banco
+
+    A fila guarda apenas ids; o banco é a fonte de verdade, então um job
+    interrompido (restart, deploy) é retomado por recover() até
+    JOB_MAX_ATTEMPTS execuções iniciadas.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running = 0
+
+    def register(self, job_type: str, handler: JobHandler):
+        """Registra o handler de um tipo de job"""
+        self._handlers[job_type] = handler
+
+    @property
+    def job_types(self) -> List[str]:
+        return list(self._handlers)
+
+    def _publish(self):
+        metrics.set_gauge("job_queue_depth", self._queue.qsize() if self._queue else 0)
+        metrics.set_gauge("job_workers_busy", self._running)
+
+    def _enqueue(self, job_id: str):
+        self._queue.put_nowait(job_id)
+        self._publish()
+
+    def submit(
+        self,
+        db: Session,
+        owner_id: int,
+        job_type: str,
+        payload: Dict[str, Any],
+        persona_id: Optional[int] = None
+    ) -> GenerationJob:
+        """Grava o job como queued e o coloca na fila"""
+        if self._queue is None:
+            raise JobQueueUnavailableError("Pool de workers não iniciado")
+        if job_type not in self._handlers:
+            raise ValueError(f"Tipo de job desconhecido: {job_type}")
+
+        job = GenerationJob(
+            id=str(uuid.uuid4()),
+            job_type=job_type,
+            owner_id=owner_id,
+            persona_id=persona_id,
+            status=JobStatus.QUEUED.value,
+            payload=payload,
+            attempts=0
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        self._enqueue(job.id)
+        metrics.increment("jobs_submitted_total", job_type=job_type)
+        logger.info(f"📥 Job {job.id} ({job_type}) enfileirado")
+        return job
+
+    def recover(self) -> int:
+        """Recoloca na fila os jobs interrompidos (queued/running) em ordem de criação"""
+        db = SessionLocal()
+        try:
+            jobs = db.query(GenerationJob).filter(
+                GenerationJob.status.in_([JobStatus.QUEUED.value, JobStatus.RUNNING.value])
+            ).order_by(GenerationJob.created_at).all()
+
+            recovered = 0
+            for job in jobs:
+                if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+                    job.status = JobStatus.FAILED.value
+                    job.error = "Job interrompido repetidamente pela reinicialização do servidor"
+                    job.finished_at = datetime.utcnow()
+                    continue
+                job.status = JobStatus.QUEUED.value
+                self._enqueue(job.id)
+                recovered += 1
+            db.commit()
+
+            if jobs:
+                logger.info(f"♻️ {recovered} jobs recuperados ({len(jobs) - recovered} marcados como falha)")
+            return recovered
+        finally:
+            db.close()
+
+    async def start(self):
+        """Cria a fila, recupera jobs pendentes e inicia os workers"""
+        self._queue = asyncio.Queue()
+        self.recover()
+        self._workers = [
+            asyncio.create_task(self._worker(index))
+            for index in range(max(1, settings.JOB_WORKERS))
+        ]
+        logger.info(f"👷 {len(self._workers)} workers de geração iniciados")
+
+    async def stop(self):
+        """
+        Cancela os workers; jobs em execução ficam como running no banco
+        e são retomados no próximo startup
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            self._running += 1
+            self._publish()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Worker {index} falhou ao executar o job {job_id}: {e}")
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+                self._publish()
+
+    async def _run(self, job_id: str):
+        db = SessionLocal()
+        try:
+            job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+            if not job or job.is_finished:
+                return
+
+            handler = self._handlers.get(job.job_type)
+            user = db.query(User).filter(User.id == job.owner_id).first()
+            if handler is None or user is None:
+                job.status = JobStatus.FAILED.value
+                job.error = "Tipo de job ou usuário inválido"
+                job.finished_at = datetime.utcnow()
+                db.commit()
+                return
+
+            job.status = JobStatus.RUNNING.value
+            job.attempts = (job.attempts or 0) + 1
+            job.started_at = datetime.utcnow()
+            db.commit()
+            if job.created_at:
+                metrics.observe(
+                    "job_queue_wait_seconds",
+                    max(0.0, (job.started_at - job.created_at.replace(tzinfo=None)).total_seconds()),
+                    job_type=job.job_type
+                )
+
+            # Fila justa dos providers: o job conta como requisição do dono
+            set_current_client(job.owner_id)
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    handler(dict(job.payload or {}), user, db),
+                    timeout=settings.JOB_TIMEOUT_SECONDS
+                )
+                # Garantir JSON puro (datetimes etc.) para a coluna result
+                job.result = json.loads(json.dumps(result, default=str))
+                job.status = JobStatus.COMPLETED.value
+            except asyncio.TimeoutError:
+                job.status = JobStatus.FAILED.value
+                job.error = "Tempo limite do job excedido"
+            except ProviderUnavailableError:
+                job.status = JobStatus.FAILED.value
+                job.error = "Serviço de IA temporariamente indisponível"
+            except Exception as e:
+                # HTTPException das validações traz a mensagem em detail
+                detail = getattr(e, 'detail', None)
+                job.status = JobStatus.FAILED.value
+                job.error = detail if isinstance(detail, str) else "Erro interno na geração de conteúdo"
+                if detail is None:
+                    logger.error(f"❌ Erro no job {job.id} ({job.job_type}): {e}")
+
+            job.finished_at = datetime.utcnow()
+            db.commit()
+
+            metrics.increment("jobs_finished_total", job_type=job.job_type, status=job.status)
+            metrics.observe("job_run_seconds", time.perf_counter() - started, job_type=job.job_type)
+            logger.info(f"🏁 Job {job.id} ({job.job_type}) terminou como {job.status}")
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "busy": self._running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "job_types": self.job_types,
+        }
+
+
+# Instância global
+job_queue = JobQueue()
@@ -0,0 +1,152 @@
+"""
+Extração tolerante de JSON em respostas de modelos de linguagem.
+Modelos locais costumam envolver o JSON em blocos ```json ou acrescentar
+texto antes e depois dele; o extrator localiza o primeiro objeto válido,
+conserta problemas comuns (vírgulas sobrando, resposta truncada) e pode ser
+alimentado token a token durante o streaming.
+"""
+
+import json
+import re
+from typing import Any, List, Optional
+
+# Fechamento esperado para cada abertura
+_CLOSERS = {"{": "}", "[": "]"}
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_DANGLING_KEY = re.compile(r',?\s*"(?:[^"\\]|\\.)*"\s*:\s*$')
+_UNFINISHED_KEY = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*$')
+
+# Sentinela para JSON inválido (None é um valor JSON possível)
+_INVALID = object()
+
+
+def _loads(text: str) -> Any:
+    """json.loads tolerante: aceita quebras de linha em strings e vírgulas sobrando"""
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            return json.loads(candidate, strict=False)
+        except json.JSONDecodeError:
+            continue
+    return _INVALID
+
+
+class StreamingJSONExtractor:
+    """
+    Localiza incrementalmente o primeiro objeto (ou lista) JSON em um texto
+
+    feed() recebe trechos conforme chegam e faz a varredura apenas do que
+    ainda não foi lido, acompanhando strings e aninhamento. Quando o bloco
+    fecha e é válido, value fica disponível; se não for válido, a busca
+    recomeça a partir do caractere seguinte à abertura. finish() tenta
+    fechar um objeto truncado (resposta cortada por max_tokens).
+
+    Args:
+        allow_list: Se listas no nível raiz também são aceitas
+    """
+
+    def __init__(self, allow_list: bool = False):
+        self._openers = "{[" if allow_list else "{"
+        self._text = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self.value: Any = None
+        self.done = False
+        self.recovered = False
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> Any:
+        """Acrescenta um trecho e retorna o valor se o JSON já estiver completo"""
+        if not self.done:
+            self._text += chunk
+            self._scan()
+        return self.value
+
+    def _reset_candidate(self) -> int:
+        restart = self._start + 1
+        self._start = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        return restart
+
+    def _scan(self):
+        text = self._text
+        i = self._pos
+
+        while i < len(text) and not self.done:
+            ch = text[i]
+
+            if self._start is None:
+                if ch in self._openers:
+                    self._start = i
+                    self._stack = [_CLOSERS[ch]]
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in _CLOSERS:
+                self._stack.append(_CLOSERS[ch])
+            elif ch in "}]":
+                if ch != self._stack[-1]:
+                    i = self._reset_candidate()
+                    continue
+                self._stack.pop()
+                if not self._stack:
+                    value = _loads(text[self._start:i + 1])
+                    if value is _INVALID:
+                        i = self._reset_candidate()
+                        continue
+                    self.value = value
+                    self.done = True
+            i += 1
+
+        self._pos = i
+
+    def finish(self) -> Any:
+        """
+        Encerra a extração
+
+        Returns:
+            O JSON encontrado, um objeto truncado fechado à força ou None
+        """
+        if not self.done and self._start is not None:
+            candidate = self._text[self._start:]
+            if self._in_string:
+                candidate += '"'
+            candidate = _DANGLING_KEY.sub("", candidate.rstrip())
+            if self._stack[-1] == "}":
+                # Chave cortada antes dos dois-pontos
+                candidate = _UNFINISHED_KEY.sub(r"\1", candidate)
+            candidate = candidate.rstrip().rstrip(",")
+            value = _loads(candidate + "".join(reversed(self._stack)))
+            if value is not _INVALID:
+                self.value = value
+                self.done = True
+
+        if self.done:
+            # Recuperado: a resposta não era JSON puro
+            self.recovered = _loads(self._text.strip()) is _INVALID
+
+        return self.value
+
+
+def extract_json(text: str, allow_list: bool = False) -> Any:
+    """Extrai o primeiro JSON de uma resposta completa (None se não houver)"""
+    extractor = StreamingJSONExtractor(allow_list=allow_list)
+    extractor.feed(text)
+    return extractor.finish()
@@ -0,0 +1,266 @@
+"""
+Índice lexical (SQLite FTS5 + BM25) da base de conhecimento.
+A similaridade do MiniLM perde termos exatos (nomes de produto, termos da
+marca, hashtags) que importam para as legendas. Cada persona tem uma tabela
+FTS5 com os mesmos chunks da sua coleção no ChromaDB, mantida em sincronia
+pelo banco vetorial, e as buscas retornam os chunks por relevância BM25.
+
+O arquivo usa WAL: as gravações passam por uma única conexão de escrita e
+cada thread de leitura tem a sua, de modo que as buscas leem o último
+estado confirmado enquanto uma ingestão grava (em lotes curtos).
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Termos da consulta (letras/números; # e @ viram separadores, como no índice)
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Limite de termos por consulta (consultas longas viram OR de muitos termos)
+MAX_QUERY_TERMS = 32
+
+# Chunks gravados por transação na ingestão
+WRITE_BATCH_SIZE = 500
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Consulta FTS5: termos entre aspas unidos por OR (sem operadores do usuário)"""
+    terms = list(dict.fromkeys(term.lower() for term in _TERM_PATTERN.findall(query)))
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms[:MAX_QUERY_TERMS])
+
+
+class LexicalIndex:
+    """
+    Tabelas FTS5 por persona em um arquivo SQLite local
+
+    Os métodos são síncronos (SQLite + disco) e devem rodar fora do event
+    loop, nos pools do banco vetorial: gravações no pool de ingestão (uma
+    conexão de escrita, serializada por lock) e buscas no pool de consultas
+    (uma conexão somente leitura por thread).
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._write_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        # Conexões de leitura por thread (ident da thread)
+        self._readers_lock = threading.Lock()
+        self._readers: Dict[int, sqlite3.Connection] = {}
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return sqlite3.connect(str(self.path), check_same_thread=False, timeout=20)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Conexão de escrita (chamar com _write_lock)"""
+        if self._writer is None:
+            connection = self._open()
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._writer = connection
+        return self._writer
+
+    def _reader(self) -> sqlite3.Connection:
+        """Conexão de leitura da thread atual"""
+        thread_id = threading.get_ident()
+        with self._readers_lock:
+            connection = self._readers.get(thread_id)
+        if connection is None:
+            if self._writer is None:
+                # Garante o modo WAL no arquivo antes da primeira leitura
+                with self._write_lock:
+                    self._connect()
+            connection = self._open()
+            connection.execute("PRAGMA query_only = ON")
+            with self._readers_lock:
+                self._readers[thread_id] = connection
+        return connection
+
+    @staticmethod
+    def table_name(persona_id: int) -> str:
+        return f"persona_{int(persona_id)}_chunks"
+
+    def has_persona(self, persona_id: int) -> bool:
+        """Verifica se a tabela da persona já existe"""
+        row = self._reader().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (self.table_name(persona_id),)
+        ).fetchone()
+        return row is not None
+
+    def _create_table(self, connection: sqlite3.Connection, table: str):
+        # remove_diacritics: "promoção" também encontra "promocao"
+        connection.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            "chunk_id UNINDEXED, document_id UNINDEXED, content, metadata UNINDEXED,"
+            " tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def _insert(
+        self,
+        table: str,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]]
+    ):
+        """Grava os chunks em lotes de WRITE_BATCH_SIZE, cada um em sua transação"""
+        rows = [
+            (chunk_id, metadata.get("document_id"), document, json.dumps(metadata, ensure_ascii=False, default=str))
+            for chunk_id, document, metadata in zip(ids, documents, metadatas)
+        ]
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            with self._write_lock:
+                connection = self._connect()
+                connection.executemany(
+                    f"INSERT INTO {table} (chunk_id, document_id, content, metadata) VALUES (?, ?, ?, ?)",
+                    rows[start:start + WRITE_BATCH_SIZE]
+                )
+                connection.commit()
+
+    def add(
+        self,
+        persona_id: int,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]]
+    ):
+        """
+        Indexa chunks da persona (cria a tabela se necessário)
+
+        Os lotes ficam visíveis às buscas conforme são gravados; se a
+        gravação falhar no meio, quem chamou desfaz com delete_ids.
+        """
+        table = self.table_name(persona_id)
+        with self._write_lock:
+            connection = self._connect()
+            self._create_table(connection, table)
+            connection.commit()
+        self._insert(table, ids, documents, metadatas)
+
+    def rebuild(
+        self,
+        persona_id: int,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]]
+    ):
+        """
+        Recria a tabela da persona com os chunks dados
+
+        Grava em uma tabela auxiliar e só no fim a renomeia, para que uma
+        reconstrução interrompida não deixe a persona com um índice parcial.
+        """
+        table = self.table_name(persona_id)
+        staging = f"{table}_rebuild"
+        with self._write_lock:
+            connection = self._connect()
+            connection.execute(f"DROP TABLE IF EXISTS {staging}")
+            self._create_table(connection, staging)
+            connection.commit()
+
+        self._insert(staging, ids, documents, metadatas)
+
+        with self._write_lock:
+            connection = self._connect()
+            connection.execute(f"DROP TABLE IF EXISTS {table}")
+            connection.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+            connection.commit()
+
+    def delete_ids(self, persona_id: int, ids: Sequence[str]):
+        """Remove chunks pelo id (desfaz uma indexação parcial)"""
+        if not ids:
+            return
+        ids = list(ids)
+        table = self.table_name(persona_id)
+        for start in range(0, len(ids), WRITE_BATCH_SIZE):
+            with self._write_lock:
+                connection = self._connect()
+                self._create_table(connection, table)
+                connection.executemany(
+                    f"DELETE FROM {table} WHERE chunk_id = ?",
+                    [(chunk_id,) for chunk_id in ids[start:start + WRITE_BATCH_SIZE]]
+                )
+                connection.commit()
+
+    def delete_document(self, persona_id: int, document_id: str) -> int:
+        """Remove todos os chunks de um documento; retorna quantos foram removidos"""
+        with self._write_lock:
+            connection = self._connect()
+            self._create_table(connection, self.table_name(persona_id))
+            cursor = connection.execute(
+                f"DELETE FROM {self.table_name(persona_id)} WHERE document_id = ?", (document_id,))
+            connection.commit()
+            return cursor.rowcount
+
+    def drop_persona(self, persona_id: int):
+        """Remove a tabela da persona"""
+        with self._write_lock:
+            connection = self._connect()
+            connection.execute(f"DROP TABLE IF EXISTS {self.table_name(persona_id)}")
+            connection.commit()
+
+    def search(
+        self,
+        persona_id: int,
+        query: str,
+        n_results: int,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Chunks mais relevantes por BM25 (melhor primeiro)
+
+        filter_metadata aceita igualdades simples ({"kb_id": 3}), como no ChromaDB.
+        """
+        match = build_match_query(query)
+        if match is None:
+            return []
+
+        sql = (
+            f"SELECT chunk_id, content, metadata, bm25({self.table_name(persona_id)}) AS rank"
+            f" FROM {self.table_name(persona_id)} WHERE {self.table_name(persona_id)} MATCH ?"
+        )
+        params: List[Any] = [match]
+        for key, value in (filter_metadata or {}).items():
+            if not re.fullmatch(r"\w+", key):
+                raise ValueError(f"Filtro de metadado inválido: {key}")
+            sql += f" AND json_extract(metadata, '$.{key}') = ?"
+            params.append(value)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(n_results)
+
+        try:
+            rows = self._reader().execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            # Persona ainda sem tabela: nada indexado
+            if "no such table" in str(e):
+                return []
+            raise
+
+        # bm25() é negativo: quanto menor, mais relevante
+        return [
+            {
+                "content": content,
+                "metadata": json.loads(metadata) if metadata else {},
+                "id": chunk_id,
+                "bm25": round(-rank, 4),
+            }
+            for chunk_id, content, metadata, rank in rows
+        ]
+
+    def close(self):
+        with self._readers_lock:
+            readers, self._readers = list(self._readers.values()), {}
+        for connection in readers:
+            connection.close()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
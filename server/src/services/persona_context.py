@@ -0,0 +1,133 @@
+"""
+Cache de contextos de persona pré-compilados.
+Guarda, por persona e versão (updated_at), os dados preparados para a IA, o
+bloco de contexto renderizado para os prompts e artefatos derivados
+(contagem de tokens e embedding), evitando remontá-los a cada geração.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from ..core.metrics import metrics
+from .prompt_assembler import estimate_tokens
+from .vector_store import vector_store
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompiledPersonaContext:
+    """Bloco de contexto de uma versão da persona e seus artefatos derivados"""
+
+    text: str
+    token_count: int
+    embedding: Optional[np.ndarray] = field(default=None, repr=False)
+
+
+class PersonaContextCache:
+    """
+    Cache por (persona_id, updated_at)
+
+    Uma nova versão da persona (updated_at diferente) substitui a anterior.
+    Como o SQLite pode reutilizar o id de uma persona deletada, as rotas de
+    atualização, duplicação e exclusão também invalidam a entrada pelo id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._persona_data: Dict[int, Tuple[Hashable, Dict[str, Any]]] = {}
+        self._contexts: Dict[int, Tuple[Hashable, CompiledPersonaContext]] = {}
+
+    @staticmethod
+    def _version(persona_data: Dict[str, Any]) -> Hashable:
+        return str(persona_data.get('updated_at') or '')
+
+    def get_persona_data(
+        self,
+        persona_id: int,
+        version: Hashable,
+        build: Callable[[], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Dados da persona preparados para a IA (build() só roda em cache miss)"""
+        version = str(version or '')
+        with self._lock:
+            cached = self._persona_data.get(persona_id)
+        if cached and cached[0] == version:
+            return dict(cached[1])
+
+        persona_data = build()
+        with self._lock:
+            self._persona_data[persona_id] = (version, persona_data)
+        return dict(persona_data)
+
+    def get_context(
+        self,
+        persona_data: Dict[str, Any],
+        render: Callable[[Dict[str, Any]], str]
+    ) -> CompiledPersonaContext:
+        """Bloco de contexto da persona (render() só roda em cache miss)"""
+        persona_id = persona_data.get('id')
+        if persona_id is None:
+            text = render(persona_data)
+            return CompiledPersonaContext(text=text, token_count=estimate_tokens(text))
+
+        version = self._version(persona_data)
+        with self._lock:
+            cached = self._contexts.get(persona_id)
+        if cached and cached[0] == version:
+            metrics.increment("persona_context_cache_hits_total")
+            return cached[1]
+
+        metrics.increment("persona_context_cache_misses_total")
+        text = render(persona_data)
+        compiled = CompiledPersonaContext(text=text, token_count=estimate_tokens(text))
+        with self._lock:
+            self._contexts[persona_id] = (version, compiled)
+        return compiled
+
+    async def get_embedding(
+        self,
+        persona_data: Dict[str, Any],
+        render: Callable[[Dict[str, Any]], str]
+    ) -> Optional[np.ndarray]:
+        """Embedding normalizado do contexto da persona, calculado na primeira vez que é pedido"""
+        compiled = self.get_context(persona_data, render)
+        if compiled.embedding is None:
+            try:
+                embedding = np.asarray(
+                    (await vector_store.embed_texts([compiled.text]))[0], dtype=np.float32)
+            except Exception as e:
+                logger.warning(f"⚠️ Não foi possível gerar o embedding da persona: {e}")
+                return None
+            norm = np.linalg.norm(embedding)
+            compiled.embedding = embedding / norm if norm else embedding
+        return compiled.embedding
+
+    def invalidate_persona(self, persona_id: int):
+        """Remove os dados e o contexto compilado da persona"""
+        with self._lock:
+            removed = self._contexts.pop(persona_id, None)
+            self._persona_data.pop(persona_id, None)
+        if removed:
+            logger.info(f"🧹 Contexto compilado da persona {persona_id} invalidado")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = metrics.get_counter("persona_context_cache_hits_total")
+        misses = metrics.get_counter("persona_context_cache_misses_total")
+        total = hits + misses
+        with self._lock:
+            entries = len(self._contexts)
+        return {
+            "hits": int(hits),
+            "misses": int(misses),
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "entries": entries,
+        }
+
+
+# Instância global
+persona_context_cache = PersonaContextCache()
@@ -0,0 +1,131 @@
+"""
+Montagem de prompts com orçamento de tokens.
+Estima tokens de forma aproximada (sem depender do tokenizer de cada
+provider) e seleciona os trechos do RAG que cabem no orçamento, deixando
+espaço para a resposta do modelo (MAX_TOKENS).
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Tuple
+
+from ..core.config import settings
+
+# Palavras e sinais de pontuação, aproximando a segmentação de tokenizers BPE
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Média de caracteres por token de palavras longas em tokenizers BPE
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estima o número de tokens de um texto
+
+    Cada sinal de pontuação conta como um token e cada palavra como
+    ceil(len / 4) tokens, o que fica próximo dos tokenizers do Gemini,
+    Llama e modelos do OpenRouter para português e inglês.
+    """
+    if not text:
+        return 0
+    return sum(
+        max(1, math.ceil(len(piece) / _CHARS_PER_TOKEN))
+        for piece in _TOKEN_PATTERN.findall(text)
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta o texto para caber em max_tokens, preferindo terminar em fim de frase"""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    # Um token fica reservado para as reticências
+    limit = max_tokens - 1
+    used = 0
+    end = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += max(1, math.ceil(len(match.group()) / _CHARS_PER_TOKEN))
+        if used > limit:
+            break
+        end = match.end()
+
+    truncated = text[:end]
+    # Voltar até o último fim de frase se ele não descartar mais da metade do trecho
+    sentence_end = max(truncated.rfind(". "), truncated.rfind("! "), truncated.rfind("? "))
+    if sentence_end > len(truncated) // 2:
+        truncated = truncated[:sentence_end + 1]
+
+    return truncated.rstrip() + "…"
+
+
+class PromptAssembler:
+    """
+    Distribui o orçamento de tokens do prompt
+
+    O orçamento do RAG é o menor entre RAG_CONTEXT_MAX_TOKENS e o que sobra da
+    janela de contexto (AI_CONTEXT_WINDOW_TOKENS) depois do prompt base e da
+    reserva para a resposta (MAX_TOKENS).
+    """
+
+    # Tokens reservados para o cabeçalho de cada documento ("Documento 1 - título:")
+    CHUNK_HEADER_TOKENS = 12
+
+    def rag_budget(self, base_prompt: str, reserved_tokens: int = 0) -> int:
+        """
+        Tokens disponíveis para o contexto RAG
+
+        Args:
+            base_prompt: Prompt montado sem o contexto RAG
+            reserved_tokens: Tokens já conhecidos que ainda serão inseridos no
+                prompt (ex.: contexto da persona pré-compilado)
+        """
+        available = (
+            settings.AI_CONTEXT_WINDOW_TOKENS
+            - settings.MAX_TOKENS
+            - estimate_tokens(base_prompt)
+            - reserved_tokens
+        )
+        return max(0, min(settings.RAG_CONTEXT_MAX_TOKENS, available))
+
+    def select_chunks(
+        self,
+        similar_docs: List[Dict[str, Any]],
+        budget_tokens: int
+    ) -> List[Tuple[Dict[str, Any], str]]:
+        """
+        Seleciona os trechos mais bem ranqueados que cabem no orçamento
+
+        Os documentos chegam ordenados por relevância. Trechos inteiros são
+        incluídos enquanto couberem; o primeiro que não couber é truncado se
+        ainda restarem pelo menos RAG_MIN_CHUNK_TOKENS, e a seleção termina.
+
+        Returns:
+            Lista de (documento, conteúdo possivelmente truncado)
+        """
+        selected: List[Tuple[Dict[str, Any], str]] = []
+        remaining = budget_tokens
+
+        for doc in similar_docs:
+            content = doc.get('content') or ''
+            if not content:
+                continue
+
+            available = remaining - self.CHUNK_HEADER_TOKENS
+            tokens = estimate_tokens(content)
+
+            if tokens <= available:
+                selected.append((doc, content))
+                remaining -= tokens + self.CHUNK_HEADER_TOKENS
+                continue
+
+            if available >= settings.RAG_MIN_CHUNK_TOKENS:
+                selected.append((doc, truncate_to_tokens(content, available)))
+            break
+
+        return selected
+
+
+# Instância global
+prompt_assembler = PromptAssembler()
@@ -0,0 +1,385 @@
+"""
+Roteamento entre providers de texto.
+Mantém latência (p50/p95) e taxa de erro em janela móvel para cada provider,
+envia cada requisição ao provider saudável mais rápido e, opcionalmente,
+dispara uma requisição "hedge" para um segundo provider após um atraso.
+Uma pequena fração das requisições (AI_ROUTER_EXPLORE_RATE) vai para
+providers sem amostras suficientes ou recentes, para que o ranking continue
+refletindo a latência atual de todos.
+Cada provider tem um circuit breaker; falhas seguem a ordem de fallback.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.metrics import metrics
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from .text_providers import TextProvider
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderUnavailableError(Exception):
+    """Nenhum provider de texto conseguiu atender a requisição"""
+
+
+class ProviderStats:
+    """Estatísticas em janela móvel de um provider"""
+
+    def __init__(self, window_size: int):
+        self.latencies: deque = deque(maxlen=window_size)
+        self.outcomes: deque = deque(maxlen=window_size)
+        self.last_sample_at: Optional[float] = None
+
+    def record(self, latency: float, success: bool):
+        if success:
+            self.latencies.append(latency)
+        self.outcomes.append(success)
+        self.last_sample_at = time.monotonic()
+
+    def is_stale(self, min_samples: int, max_age: float) -> bool:
+        """Poucas amostras ou nenhuma amostra recente"""
+        if len(self.outcomes) < min_samples or self.last_sample_at is None:
+            return True
+        return time.monotonic() - self.last_sample_at > max_age
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Percentil (0-100) das latências de sucesso, em segundos"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - (sum(self.outcomes) / len(self.outcomes))
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50 = self.percentile(50)
+        p95 = self.percentile(95)
+        return {
+            "samples": len(self.outcomes),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+        }
+
+
+class ProviderRouter:
+    """
+    Escolhe o provider de texto para cada requisição
+
+    Ordenação: providers saudáveis (taxa de erro <= AI_ROUTER_MAX_ERROR_RATE,
+    avaliada a partir de AI_ROUTER_MIN_SAMPLES amostras) primeiro, depois
+    menor p50. Providers ainda sem amostras ficam depois dos
+    já medidos, na ordem configurada (o primário vem primeiro). Com
+    probabilidade AI_ROUTER_EXPLORE_RATE, a requisição vai primeiro para um
+    provider saudável com poucas amostras (ou sem amostras recentes), que
+    assim entra no ranking; se ele falhar, a cadeia de fallback continua.
+
+    Providers com circuito aberto são ignorados. Se o provider escolhido
+    falhar, os demais são tentados na ordem de AI_FALLBACK_ORDER.
+    """
+
+    def __init__(self, providers: Dict[str, TextProvider], primary: str):
+        self.providers = providers
+        self.primary = primary
+        self.order = [primary] + [name for name in providers if name != primary]
+        self.stats = {
+            name: ProviderStats(settings.AI_ROUTER_WINDOW_SIZE)
+            for name in providers
+        }
+        self.breakers = {
+            name: CircuitBreaker(
+                name,
+                failure_threshold=settings.AI_BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=settings.AI_BREAKER_RECOVERY_SECONDS
+            )
+            for name in providers
+        }
+
+    def _is_healthy(self, name: str) -> bool:
+        stats = self.stats[name]
+        # Exige um mínimo de amostras para não descartar o provider por um erro isolado
+        if len(stats.outcomes) < settings.AI_ROUTER_MIN_SAMPLES:
+            return True
+        return stats.error_rate <= settings.AI_ROUTER_MAX_ERROR_RATE
+
+    def ranked(self) -> List[TextProvider]:
+        """Providers disponíveis em ordem de preferência para a próxima requisição"""
+        def sort_key(name: str):
+            p50 = self.stats[name].percentile(50)
+            return (
+                0 if self._is_healthy(name) else 1,
+                p50 if p50 is not None else float("inf"),
+                self.order.index(name),
+            )
+
+        available = [name for name in self.order if self.breakers[name].is_available()]
+        return [self.providers[name] for name in sorted(available, key=sort_key)]
+
+    def _exploration_target(self, ranked: List[TextProvider]) -> Optional[TextProvider]:
+        """Provider a medir nesta requisição (None = seguir o ranking)"""
+        if len(ranked) < 2 or random.random() >= settings.AI_ROUTER_EXPLORE_RATE:
+            return None
+
+        candidates = [
+            provider for provider in ranked[1:]
+            if self._is_healthy(provider.name) and self.stats[provider.name].is_stale(
+                settings.AI_ROUTER_MIN_SAMPLES, settings.AI_ROUTER_STALE_SECONDS)
+        ]
+        if not candidates:
+            return None
+        # O menos amostrado primeiro; empate: o que está há mais tempo sem medição
+        return min(
+            candidates,
+            key=lambda provider: (
+                len(self.stats[provider.name].outcomes),
+                self.stats[provider.name].last_sample_at or 0.0,
+            )
+        )
+
+    def fallback_chain(self, explore: bool = False) -> List[TextProvider]:
+        """
+        Sequência de tentativas: o melhor provider do ranking seguido dos
+        demais na ordem de AI_FALLBACK_ORDER (ou do ranking, se não configurada)
+
+        Com explore=True, um provider a medir pode assumir a primeira posição.
+        """
+        ranked = self.ranked()
+        if not ranked:
+            return []
+
+        target = self._exploration_target(ranked) if explore else None
+        if target is not None:
+            metrics.increment("provider_explorations_total", provider=target.name)
+            ranked = [target] + [provider for provider in ranked if provider is not target]
+
+        configured = [name for name in settings.fallback_order if name in self.providers]
+        rest = sorted(
+            ranked[1:],
+            key=lambda provider: (
+                configured.index(provider.name) if provider.name in configured else len(configured),
+                ranked.index(provider),
+            )
+        )
+        return [ranked[0]] + rest
+
+    def _hedge_delay(self, provider: TextProvider) -> float:
+        """Atraso antes do hedge: configurado ou p95 observado do provider"""
+        if settings.AI_HEDGE_DELAY_MS > 0:
+            return settings.AI_HEDGE_DELAY_MS / 1000
+        p95 = self.stats[provider.name].percentile(95)
+        return p95 if p95 is not None else 2.0
+
+    async def _call(
+        self,
+        provider: TextProvider,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Executa a chamada registrando latência e resultado"""
+        breaker = self.breakers[provider.name]
+        if not breaker.allow_request():
+            raise CircuitOpenError(provider.name)
+
+        start = time.perf_counter()
+        try:
+            text = await provider.generate(prompt, response_schema)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception:
+            self._record(provider, time.perf_counter() - start, False)
+            raise
+
+        self._record(provider, time.perf_counter() - start, True)
+        return text
+
+    def _record(self, provider: TextProvider, latency: float, success: bool):
+        self.stats[provider.name].record(latency, success)
+        breaker = self.breakers[provider.name]
+        if success:
+            breaker.record_success()
+        else:
+            was_open = breaker.state == CircuitBreaker.OPEN
+            breaker.record_failure()
+            if not was_open and breaker.state == CircuitBreaker.OPEN:
+                logger.warning(f"🔌 Circuito aberto para o provider {provider.name}")
+                metrics.increment("provider_circuit_opened_total", provider=provider.name)
+        metrics.increment(
+            "provider_requests_total",
+            provider=provider.name,
+            outcome="success" if success else "error"
+        )
+
+    async def generate(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> Tuple[str, TextProvider]:
+        """
+        Gera texto no melhor provider disponível
+
+        Args:
+            response_schema: Schema da resposta em JSON (ver TextProvider)
+
+        Returns:
+            (texto gerado, provider que respondeu)
+        """
+        chain = self.fallback_chain(explore=True)
+        if not chain:
+            raise ProviderUnavailableError("Nenhum provider de texto disponível (circuitos abertos)")
+
+        last_error: Optional[BaseException] = None
+        remaining = chain
+
+        if settings.AI_HEDGE_ENABLED and len(chain) >= 2:
+            attempted: List[TextProvider] = []
+            try:
+                return await self._generate_hedged(
+                    chain[0], chain[1], prompt, response_schema, attempted)
+            except Exception as e:
+                last_error = e
+            # Segue com os providers que o hedge não chegou a tentar
+            remaining = [provider for provider in chain if provider not in attempted]
+
+        for index, provider in enumerate(remaining):
+            if index > 0 or last_error is not None:
+                metrics.increment("provider_fallbacks_total", provider=provider.name)
+                logger.warning(f"↪️ Fallback para o provider {provider.name}")
+            try:
+                return await self._call(provider, prompt, response_schema), provider
+            except CircuitOpenError as e:
+                last_error = last_error or e
+            except Exception as e:
+                logger.error(f"❌ Provider {provider.name} falhou: {e}")
+                last_error = e
+
+        raise ProviderUnavailableError("Todos os providers de texto falharam") from last_error
+
+    async def _generate_hedged(
+        self,
+        primary: TextProvider,
+        backup: TextProvider,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None,
+        attempted: Optional[List[TextProvider]] = None
+    ) -> Tuple[str, TextProvider]:
+        """
+        Dispara o backup se o primário não responder dentro do atraso de hedge
+
+        Se o primário falhar antes do atraso, o backup é disparado na hora.
+        Os providers efetivamente tentados são acrescentados a attempted.
+        """
+        attempted = attempted if attempted is not None else []
+        tasks = {asyncio.create_task(self._call(primary, prompt, response_schema)): primary}
+        attempted.append(primary)
+
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(primary))
+            primary_task = next(iter(tasks))
+            if done and primary_task.exception() is None:
+                return primary_task.result(), primary
+
+            hedged = not done
+            if not hedged:
+                logger.warning(f"↪️ {primary.name} falhou antes do hedge, disparando {backup.name}")
+                metrics.increment("provider_fallbacks_total", provider=backup.name)
+            else:
+                metrics.increment("provider_hedged_requests_total", provider=backup.name)
+                logger.info(f"⏱️ Hedge: {primary.name} lento, disparando {backup.name}")
+            tasks[asyncio.create_task(self._call(backup, prompt, response_schema))] = backup
+            attempted.append(backup)
+
+            pending = set(tasks)
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = tasks[task]
+                        if winner is backup and hedged:
+                            metrics.increment("provider_hedge_wins_total", provider=backup.name)
+                        return task.result(), winner
+                    last_error = task.exception()
+
+            raise last_error
+        finally:
+            # Cancelar a requisição perdedora
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def stream(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[str, TextProvider]]:
+        """
+        Streaming no melhor provider (sem hedge), registrando a latência total
+
+        O fallback só acontece enquanto nenhum token foi emitido; depois
+        disso, uma falha é repassada ao chamador.
+        """
+        chain = self.fallback_chain(explore=True)
+        if not chain:
+            raise ProviderUnavailableError("Nenhum provider de texto disponível (circuitos abertos)")
+
+        last_error: Optional[BaseException] = None
+        for provider in chain:
+            breaker = self.breakers[provider.name]
+            if not breaker.allow_request():
+                continue
+            if last_error is not None:
+                metrics.increment("provider_fallbacks_total", provider=provider.name)
+
+            emitted = False
+            start = time.perf_counter()
+            try:
+                async for token in provider.stream(prompt, response_schema):
+                    emitted = True
+                    yield token, provider
+            except (asyncio.CancelledError, GeneratorExit):
+                breaker.release()
+                raise
+            except Exception as e:
+                self._record(provider, time.perf_counter() - start, False)
+                if emitted:
+                    raise
+                logger.error(f"❌ Provider {provider.name} falhou no streaming: {e}")
+                last_error = e
+                continue
+
+            self._record(provider, time.perf_counter() - start, True)
+            return
+
+        raise ProviderUnavailableError("Todos os providers de texto falharam") from last_error
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estatísticas atuais de cada provider"""
+        return {
+            "primary": self.primary,
+            "hedge_enabled": settings.AI_HEDGE_ENABLED,
+            "ranking": [provider.name for provider in self.ranked()],
+            "fallback_chain": [provider.name for provider in self.fallback_chain()],
+            "providers": {
+                name: {
+                    "model": self.providers[name].model_name,
+                    "structured_output": self.providers[name].structured_output,
+                    "healthy": self._is_healthy(name),
+                    "circuit": self.breakers[name].snapshot(),
+                    "queue": self.providers[name].queue_stats(),
+                    **self.stats[name].snapshot()
+                }
+                for name in self.order
+            }
+        }
@@ -0,0 +1,97 @@
+"""
+Sessões de refinamento de legendas.
+Cada legenda gerada ganha um refine_id que aponta para a legenda e, quando o
+provider devolve estado de continuação (tokens de contexto do Ollama), para
+esse estado: pedidos como "mais curta" ou "mais emojis" continuam a partir
+dele sem reprocessar o prefixo com persona e RAG.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+
+
+@dataclass
+class RefineSession:
+    """Legenda de referência e estado do provider para continuar a partir dela"""
+
+    persona_id: Optional[int]
+    topic: str
+    style: str
+    include_hashtags: bool
+    caption: Dict[str, Any]
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    context: Optional[List[int]] = field(default=None, repr=False)
+    created_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def has_context(self) -> bool:
+        return bool(self.context)
+
+
+class RefineSessionStore:
+    """Sessões em memória com TTL (REFINE_SESSION_TTL_SECONDS) e limite de entradas (LRU)"""
+
+    # Campos da legenda guardados na sessão (o restante são metadados)
+    CAPTION_FIELDS = ("caption", "hashtags", "call_to_action", "emoji_suggestions", "tone_analysis")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, RefineSession]" = OrderedDict()
+
+    def create(
+        self,
+        persona_data: Dict[str, Any],
+        topic: str,
+        style: str,
+        include_hashtags: bool,
+        result: Dict[str, Any],
+        continuation: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Registra a legenda (e o estado de continuação, se houver) e retorna o refine_id"""
+        continuation = continuation or {}
+        session = RefineSession(
+            persona_id=persona_data.get('id'),
+            topic=topic,
+            style=style,
+            include_hashtags=include_hashtags,
+            caption={key: result.get(key) for key in self.CAPTION_FIELDS},
+            provider=continuation.get('provider'),
+            model=continuation.get('model'),
+            context=continuation.get('context'),
+        )
+        refine_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[refine_id] = session
+            while len(self._sessions) > max(1, settings.REFINE_SESSION_MAX_ENTRIES):
+                self._sessions.popitem(last=False)
+        return refine_id
+
+    def get(self, refine_id: str) -> Optional[RefineSession]:
+        """Sessão ainda válida ou None"""
+        with self._lock:
+            session = self._sessions.get(refine_id)
+            if session is None:
+                return None
+            if time.monotonic() - session.created_at > settings.REFINE_SESSION_TTL_SECONDS:
+                del self._sessions[refine_id]
+                return None
+            self._sessions.move_to_end(refine_id)
+            return session
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._sessions),
+                "with_context": sum(1 for session in self._sessions.values() if session.has_context),
+            }
+
+
+# Instância global
+refine_sessions = RefineSessionStore()
@@ -0,0 +1,64 @@
+"""
+Coalescência de requisições idênticas em andamento (single-flight).
+Chamadas concorrentes com a mesma chave aguardam uma única execução
+compartilhada em vez de repetir a chamada ao modelo.
+"""
+
+import asyncio
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from ..core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes com a mesma chave
+
+    A primeira chamada dispara a execução em uma task própria; as demais
+    aguardam a mesma task. Como a task é protegida com asyncio.shield, o
+    cancelamento de um chamador (ex.: cliente desconectou) não cancela a
+    geração para os outros que estão aguardando.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def run(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Executa factory() uma única vez por chave em andamento
+
+        Returns:
+            (resultado, compartilhado) — compartilhado é True quando o
+            resultado veio de uma execução iniciada por outra chamada
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+
+        if shared:
+            metrics.increment("singleflight_saved_calls_total", flight=self.name)
+            logger.info(f"🔗 Requisição idêntica em andamento reaproveitada ({self.name})")
+        else:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+
+        result = await asyncio.shield(task)
+        # Cada chamador recebe sua própria cópia para poder anotá-la livremente
+        return copy.copy(result), shared
+
+    def _release(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,751 @@
+"""
+Providers de geração de texto.
+Cada provider encapsula a conexão com um upstream (Google Gemini, OpenRouter
+ou Ollama), seu limite de concorrência, os modos normal e streaming e a saída
+estruturada (JSON) nativa de cada API. O provider "replay" simula um upstream
+localmente a partir de respostas gravadas, para testes de carga.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import google.generativeai as genai
+
+from ..core.config import settings
+from .admission import FairSemaphore
+from .http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+# Modelos Gemini anteriores ao 1.5: sem modo JSON (response_mime_type/response_schema)
+LEGACY_GEMINI_MODELS = ("gemini-pro", "gemini-1.0-pro")
+
+# Estado de continuação da geração em andamento (ex.: tokens de contexto do
+# Ollama): entrada para continuar uma conversa e saída da geração capturada
+_continuation: ContextVar[Optional[Dict[str, Any]]] = ContextVar("provider_continuation", default=None)
+
+
+def start_continuation_capture(context: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Passa a capturar o estado de continuação das próximas gerações desta task
+
+    Args:
+        context: Estado de uma geração anterior a partir do qual continuar
+
+    Returns:
+        Dicionário preenchido pelo provider (provider, model, context)
+    """
+    holder: Dict[str, Any] = {"context": context} if context else {}
+    _continuation.set(holder)
+    return holder
+
+
+def stop_continuation_capture():
+    """Encerra a captura (chamadas seguintes, como reparos de JSON, não a alteram)"""
+    _continuation.set(None)
+
+
+def schema_example(schema: Dict[str, Any]) -> Any:
+    """Exemplo compacto de um JSON schema (usa a descrição de cada campo como valor)"""
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        return {key: schema_example(value) for key, value in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [schema_example(schema.get("items", {}))]
+    return schema.get("description", schema_type or "")
+
+
+class ResponseRecorder:
+    """
+    Arquivo JSONL de respostas para o provider replay
+
+    Cada linha guarda a chave da requisição (hash do prompt original e do
+    nome do schema), o schema e a resposta de um provider real.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def request_key(prompt: str, response_schema: Optional[Dict[str, Any]]) -> str:
+        schema_name = response_schema["name"] if response_schema else ""
+        return hashlib.sha256(f"{schema_name}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def record(
+        self,
+        provider: "TextProvider",
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]],
+        text: str
+    ):
+        """Acrescenta uma resposta ao arquivo"""
+        entry = {
+            "key": self.request_key(prompt, response_schema),
+            "schema": response_schema["name"] if response_schema else None,
+            "provider": provider.label,
+            "response": text,
+            "recorded_at": datetime.now().isoformat(),
+        }
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as file:
+                    file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"⚠️ Não foi possível gravar resposta para replay: {e}")
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Lê as respostas gravadas (lista vazia se o arquivo não existir)"""
+        if not self.path.exists():
+            return []
+        entries = []
+        with self.path.open(encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    entries.append(json.loads(line))
+        return entries
+
+
+replay_recorder = ResponseRecorder(settings.AI_REPLAY_FILE)
+
+
+class TextProvider:
+    """
+    Interface comum dos providers de texto
+
+    Subclasses implementam _generate() e _stream(); generate() e stream()
+    aplicam o limite de chamadas simultâneas do provider, com fila justa
+    entre usuários (ver admission).
+
+    response_schema ({"name": ..., "schema": JSON schema}) pede uma resposta
+    em JSON. Providers com saída estruturada nativa recebem o schema pela API;
+    nos demais (ou com a opção desligada) o formato é descrito no prompt.
+    """
+
+    name = ""
+
+    def __init__(self):
+        self.model_name = ""
+        self._slots = FairSemaphore(self.name, self.max_concurrency)
+
+    @property
+    def max_concurrency(self) -> int:
+        return 1
+
+    def queue_stats(self) -> Dict[str, Any]:
+        """Vagas ocupadas e fila de espera do provider"""
+        return self._slots.stats()
+
+    @property
+    def label(self) -> str:
+        """Identificação usada em model_used (provider:modelo)"""
+        return f"{self.name}:{self.model_name}"
+
+    @property
+    def structured_output(self) -> bool:
+        """Se a saída estruturada nativa está habilitada para o provider"""
+        return False
+
+    @property
+    def enforces_schema(self) -> bool:
+        """Se a API garante o schema (e não apenas JSON válido)"""
+        return self.structured_output
+
+    def schema_instructions(self, response_schema: Optional[Dict[str, Any]]) -> str:
+        """Descrição do formato acrescentada ao prompt quando a API não garante o schema"""
+        if response_schema is None or self.enforces_schema:
+            return ""
+        example = json.dumps(schema_example(response_schema["schema"]), ensure_ascii=False)
+        return f"\nFORMATO DE RESPOSTA (JSON):\n{example}\n\nGere apenas o JSON, sem texto adicional.\n"
+
+    def prepare_prompt(self, prompt: str, response_schema: Optional[Dict[str, Any]]) -> str:
+        """Prompt efetivamente enviado ao modelo"""
+        return prompt + self.schema_instructions(response_schema)
+
+    @property
+    def records_responses(self) -> bool:
+        """Se as respostas devem ser gravadas para o provider replay"""
+        return settings.AI_REPLAY_RECORD
+
+    @property
+    def supports_continuation(self) -> bool:
+        """Se o provider devolve estado para continuar a partir de uma geração"""
+        return False
+
+    async def warm_up(self) -> bool:
+        """Prepara o provider para a primeira requisição (True se houve aquecimento)"""
+        return False
+
+    async def generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Gera o texto completo"""
+        async with self._slots:
+            text = await self._generate(
+                self.prepare_prompt(prompt, response_schema), response_schema)
+
+        if self.records_responses:
+            replay_recorder.record(self, prompt, response_schema, text)
+        return text
+
+    async def stream(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Gera texto em streaming, repassando os tokens conforme chegam"""
+        tokens: List[str] = []
+        async with self._slots:
+            async for token in self._stream(
+                    self.prepare_prompt(prompt, response_schema), response_schema):
+                if token:
+                    tokens.append(token)
+                    yield token
+
+        if self.records_responses:
+            replay_recorder.record(self, prompt, response_schema, "".join(tokens))
+
+    async def _generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> str:
+        raise NotImplementedError
+
+    async def _stream(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Padrão para providers sem streaming: entrega o texto em um único trecho"""
+        yield await self._generate(prompt, response_schema)
+
+
+class GeminiProvider(TextProvider):
+    """Google Gemini via AI Studio (grátis, requer GOOGLE_API_KEY)"""
+
+    name = "google"
+
+    def __init__(self):
+        super().__init__()
+        if not settings.GOOGLE_API_KEY:
+            raise ValueError(
+                "GOOGLE_API_KEY não configurada!\n"
+                "Obtenha GRÁTIS em: https://aistudio.google.com/app/apikey"
+            )
+
+        genai.configure(api_key=settings.GOOGLE_API_KEY)
+
+        generation_config = {
+            "temperature": settings.TEMPERATURE,
+            "top_p": 0.95,
+            "top_k": 64,
+            "max_output_tokens": settings.MAX_TOKENS,
+        }
+
+        safety_settings = [
+            {"category": "HARM_CATEGORY_HARASSMENT",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+            {"category": "HARM_CATEGORY_HATE_SPEECH",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+                "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+        ]
+
+        self.model_name = settings.DEFAULT_MODEL
+        self.model = genai.GenerativeModel(
+            model_name=settings.DEFAULT_MODEL,
+            generation_config=generation_config,
+            safety_settings=safety_settings
+        )
+
+        # O SDK é síncrono: as chamadas rodam em um executor dedicado
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="gemini"
+        )
+
+        logger.info(f"✅ Google Gemini inicializado: {settings.DEFAULT_MODEL}")
+        if settings.AI_STRUCTURED_OUTPUT_GOOGLE and not self.structured_output:
+            logger.warning(
+                f"⚠️ {self.model_name} não suporta saída estruturada; usando o template JSON no prompt "
+                "(configure DEFAULT_MODEL com um Gemini 1.5 ou superior)"
+            )
+
+    @property
+    def max_concurrency(self) -> int:
+        return max(1, settings.AI_MAX_CONCURRENCY_GOOGLE)
+
+    @property
+    def structured_output(self) -> bool:
+        # Modo JSON existe a partir do Gemini 1.5 (gemini-pro / 1.0 não suportam)
+        return (
+            settings.AI_STRUCTURED_OUTPUT_GOOGLE
+            and self.model_name not in LEGACY_GEMINI_MODELS
+        )
+
+    @staticmethod
+    def _gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte o JSON schema para o subconjunto OpenAPI aceito pelo Gemini"""
+        converted: Dict[str, Any] = {"type": schema["type"].upper()}
+        if "description" in schema:
+            converted["description"] = schema["description"]
+        if "properties" in schema:
+            converted["properties"] = {
+                key: GeminiProvider._gemini_schema(value)
+                for key, value in schema["properties"].items()
+            }
+        if "required" in schema:
+            converted["required"] = list(schema["required"])
+        if "items" in schema:
+            converted["items"] = GeminiProvider._gemini_schema(schema["items"])
+        return converted
+
+    def _request_options(self, response_schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Configuração de geração da chamada (saída JSON com schema, se pedida)"""
+        if response_schema is None or not self.structured_output:
+            return {}
+        return {
+            "generation_config": {
+                "response_mime_type": "application/json",
+                "response_schema": self._gemini_schema(response_schema["schema"]),
+            }
+        }
+
+    async def _generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Gera texto via Gemini sem bloquear o event loop.
+
+        O SDK é síncrono, então a chamada roda em um executor limitado
+        a AI_MAX_CONCURRENCY_GOOGLE threads.
+        """
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self._executor,
+            partial(self.model.generate_content, prompt, **self._request_options(response_schema))
+        )
+        return response.text
+
+    async def _stream(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Streaming do Gemini.
+
+        O iterador do SDK é síncrono: ele é consumido no executor do Gemini e
+        os trechos são repassados ao event loop por uma fila. Se o consumidor
+        parar (cliente desconectou, fallback do roteador), a thread deixa de
+        ler a resposta no trecho seguinte e libera o executor.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        stop = threading.Event()
+
+        options = self._request_options(response_schema)
+
+        def produce():
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True, **options):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+        producer = loop.run_in_executor(self._executor, produce)
+
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+        await producer
+
+
+class OpenRouterProvider(TextProvider):
+    """OpenRouter com modelos gratuitos (requer OPENROUTER_API_KEY)"""
+
+    name = "openrouter"
+
+    def __init__(self):
+        super().__init__()
+        if not settings.OPENROUTER_API_KEY:
+            raise ValueError(
+                "OPENROUTER_API_KEY não configurada!\n"
+                "Crie conta GRÁTIS em: https://openrouter.ai/\n"
+                "Modelos gratuitos disponíveis!"
+            )
+
+        self.api_key = settings.OPENROUTER_API_KEY
+        self.model_name = settings.OPENROUTER_MODEL
+        self.base_url = "https://openrouter.ai/api/v1"
+
+        logger.info(f"✅ OpenRouter inicializado: {settings.OPENROUTER_MODEL}")
+
+    @property
+    def max_concurrency(self) -> int:
+        return max(1, settings.AI_MAX_CONCURRENCY_OPENROUTER)
+
+    @property
+    def structured_output(self) -> bool:
+        return settings.AI_STRUCTURED_OUTPUT_OPENROUTER
+
+    def _payload(
+        self,
+        prompt: str,
+        stream: bool = False,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Monta o corpo da requisição para o OpenRouter"""
+        payload = {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": settings.TEMPERATURE,
+            "max_tokens": settings.MAX_TOKENS,
+        }
+        if stream:
+            payload["stream"] = True
+        if response_schema is not None and self.structured_output:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": response_schema["name"],
+                    "schema": response_schema["schema"],
+                }
+            }
+        return payload
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    async def _generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Gera texto via OpenRouter (API compatível com OpenAI)"""
+        client = http_clients.get("openrouter")
+        response = await client.post(
+            f"{self.base_url}/chat/completions",
+            headers=self._headers(),
+            json=self._payload(prompt, response_schema=response_schema)
+        )
+
+        if response.status_code != 200:
+            logger.error(f"OpenRouter error: {response.text}")
+            raise ValueError("Erro ao gerar texto via OpenRouter")
+
+        data = response.json()
+        return data["choices"][0]["message"]["content"]
+
+    async def _stream(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Streaming do OpenRouter (Server-Sent Events no formato OpenAI)"""
+        client = http_clients.get("openrouter")
+        async with client.stream(
+            "POST",
+            f"{self.base_url}/chat/completions",
+            headers=self._headers(),
+            json=self._payload(prompt, stream=True, response_schema=response_schema)
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"OpenRouter error: {body.decode(errors='replace')}")
+                raise ValueError("Erro ao gerar texto via OpenRouter")
+
+            async for line in response.aiter_lines():
+                # Linhas de comentário (": OPENROUTER PROCESSING") são ignoradas
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                data = json.loads(payload)
+                choices = data.get("choices") or [{}]
+                yield (choices[0].get("delta") or {}).get("content") or ""
+
+
+class OllamaProvider(TextProvider):
+    """Modelos locais via Ollama (100% grátis, sem API key)"""
+
+    name = "ollama"
+
+    def __init__(self):
+        super().__init__()
+        self.base_url = settings.OLLAMA_BASE_URL
+        self.model_name = settings.OLLAMA_MODEL
+
+        logger.info(
+            f"✅ Ollama inicializado: {settings.OLLAMA_MODEL} @ {settings.OLLAMA_BASE_URL}")
+
+    @property
+    def max_concurrency(self) -> int:
+        return max(1, settings.AI_MAX_CONCURRENCY_OLLAMA)
+
+    @property
+    def structured_output(self) -> bool:
+        return settings.AI_STRUCTURED_OUTPUT_OLLAMA
+
+    @property
+    def enforces_schema(self) -> bool:
+        # format "json" garante JSON válido, mas não os campos: o formato segue no prompt
+        return False
+
+    @property
+    def supports_continuation(self) -> bool:
+        return True
+
+    async def warm_up(self) -> bool:
+        """
+        Carrega o modelo na memória do Ollama (requisição sem prompt) e o
+        mantém carregado por OLLAMA_KEEP_ALIVE, evitando que a primeira
+        geração após o startup pague o carregamento
+        """
+        if not settings.OLLAMA_WARMUP:
+            return False
+        client = http_clients.get("ollama")
+        response = await client.post(
+            f"{self.base_url}/api/generate",
+            json={"model": self.model_name, "keep_alive": settings.OLLAMA_KEEP_ALIVE}
+        )
+        if response.status_code != 200:
+            logger.error(f"Ollama error: {response.text}")
+            raise self._connection_error()
+        return True
+
+    def _capture_context(self, data: Dict[str, Any]):
+        """Guarda os tokens de contexto devolvidos pelo Ollama, se houver captura ativa"""
+        holder = _continuation.get()
+        if holder is None:
+            return
+        if data.get("context"):
+            holder.update(provider=self.name, model=self.model_name, context=data["context"])
+        else:
+            # Sem contexto na resposta: não reaproveitar o da geração anterior
+            holder.pop("context", None)
+
+    def _payload(
+        self,
+        prompt: str,
+        stream: bool = False,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Monta o corpo da requisição para o Ollama"""
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+            "options": {
+                "temperature": settings.TEMPERATURE,
+                "num_predict": settings.MAX_TOKENS,
+            }
+        }
+        if response_schema is not None and self.structured_output:
+            payload["format"] = "json"
+
+        # Continuar a partir de uma geração anterior (prefixo já processado)
+        holder = _continuation.get()
+        if holder and holder.get("context"):
+            payload["context"] = holder["context"]
+        return payload
+
+    def _connection_error(self) -> ValueError:
+        return ValueError(
+            "Erro ao conectar ao Ollama.\n"
+            "Certifique-se de que está rodando: ollama serve"
+        )
+
+    async def _generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> str:
+        """Gera texto via Ollama (local)"""
+        client = http_clients.get("ollama")
+        response = await client.post(
+            f"{self.base_url}/api/generate",
+            json=self._payload(prompt, response_schema=response_schema)
+        )
+
+        if response.status_code != 200:
+            logger.error(f"Ollama error: {response.text}")
+            raise self._connection_error()
+
+        data = response.json()
+        self._capture_context(data)
+        return data["response"]
+
+    async def _stream(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Streaming do Ollama (um objeto JSON por linha)"""
+        client = http_clients.get("ollama")
+        async with client.stream(
+            "POST",
+            f"{self.base_url}/api/generate",
+            json=self._payload(prompt, stream=True, response_schema=response_schema)
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"Ollama error: {body.decode(errors='replace')}")
+                raise self._connection_error()
+
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                if data.get("done"):
+                    self._capture_context(data)
+                yield data.get("response", "")
+                if data.get("done"):
+                    break
+
+
+class ReplayProvider(TextProvider):
+    """
+    Provider local determinístico para testes de carga e benchmarks
+
+    Responde com a resposta gravada para o mesmo prompt (ver AI_REPLAY_RECORD);
+    sem gravação exata, reutiliza uma resposta gravada com o mesmo schema ou
+    gera uma a partir do schema. A latência segue AI_REPLAY_LATENCY_* e o
+    streaming entrega ~4 caracteres por token a AI_REPLAY_TOKENS_PER_SECOND.
+    Com AI_REPLAY_SEED fixo, a sequência de latências é reproduzível.
+    """
+
+    name = "replay"
+
+    # Quantidade pedida no prompt ("Gere 5 ideias", "Sugerir 10 hashtags")
+    _COUNT_PATTERN = re.compile(r"(?:Gere|Sugerir) (\d+)")
+
+    def __init__(self):
+        super().__init__()
+        self.model_name = Path(settings.AI_REPLAY_FILE).name
+        self._random = random.Random(settings.AI_REPLAY_SEED)
+        self._by_key: Dict[str, str] = {}
+        self._by_schema: Dict[Optional[str], List[str]] = {}
+
+        for entry in replay_recorder.load():
+            self._by_key[entry["key"]] = entry["response"]
+            self._by_schema.setdefault(entry.get("schema"), []).append(entry["response"])
+
+        logger.info(
+            f"✅ Replay inicializado: {len(self._by_key)} respostas gravadas "
+            f"({settings.AI_REPLAY_LATENCY_DISTRIBUTION}, ~{settings.AI_REPLAY_LATENCY_MS:.0f}ms)")
+
+    @property
+    def max_concurrency(self) -> int:
+        return max(1, settings.AI_MAX_CONCURRENCY_REPLAY)
+
+    @property
+    def structured_output(self) -> bool:
+        # As respostas já seguem o schema; o prompt não precisa descrever o formato
+        return True
+
+    @property
+    def records_responses(self) -> bool:
+        return False
+
+    def _sample_latency(self) -> float:
+        """Latência simulada em segundos"""
+        mean = settings.AI_REPLAY_LATENCY_MS / 1000
+        stddev = settings.AI_REPLAY_LATENCY_STDDEV_MS / 1000
+        distribution = settings.AI_REPLAY_LATENCY_DISTRIBUTION.lower()
+
+        if distribution == "normal":
+            return max(0.0, self._random.gauss(mean, stddev))
+        if distribution == "lognormal" and mean > 0:
+            # Mediana = mean; sigma derivado do desvio relativo
+            return self._random.lognormvariate(math.log(mean), stddev / mean)
+        return mean
+
+    def _template_response(self, prompt: str, response_schema: Optional[Dict[str, Any]]) -> str:
+        """Resposta gerada a partir do schema, variando os textos pelo hash do prompt"""
+        if response_schema is None:
+            return "Resposta simulada (replay)."
+
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        match = self._COUNT_PATTERN.search(prompt)
+        items = int(match.group(1)) if match else 3
+
+        def fill(schema: Dict[str, Any], path: str) -> Any:
+            schema_type = schema.get("type")
+            if schema_type == "object":
+                return {
+                    key: fill(value, f"{path}{key}")
+                    for key, value in schema.get("properties", {}).items()
+                }
+            if schema_type == "array":
+                return [fill(schema.get("items", {}), f"{path}{i}") for i in range(items)]
+            token = hashlib.sha256(f"{digest}{path}".encode("utf-8")).hexdigest()[:6]
+            return f"{schema.get('description', 'texto')} {token}"
+
+        return json.dumps(fill(response_schema["schema"], ""), ensure_ascii=False)
+
+    def _response_for(self, prompt: str, response_schema: Optional[Dict[str, Any]]) -> str:
+        key = ResponseRecorder.request_key(prompt, response_schema)
+        if key in self._by_key:
+            return self._by_key[key]
+
+        schema_name = response_schema["name"] if response_schema else None
+        recorded = self._by_schema.get(schema_name)
+        if recorded:
+            # Escolha determinística pelo prompt
+            return recorded[int(key[:8], 16) % len(recorded)]
+
+        return self._template_response(prompt, response_schema)
+
+    async def _generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> str:
+        await asyncio.sleep(self._sample_latency())
+        return self._response_for(prompt, response_schema)
+
+    async def _stream(
+        self,
+        prompt: str,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Primeiro token após a latência simulada, depois no ritmo configurado"""
+        text = self._response_for(prompt, response_schema)
+        interval = 1 / settings.AI_REPLAY_TOKENS_PER_SECOND if settings.AI_REPLAY_TOKENS_PER_SECOND > 0 else 0
+
+        await asyncio.sleep(self._sample_latency())
+        for start in range(0, len(text), 4):
+            if start:
+                await asyncio.sleep(interval)
+            yield text[start:start + 4]
+
+
+PROVIDER_CLASSES = {
+    "google": GeminiProvider,
+    "openrouter": OpenRouterProvider,
+    "ollama": OllamaProvider,
+    "replay": ReplayProvider,
+}
+
+
+def create_text_provider(name: str) -> TextProvider:
+    """Instancia o provider pelo nome (google, openrouter, ollama ou replay)"""
+    provider_class = PROVIDER_CLASSES.get(name)
+    if provider_class is None:
+        raise ValueError(f"Provider não suportado: {name}")
+    return provider_class()
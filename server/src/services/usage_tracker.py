@@ -0,0 +1,354 @@
+"""
+Registro de uso da geração de conteúdo.
+Grava cada geração no histórico e incrementa os contadores agregados por
+usuário e por persona (dia, semana ISO, mês e total). As estatísticas de uso
+leem apenas os contadores dos buckets pedidos.
+
+As gravações (SQLite, síncronas) não rodam no event loop: record() só
+enfileira o registro, e um escritor em segundo plano grava a fila em lotes
+em uma thread dedicada (ver blocking_pool).
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core.database import SessionLocal, create_dedicated_session_factory
+from ..core.timing import current_timer
+from ..models.generation_history import GenerationRecord, UsageRollup
+from .blocking_pool import BlockingPool
+from .prompt_assembler import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+GENERATION_TYPES = ("caption", "ideas", "hashtags", "image", "refine")
+PERIODS = ("day", "week", "month", "all")
+
+# Registros gravados por transação pelo escritor em segundo plano
+WRITE_BATCH_SIZE = 100
+
+
+def period_buckets(when: datetime) -> Dict[str, str]:
+    """Bucket de cada período para o instante dado"""
+    year, week, _ = when.isocalendar()
+    return {
+        "day": when.strftime("%Y-%m-%d"),
+        "week": f"{year}-W{week:02d}",
+        "month": when.strftime("%Y-%m"),
+        "all": "all",
+    }
+
+
+def _content_tokens(value: Any) -> int:
+    """Estimativa de tokens do conteúdo gerado"""
+    if value is None:
+        return 0
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False)
+    return estimate_tokens(value)
+
+
+class UsageTracker:
+    """Histórico de gerações + contadores agregados atualizados incrementalmente"""
+
+    def __init__(self):
+        self._pending: List[Dict[str, Any]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._pool = BlockingPool("usage_writer", 1, 0)
+        self._session_factory = None
+
+    def record(
+        self,
+        user_id: int,
+        generation_type: str,
+        persona_id: Optional[int] = None,
+        provider: Optional[str] = None,
+        topic: Optional[str] = None,
+        prompt_tokens: int = 0,
+        output_tokens: int = 0,
+        items: int = 1,
+        cached: bool = False,
+        latency_seconds: Optional[float] = None
+    ):
+        """
+        Registra uma geração (falhas são apenas logadas: o uso nunca derruba a rota)
+
+        Sem latency_seconds, usa o tempo decorrido da requisição cronometrada atual.
+        Dentro do event loop, o registro é enfileirado e gravado em segundo
+        plano (ver flush); fora dele, é gravado na hora.
+        """
+        if latency_seconds is None:
+            timer = current_timer()
+            latency_seconds = timer.elapsed if timer else 0.0
+
+        entry = dict(
+            user_id=user_id,
+            persona_id=persona_id,
+            generation_type=generation_type,
+            topic=(topic or '')[:255] or None,
+            provider=provider,
+            latency_ms=round(latency_seconds * 1000, 1),
+            prompt_tokens=prompt_tokens or 0,
+            output_tokens=output_tokens or 0,
+            items=items,
+            cached=cached,
+            created_at=datetime.utcnow()
+        )
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_many([entry])
+            return
+
+        self._pending.append(entry)
+        if self._writer is None or self._writer.done() or self._writer.get_loop() is not loop:
+            self._writer = loop.create_task(self._drain())
+
+    async def _drain(self):
+        """Grava a fila em lotes na thread do escritor até esvaziá-la"""
+        while self._pending:
+            batch, self._pending = self._pending[:WRITE_BATCH_SIZE], self._pending[WRITE_BATCH_SIZE:]
+            try:
+                await self._pool.run(self._write_many, batch)
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao gravar {len(batch)} registros de uso: {e}")
+
+    async def flush(self):
+        """Aguarda a gravação de tudo o que foi registrado até agora (encerramento, testes)"""
+        while self._pending or (self._writer is not None and not self._writer.done()):
+            if self._writer is None or self._writer.done():
+                self._writer = asyncio.get_running_loop().create_task(self._drain())
+            await asyncio.shield(self._writer)
+
+    def shutdown(self):
+        """Encerra a thread do escritor e sua conexão (chamar depois de flush)"""
+        self._pool.shutdown()
+        if self._session_factory not in (None, SessionLocal):
+            self._session_factory.kw["bind"].dispose()
+        self._session_factory = None
+
+    def _write_many(self, entries: List[Dict[str, Any]]):
+        """Grava os registros em uma transação; se ela falhar, um a um"""
+        if self._write(entries) or len(entries) == 1:
+            return
+        for entry in entries:
+            self._write([entry])
+
+    def _write(self, entries: List[Dict[str, Any]]) -> bool:
+        if self._session_factory is None:
+            # Conexão própria do escritor (criada na primeira gravação)
+            self._session_factory = create_dedicated_session_factory()
+        db = self._session_factory()
+        try:
+            for entry in entries:
+                record = GenerationRecord(**entry)
+                db.add(record)
+                scopes = [("user", record.user_id)]
+                if record.persona_id is not None:
+                    scopes.append(("persona", record.persona_id))
+                for scope, scope_id in scopes:
+                    for period, bucket in period_buckets(record.created_at).items():
+                        self._increment(db, scope, scope_id, period, bucket, record, record.created_at)
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            types = sorted({entry['generation_type'] for entry in entries})
+            logger.warning(f"⚠️ Erro ao registrar uso ({', '.join(types)}): {e}")
+            return False
+        finally:
+            db.close()
+
+    def _increment(
+        self,
+        db: Session,
+        scope: str,
+        scope_id: int,
+        period: str,
+        bucket: str,
+        record: GenerationRecord,
+        now: datetime
+    ):
+        """UPDATE atômico do contador; cria a linha se o bucket ainda não existe"""
+        key = dict(
+            scope=scope,
+            scope_id=scope_id,
+            period=period,
+            bucket=bucket,
+            generation_type=record.generation_type
+        )
+        changes = {
+            UsageRollup.count: UsageRollup.count + 1,
+            UsageRollup.cached_count: UsageRollup.cached_count + int(bool(record.cached)),
+            UsageRollup.items: UsageRollup.items + record.items,
+            UsageRollup.total_latency_ms: UsageRollup.total_latency_ms + record.latency_ms,
+            UsageRollup.prompt_tokens: UsageRollup.prompt_tokens + record.prompt_tokens,
+            UsageRollup.output_tokens: UsageRollup.output_tokens + record.output_tokens,
+            UsageRollup.last_generated_at: now,
+        }
+        query = db.query(UsageRollup).filter_by(**key)
+        if query.update(changes, synchronize_session=False):
+            return
+
+        try:
+            # Savepoint: outro processo pode ter criado o bucket no meio tempo
+            with db.begin_nested():
+                db.add(UsageRollup(
+                    **key,
+                    count=1,
+                    cached_count=int(bool(record.cached)),
+                    items=record.items,
+                    total_latency_ms=record.latency_ms,
+                    prompt_tokens=record.prompt_tokens,
+                    output_tokens=record.output_tokens,
+                    first_generated_at=now,
+                    last_generated_at=now
+                ))
+        except IntegrityError:
+            query.update(changes, synchronize_session=False)
+
+    def record_caption(
+        self,
+        user_id: int,
+        persona_id: Optional[int],
+        result: Dict[str, Any],
+        generation_type: str = "caption",
+        topic: Optional[str] = None,
+        latency_seconds: Optional[float] = None
+    ):
+        """Registra uma legenda no formato de generate_instagram_caption"""
+        self.record(
+            user_id,
+            generation_type,
+            persona_id=persona_id,
+            provider=result.get('model_used'),
+            topic=topic or result.get('topic'),
+            prompt_tokens=0 if result.get('cached') else result.get('prompt_tokens', 0),
+            output_tokens=_content_tokens(result.get('caption')) + _content_tokens(result.get('hashtags')),
+            cached=bool(result.get('cached')),
+            latency_seconds=latency_seconds
+        )
+
+    def record_ideas(
+        self,
+        user_id: int,
+        persona_id: Optional[int],
+        content_type: str,
+        ideas: List[Dict[str, Any]]
+    ):
+        """Registra uma solicitação de ideias (prompt_tokens: maior prompt entre as sub-requisições)"""
+        self.record(
+            user_id,
+            "ideas",
+            persona_id=persona_id,
+            provider=next((idea.get('model_used') for idea in ideas if idea.get('model_used')), None),
+            topic=content_type,
+            prompt_tokens=max((idea.get('prompt_tokens') or 0 for idea in ideas), default=0),
+            output_tokens=_content_tokens([
+                {key: value for key, value in idea.items() if key not in ('generated_at', 'prompt_tokens', 'model_used', 'persona_id')}
+                for idea in ideas
+            ]),
+            items=len(ideas)
+        )
+
+    def record_hashtags(
+        self,
+        user_id: int,
+        persona_id: Optional[int],
+        topic: str,
+        result: Dict[str, Any]
+    ):
+        """Registra uma sugestão de hashtags (provider hashtag_index se o modelo não foi usado)"""
+        self.record(
+            user_id,
+            "hashtags",
+            persona_id=persona_id,
+            provider=result.get('model_used'),
+            topic=topic,
+            output_tokens=_content_tokens(result.get('hashtags')),
+            items=len(result.get('hashtags') or [])
+        )
+
+    def record_image(
+        self,
+        user_id: int,
+        persona_id: Optional[int],
+        prompt: str,
+        image: Dict[str, Any]
+    ):
+        """Registra uma imagem gerada"""
+        self.record(
+            user_id,
+            "image",
+            persona_id=persona_id,
+            provider=f"stability:{image['model']}" if image.get('model') else "stability",
+            topic=prompt,
+            prompt_tokens=estimate_tokens(" ".join(filter(None, [prompt, image.get('style_prompt')])))
+        )
+
+    def summary(self, db: Session, scope: str, scope_id: int, when: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Contadores do escopo nos buckets atuais (hoje, semana, mês) e no total,
+        lidos pela chave primária
+        """
+        buckets = period_buckets(when or datetime.utcnow())
+        rows = db.query(UsageRollup).filter(
+            UsageRollup.scope == scope,
+            UsageRollup.scope_id == scope_id,
+            UsageRollup.bucket.in_(list(buckets.values()))
+        ).all()
+
+        totals = {period: {generation_type: 0 for generation_type in GENERATION_TYPES} for period in PERIODS}
+        by_type: Dict[str, Dict[str, Any]] = {}
+        first_generated_at = None
+        for row in rows:
+            if buckets.get(row.period) != row.bucket:
+                continue
+            totals[row.period][row.generation_type] = row.count
+            if row.period == "all":
+                by_type[row.generation_type] = {
+                    "count": row.count,
+                    "cached": row.cached_count,
+                    "items": row.items,
+                    "avg_latency_ms": round(row.total_latency_ms / row.count, 1) if row.count else 0.0,
+                    "prompt_tokens": row.prompt_tokens,
+                    "output_tokens": row.output_tokens,
+                    "last_generated_at": row.last_generated_at.isoformat() if row.last_generated_at else None,
+                }
+                if row.first_generated_at and (first_generated_at is None or row.first_generated_at < first_generated_at):
+                    first_generated_at = row.first_generated_at
+
+        return {"totals": totals, "by_type": by_type, "first_generated_at": first_generated_at}
+
+    def persona_counts(self, db: Session, persona_ids: List[int]) -> Dict[int, int]:
+        """Total de gerações (todos os tipos) por persona"""
+        if not persona_ids:
+            return {}
+        rows = db.query(UsageRollup.scope_id, UsageRollup.count).filter(
+            UsageRollup.scope == "persona",
+            UsageRollup.scope_id.in_(persona_ids),
+            UsageRollup.period == "all",
+            UsageRollup.bucket == "all"
+        ).all()
+        counts: Dict[int, int] = {}
+        for persona_id, count in rows:
+            counts[persona_id] = counts.get(persona_id, 0) + count
+        return counts
+
+    def weeks_since(self, first_generated_at: Optional[datetime], now: Optional[datetime] = None) -> float:
+        """Semanas desde a primeira geração (mínimo 1, para a média semanal)"""
+        if first_generated_at is None:
+            return 1.0
+        now = now or datetime.utcnow()
+        elapsed = now - first_generated_at.replace(tzinfo=None)
+        return max(1.0, elapsed / timedelta(weeks=1))
+
+
+# Instância global
+usage_tracker = UsageTracker()
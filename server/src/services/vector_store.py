@@ -2,8 +2,18 @@
 Serviço de banco vetorial usando ChromaDB.
 Implementa a funcionalidade RAG (Retrieval-Augmented Generation) para contextualizar
 a geração de conteúdo com base na base de conhecimento do usuário.
+
+As chamadas ao ChromaDB e ao modelo de embeddings são síncronas e rodam em
+pools de threads próprios (ver blocking_pool): consultas em um, ingestão e
+remoções em outro, para que uma ingestão grande não atrase as buscas RAG.
+
+Ao lado de cada coleção há um índice lexical FTS5 (ver lexical_index) com os
+mesmos chunks; no modo híbrido as duas buscas rodam em paralelo e os
+resultados são fundidos por reciprocal rank fusion.
 """
 
+import asyncio
+import time
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
@@ -13,9 +23,24 @@ import logging
 from pathlib import Path
 
 from ..core.config import settings
+from ..core.metrics import metrics
+from .blocking_pool import BlockingPool
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache, normalize_text
+from .embedding_workers import EmbeddingWorkerPool
+from .lexical_index import LexicalIndex
 
 logger = logging.getLogger(__name__)
 
+# Modelo de embeddings das coleções (Sentence Transformers local)
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Faixas da taxa de acerto do cache de embeddings por ingestão
+HIT_RATIO_BUCKETS = (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+# Modos de recuperação aceitos por search()
+RETRIEVAL_MODES = ("hybrid", "vector")
+
 class VectorStoreService:
     """
     Serviço para gerenciar o banco vetorial ChromaDB
@@ -31,9 +56,37 @@ class VectorStoreService:
         self.client = None
         self.collections = {}
         self.embedding_function = None
+        self._query_pool = BlockingPool(
+            "vector_query",
+            settings.VECTOR_STORE_QUERY_WORKERS,
+            settings.VECTOR_STORE_QUERY_MAX_PENDING
+        )
+        self._ingest_pool = BlockingPool(
+            "vector_ingest",
+            settings.VECTOR_STORE_INGEST_WORKERS,
+            settings.VECTOR_STORE_INGEST_MAX_PENDING
+        )
+        self._query_batcher = EmbeddingBatcher(
+            "query",
+            self._embed_in_pool,
+            settings.EMBEDDING_BATCH_WINDOW_MS,
+            settings.EMBEDDING_BATCH_MAX_SIZE
+        )
+        self._embedding_workers = EmbeddingWorkerPool(
+            EMBEDDING_MODEL_NAME,
+            settings.EMBEDDING_WORKERS,
+            settings.EMBEDDING_WORKER_THREADS
+        )
+        self._embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, EMBEDDING_MODEL_NAME)
+        self._lexical_index = LexicalIndex(settings.LEXICAL_INDEX_PATH)
+        # Personas cujo índice lexical já foi conferido/reconstruído neste processo
+        self._lexical_ready: set = set()
 
     async def initialize(self):
-        """Inicializa o cliente ChromaDB"""
+        """Inicializa o cliente ChromaDB (carrega o modelo fora do event loop)"""
+        await self._query_pool.run(self._connect)
+
+    def _connect(self):
         try:
             # Configurar ChromaDB
             chroma_settings = Settings(
@@ -51,7 +104,7 @@ class VectorStoreService:
             # Usa um modelo leve e gratuito por padrão, evitando custos por requisição
             # Modelos possíveis: 'all-MiniLM-L6-v2' (rápido) ou 'multi-qa-MiniLM-L6-cos-v1'
             self.embedding_function = SentenceTransformerEmbeddingFunction(
-                model_name="all-MiniLM-L6-v2"
+                model_name=EMBEDDING_MODEL_NAME
             )
 
             logger.info(f"✅ ChromaDB inicializado em: {settings.chroma_path}")
@@ -60,6 +113,42 @@ class VectorStoreService:
             logger.error(f"❌ Erro ao inicializar ChromaDB: {e}")
             raise
 
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Gera embeddings com o mesmo modelo usado nas coleções
+
+        Poucos textos (consultas) passam pelo micro-batching e são calculados
+        junto com os de outras requisições concorrentes; listas do tamanho de
+        um lote vão direto ao modelo.
+
+        Args:
+            texts: Textos a serem convertidos
+
+        Returns:
+            List[List[float]]: Um vetor por texto
+        """
+        if self.embedding_function is None:
+            raise ValueError("Banco vetorial não inicializado")
+
+        if settings.EMBEDDING_BATCH_ENABLED and len(texts) < settings.EMBEDDING_BATCH_MAX_SIZE:
+            return list(await asyncio.gather(*(self._query_batcher.embed(text) for text in texts)))
+        return await self._embed_in_pool(texts)
+
+    async def _embed_in_pool(self, texts: List[str]) -> List[List[float]]:
+        return await self._query_pool.run(self._embed, texts)
+
+    async def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings da ingestão: pool de processos, com o modelo local como reserva"""
+        if self._embedding_workers.enabled:
+            try:
+                return await self._embedding_workers.embed(texts)
+            except Exception as e:
+                logger.warning(f"⚠️ Pool de embeddings indisponível, usando o modelo local: {e}")
+        return await self._ingest_pool.run(self._embed, texts)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        return [list(map(float, embedding)) for embedding in self.embedding_function(texts)]
+
     def get_collection_name(self, persona_id: int) -> str:
         """Gera nome da coleção para uma persona específica"""
         return f"persona_{persona_id}_knowledge"
@@ -71,7 +160,8 @@ class VectorStoreService:
         if collection_name not in self.collections:
             try:
                 # Tentar obter/criar coleção garantindo função de embedding configurada
-                collection = self.client.get_or_create_collection(
+                collection = await self._query_pool.run(
+                    self.client.get_or_create_collection,
                     name=collection_name,
                     embedding_function=self.embedding_function,
                     metadata={"persona_id": persona_id}
@@ -85,6 +175,30 @@ class VectorStoreService:
 
         return self.collections[collection_name]
 
+    async def _ensure_lexical_index(self, persona_id: int, collection):
+        """
+        Garante o índice lexical da persona
+
+        Coleções criadas antes do índice (ou com o arquivo apagado) são
+        reindexadas a partir dos chunks guardados no ChromaDB.
+        """
+        if persona_id in self._lexical_ready:
+            return
+        await self._ingest_pool.run(self._rebuild_lexical_index, persona_id, collection)
+        self._lexical_ready.add(persona_id)
+
+    def _rebuild_lexical_index(self, persona_id: int, collection):
+        if self._lexical_index.has_persona(persona_id):
+            return
+        results = collection.get(include=["documents", "metadatas"])
+        ids = results.get('ids') or []
+        documents = results.get('documents') or []
+        metadatas = results.get('metadatas') or [{} for _ in ids]
+        # Cria a tabela mesmo vazia: não reconstruir de novo a cada reinício
+        self._lexical_index.rebuild(persona_id, ids, documents, metadatas)
+        if ids:
+            logger.info(f"🔤 Índice lexical da persona {persona_id} reconstruído ({len(ids)} chunks)")
+
     async def add_document(
         self,
         persona_id: int,
@@ -124,12 +238,34 @@ class VectorStoreService:
                 ids.append(chunk_id)
                 metadatas.append(chunk_metadata)
 
-            # Adicionar ao ChromaDB
-            collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
+            embeddings = await self._embed_chunks(documents, document_id)
+            await self._ensure_lexical_index(persona_id, collection)
+
+            # Adicionar ao ChromaDB em lotes, em ordem, com os vetores já
+            # calculados: cada lote ocupa uma thread de ingestão por pouco tempo
+            batch_size = max(1, settings.VECTOR_STORE_INGEST_BATCH_SIZE)
+            added = 0
+            try:
+                for start in range(0, len(ids), batch_size):
+                    end = start + batch_size
+                    await self._ingest_pool.run(
+                        collection.add,
+                        documents=documents[start:end],
+                        metadatas=metadatas[start:end],
+                        ids=ids[start:end],
+                        embeddings=embeddings[start:end]
+                    )
+                    added = end
+
+                # Mesmos chunks no índice lexical (por último: é o passo mais barato)
+                await self._ingest_pool.run(
+                    self._lexical_index.add, persona_id, ids, documents, metadatas)
+            except BaseException:
+                # Não deixar o documento pela metade no banco vetorial
+                if added:
+                    await self._ingest_pool.run(collection.delete, ids=ids[:added])
+                    await self._ingest_pool.run(self._lexical_index.delete_ids, persona_id, ids)
+                raise
 
             logger.info(f"✅ Documento {document_id} adicionado com {len(text_chunks)} chunks")
             return True
@@ -138,54 +274,335 @@ class VectorStoreService:
             logger.error(f"❌ Erro ao adicionar documento {document_id}: {e}")
             return False
 
+    async def _embed_chunks(self, texts: List[str], document_id: str) -> List[List[float]]:
+        """
+        Embeddings dos chunks de um documento
+
+        Chunks já vistos (mesmo texto normalizado e modelo) vêm do cache de
+        embeddings; os demais, sem repetição dentro do documento, são
+        calculados em lotes paralelos no pool de processos e guardados.
+        """
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        if settings.EMBEDDING_CACHE_ENABLED:
+            try:
+                embeddings = await self._ingest_pool.run(self._embedding_cache.get_many, texts)
+            except Exception as e:
+                logger.warning(f"⚠️ Cache de embeddings indisponível: {e}")
+        hits = sum(1 for vector in embeddings if vector is not None)
+
+        # Chunks novos agrupados pelo texto normalizado (mesma chave do cache)
+        missing: Dict[str, List[int]] = {}
+        for index, (text, vector) in enumerate(zip(texts, embeddings)):
+            if vector is None:
+                missing.setdefault(normalize_text(text), []).append(index)
+        new_texts = [texts[indices[0]] for indices in missing.values()]
+
+        batch_size = max(1, settings.VECTOR_STORE_INGEST_BATCH_SIZE)
+        tasks = [
+            asyncio.ensure_future(self._embed_documents(new_texts[start:start + batch_size]))
+            for start in range(0, len(new_texts), batch_size)
+        ]
+        try:
+            batches = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        vectors = [vector for batch in batches for vector in batch]
+        for indices, vector in zip(missing.values(), vectors):
+            for index in indices:
+                embeddings[index] = vector
+
+        if settings.EMBEDDING_CACHE_ENABLED and new_texts:
+            try:
+                await self._ingest_pool.run(self._embedding_cache.put_many, new_texts, vectors)
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao gravar no cache de embeddings: {e}")
+
+        hit_ratio = hits / len(texts) if texts else 0.0
+        metrics.increment("embedding_cache_hits_total", hits)
+        metrics.increment("embedding_cache_misses_total", len(texts) - hits)
+        metrics.observe("ingestion_embedding_cache_hit_ratio", hit_ratio, buckets=HIT_RATIO_BUCKETS)
+        logger.info(
+            f"♻️ Documento {document_id}: {hits}/{len(texts)} chunks do cache de embeddings "
+            f"({hit_ratio:.0%}), {len(new_texts)} calculados")
+        return embeddings
+
     async def search_similar_content(
         self,
         persona_id: int,
         query: str,
         n_results: int = None,
-        filter_metadata: Dict[str, Any] = None
+        filter_metadata: Dict[str, Any] = None,
+        mode: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
-        Busca conteúdo similar no banco vetorial
+        Busca conteúdo relevante na base da persona
 
         Args:
             persona_id: ID da persona
             query: Texto de busca
             n_results: Número de resultados (padrão: configuração)
             filter_metadata: Filtros de metadados
+            mode: "hybrid" ou "vector" (padrão: RETRIEVAL_MODE)
 
         Returns:
             List[Dict]: Lista de documentos similares com metadados
         """
+        result = await self.search(persona_id, query, n_results, filter_metadata, mode)
+        return result['results']
+
+    async def search(
+        self,
+        persona_id: int,
+        query: str,
+        n_results: int = None,
+        filter_metadata: Dict[str, Any] = None,
+        mode: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Busca com o modo de recuperação escolhido e a latência de cada etapa
+
+        No modo híbrido a busca vetorial e a lexical (BM25) rodam em paralelo,
+        cada uma com HYBRID_CANDIDATES candidatos, e as listas são fundidas por
+        reciprocal rank fusion. Se o índice lexical falhar, a busca segue só
+        com os vetores.
+
+        Returns:
+            Dict: results (lista de documentos), mode e timings_ms por etapa
+        """
+        mode = (mode or settings.RETRIEVAL_MODE).lower()
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Modo de recuperação inválido: {mode} (use {' ou '.join(RETRIEVAL_MODES)})")
+
+        if n_results is None:
+            n_results = settings.TOP_K_RETRIEVAL
+
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        try:
+            collection = await self.get_or_create_collection(persona_id)
+
+            if mode == "vector":
+                results = await self._timed_leg(
+                    "vector", timings, self._vector_search(collection, query, n_results, filter_metadata))
+            else:
+                candidates = max(n_results, settings.HYBRID_CANDIDATES)
+                vector_results, lexical_results = await asyncio.gather(
+                    self._timed_leg(
+                        "vector", timings, self._vector_search(collection, query, candidates, filter_metadata)),
+                    self._timed_leg(
+                        "lexical", timings,
+                        self._lexical_search(persona_id, collection, query, candidates, filter_metadata)),
+                    return_exceptions=True
+                )
+                if isinstance(vector_results, BaseException):
+                    raise vector_results
+                if isinstance(lexical_results, BaseException):
+                    logger.warning(f"⚠️ Busca lexical indisponível, usando só vetores: {lexical_results}")
+                    lexical_results = []
+
+                fusion_started = time.perf_counter()
+                results = self._reciprocal_rank_fusion(
+                    {"vector": vector_results, "lexical": lexical_results}, n_results)
+                timings["fusion"] = round((time.perf_counter() - fusion_started) * 1000, 2)
+
+        except Exception as e:
+            logger.error(f"❌ Erro na busca ({mode}): {e}")
+            results = []
+
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+        metrics.observe("retrieval_seconds", timings["total"] / 1000, mode=mode)
+        logger.info(f"🔍 Encontrados {len(results)} documentos ({mode}) para persona {persona_id}")
+        return {'results': results, 'mode': mode, 'timings_ms': timings}
+
+    async def _timed_leg(self, leg: str, timings: Dict[str, float], operation):
+        """Aguarda uma etapa da busca registrando sua latência"""
+        started = time.perf_counter()
+        try:
+            return await operation
+        finally:
+            elapsed = time.perf_counter() - started
+            timings[leg] = round(elapsed * 1000, 2)
+            metrics.observe("retrieval_leg_seconds", elapsed, leg=leg)
+
+    async def _vector_search(
+        self,
+        collection,
+        query: str,
+        n_results: int,
+        filter_metadata: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        # Embedding da consulta em micro-lote
+        query_embedding = (await self.embed_texts([query]))[0]
+        results = await self._query_pool.run(
+            collection.query,
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=filter_metadata
+        )
+        return self._format_query_results(results, 0)
+
+    async def _lexical_search(
+        self,
+        persona_id: int,
+        collection,
+        query: str,
+        n_results: int,
+        filter_metadata: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        await self._ensure_lexical_index(persona_id, collection)
+        return await self._query_pool.run(
+            self._lexical_index.search, persona_id, query, n_results, filter_metadata)
+
+    def _reciprocal_rank_fusion(
+        self,
+        rankings: Dict[str, List[Dict[str, Any]]],
+        n_results: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Funde listas ranqueadas: score = soma de 1 / (RRF_K + posição)
+
+        Chunks encontrados pelas duas buscas sobem; cada resultado informa
+        em quais buscas apareceu (sources) e mantém distance/bm25 originais.
+        """
+        k = max(1, settings.RRF_K)
+        fused: Dict[str, Dict[str, Any]] = {}
+        for source, documents in rankings.items():
+            for rank, doc in enumerate(documents, start=1):
+                key = doc.get('id') or doc['content']
+                entry = fused.get(key)
+                if entry is None:
+                    entry = fused[key] = {**doc, 'rrf_score': 0.0, 'sources': []}
+                else:
+                    entry.update({field: value for field, value in doc.items() if field not in entry})
+                entry['rrf_score'] += 1 / (k + rank)
+                entry['sources'].append(source)
+
+        ranked = sorted(fused.values(), key=lambda entry: entry['rrf_score'], reverse=True)[:n_results]
+        for entry in ranked:
+            entry['rrf_score'] = round(entry['rrf_score'], 6)
+        return ranked
+
+    async def search_similar_content_batch(
+        self,
+        persona_id: int,
+        queries: Optional[List[str]] = None,
+        query_embeddings: Optional[List[List[float]]] = None,
+        n_results: int = None,
+        mode: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Busca conteúdo relevante para várias consultas em uma única chamada
+
+        A parte vetorial usa uma única consulta ao ChromaDB; no modo híbrido
+        cada consulta também passa pelo índice lexical e as listas são
+        fundidas por RRF, como em search().
+
+        Args:
+            persona_id: ID da persona
+            queries: Textos de busca (obrigatório no modo híbrido)
+            query_embeddings: Embeddings já calculados das consultas
+            n_results: Número de resultados por consulta (padrão: configuração)
+            mode: "hybrid" ou "vector" (padrão: RETRIEVAL_MODE)
+
+        Returns:
+            List[List[Dict]]: Resultados na mesma ordem das consultas
+        """
+        total = len(query_embeddings if query_embeddings is not None else queries or [])
+        if not total:
+            return []
+
+        mode = (mode or settings.RETRIEVAL_MODE).lower()
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Modo de recuperação inválido: {mode} (use {' ou '.join(RETRIEVAL_MODES)})")
+        if mode == "hybrid" and not queries:
+            # Sem os textos não há busca lexical
+            mode = "vector"
+
         try:
             collection = await self.get_or_create_collection(persona_id)
 
             if n_results is None:
                 n_results = settings.TOP_K_RETRIEVAL
+            candidates = max(n_results, settings.HYBRID_CANDIDATES) if mode == "hybrid" else n_results
 
-            # Executar busca por similaridade
-            results = collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=filter_metadata
-            )
+            timings: Dict[str, float] = {}
+            if query_embeddings is None:
+                query_embeddings = await self.embed_texts(queries)
+            vector_query = self._timed_leg("vector", timings, self._query_pool.run(
+                collection.query, query_embeddings=query_embeddings, n_results=candidates))
+
+            if mode == "vector":
+                results = await vector_query
+                batch = [self._format_query_results(results, i) for i in range(total)]
+            else:
+                lexical_queries = self._timed_leg("lexical", timings, asyncio.gather(*(
+                    self._lexical_search(persona_id, collection, query, candidates, None)
+                    for query in queries
+                )))
+                results, lexical_batch = await asyncio.gather(
+                    vector_query, lexical_queries, return_exceptions=True)
+                if isinstance(results, BaseException):
+                    raise results
+                if isinstance(lexical_batch, BaseException):
+                    logger.warning(f"⚠️ Busca lexical indisponível, usando só vetores: {lexical_batch}")
+                    lexical_batch = [[] for _ in range(total)]
+
+                fusion_started = time.perf_counter()
+                batch = [
+                    self._reciprocal_rank_fusion(
+                        {"vector": self._format_query_results(results, i), "lexical": lexical_batch[i]},
+                        n_results)
+                    for i in range(total)
+                ]
+                timings["fusion"] = round((time.perf_counter() - fusion_started) * 1000, 2)
+
+            logger.info(f"🔍 Busca em lote ({mode}): {total} consultas para persona {persona_id} {timings}")
+            return batch
+
+        except Exception as e:
+            logger.error(f"❌ Erro na busca de similaridade em lote: {e}")
+            return [[] for _ in range(total)]
+
+    def _format_query_results(self, results: Dict[str, Any], index: int) -> List[Dict[str, Any]]:
+        """Converte o resultado de collection.query para a consulta de posição index"""
+        similar_docs = []
+        if results['documents'] and len(results['documents']) > index and results['documents'][index]:
+            for i, doc in enumerate(results['documents'][index]):
+                similar_docs.append({
+                    'content': doc,
+                    'metadata': results['metadatas'][index][i] if results['metadatas'] else {},
+                    'distance': results['distances'][index][i] if results['distances'] else 0.0,
+                    'id': results['ids'][index][i] if results['ids'] else None
+                })
+        return similar_docs
+
+    async def get_persona_documents(
+        self,
+        persona_id: int,
+        limit: Optional[int] = None
+    ) -> List[str]:
+        """
+        Lista o texto dos chunks armazenados para uma persona
 
-            # Formatar resultados
-            similar_docs = []
-            if results['documents'] and results['documents'][0]:
-                for i, doc in enumerate(results['documents'][0]):
-                    similar_docs.append({
-                        'content': doc,
-                        'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                        'distance': results['distances'][0][i] if results['distances'] else 0.0,
-                        'id': results['ids'][0][i] if results['ids'] else None
-                    })
+        Args:
+            persona_id: ID da persona
+            limit: Número máximo de chunks
 
-            logger.info(f"🔍 Encontrados {len(similar_docs)} documentos similares para persona {persona_id}")
-            return similar_docs
+        Returns:
+            List[str]: Conteúdo dos chunks
+        """
+        try:
+            collection = await self.get_or_create_collection(persona_id)
+            results = await self._query_pool.run(
+                collection.get, limit=limit, include=["documents"])
+            return [document for document in results.get('documents') or [] if document]
 
         except Exception as e:
-            logger.error(f"❌ Erro na busca de similaridade: {e}")
+            logger.error(f"❌ Erro ao listar chunks da persona {persona_id}: {e}")
             return []
 
     async def delete_document(self, persona_id: int, document_id: str) -> bool:
@@ -202,15 +619,15 @@ class VectorStoreService:
         try:
             collection = await self.get_or_create_collection(persona_id)
 
-            # Buscar todos os chunks do documento
-            results = collection.get(
-                where={"document_id": document_id}
-            )
+            # Buscar e deletar todos os chunks do documento
+            removed = await self._ingest_pool.run(self._delete_document_chunks, collection, document_id)
+            try:
+                await self._ingest_pool.run(self._lexical_index.delete_document, persona_id, document_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao remover {document_id} do índice lexical: {e}")
 
-            if results['ids']:
-                # Deletar todos os chunks
-                collection.delete(ids=results['ids'])
-                logger.info(f"🗑️ Documento {document_id} removido ({len(results['ids'])} chunks)")
+            if removed:
+                logger.info(f"🗑️ Documento {document_id} removido ({removed} chunks)")
                 return True
             else:
                 logger.warning(f"⚠️ Documento {document_id} não encontrado")
@@ -220,6 +637,12 @@ class VectorStoreService:
             logger.error(f"❌ Erro ao deletar documento {document_id}: {e}")
             return False
 
+    def _delete_document_chunks(self, collection, document_id: str) -> int:
+        results = collection.get(where={"document_id": document_id}, include=[])
+        if results['ids']:
+            collection.delete(ids=results['ids'])
+        return len(results['ids'])
+
     async def get_collection_stats(self, persona_id: int) -> Dict[str, Any]:
         """
         Obtém estatísticas da coleção de uma persona
@@ -231,10 +654,10 @@ class VectorStoreService:
             collection = await self.get_or_create_collection(persona_id)
 
             # Obter contagem de documentos
-            count_result = collection.count()
+            count_result = await self._query_pool.run(collection.count)
 
             # Obter alguns metadados para análise
-            sample_results = collection.get(limit=10)
+            sample_results = await self._query_pool.run(collection.get, limit=10)
 
             # Calcular estatísticas
             unique_documents = set()
@@ -270,12 +693,15 @@ class VectorStoreService:
             collection_name = self.get_collection_name(persona_id)
 
             # Deletar coleção
-            self.client.delete_collection(collection_name)
+            await self._ingest_pool.run(self.client.delete_collection, collection_name)
 
             # Remover do cache
             if collection_name in self.collections:
                 del self.collections[collection_name]
 
+            await self._ingest_pool.run(self._lexical_index.drop_persona, persona_id)
+            self._lexical_ready.discard(persona_id)
+
             logger.info(f"🧹 Coleção da persona {persona_id} limpa")
             return True
 
@@ -283,9 +709,34 @@ class VectorStoreService:
             logger.error(f"❌ Erro ao limpar coleção: {e}")
             return False
 
+    async def list_collections(self) -> List[Any]:
+        """Lista as coleções do ChromaDB"""
+        return await self._query_pool.run(self.client.list_collections)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Ocupação dos pools de threads e de processos e do micro-batching"""
+        return {
+            "query": self._query_pool.stats(),
+            "ingest": self._ingest_pool.stats(),
+            "query_batcher": self._query_batcher.stats(),
+            "embedding_workers": self._embedding_workers.stats(),
+        }
+
+    def shutdown(self):
+        """Encerra os pools de threads e de processos, o cache de embeddings e o índice lexical"""
+        self._query_pool.shutdown()
+        self._ingest_pool.shutdown()
+        self._embedding_workers.shutdown()
+        self._embedding_cache.close()
+        self._lexical_index.close()
+
 # Instância global
 vector_store = VectorStoreService()
 
 async def init_vector_store():
     """Inicializa o serviço de banco vetorial"""
-    await vector_store.initialize()
\ No newline at end of file
+    await vector_store.initialize()
+
+def close_vector_store():
+    """Encerra os pools do banco vetorial"""
+    vector_store.shutdown()
\ No newline at end of file
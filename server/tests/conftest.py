@@ -0,0 +1,21 @@
+"""
+Configuração dos testes.
+As variáveis de ambiente são definidas antes de importar src (as settings
+são lidas na importação): banco, índices e uploads ficam em um diretório
+temporário e o pool de processos de embeddings fica desligado.
+"""
+
+import os
+import tempfile
+
+_TEST_DIR = tempfile.mkdtemp(prefix="projeto-tcc-tests-")
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TEST_DIR, 'test.db')}")
+os.environ.setdefault("CHROMA_PERSIST_DIRECTORY", os.path.join(_TEST_DIR, "chroma"))
+os.environ.setdefault("UPLOAD_DIRECTORY", os.path.join(_TEST_DIR, "uploads"))
+os.environ.setdefault("EMBEDDING_CACHE_PATH", os.path.join(_TEST_DIR, "embedding_cache.db"))
+os.environ.setdefault("LEXICAL_INDEX_PATH", os.path.join(_TEST_DIR, "lexical_index.db"))
+os.environ.setdefault("EMBEDDING_WORKERS", "0")
+os.environ.setdefault("AI_REPLAY_RECORD", "false")
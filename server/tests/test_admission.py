@@ -0,0 +1,216 @@
+"""
+Testes do controle de admissão: token bucket por usuário, Retry-After da
+rota e rodízio entre clientes na fila justa dos providers.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from src.core.config import settings
+from src.services import admission as admission_module
+from src.services.admission import (
+    AdmissionController,
+    FairSemaphore,
+    RateLimitExceededError,
+    TokenBucket,
+    set_current_client,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission_module.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def rate_limit(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_REQUESTS_PER_MINUTE", 6.0)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 2)
+
+
+def test_token_bucket_burst_then_wait(clock):
+    bucket = TokenBucket(rate=0.5, capacity=2)
+
+    assert bucket.take(1) == 0.0
+    assert bucket.take(1) == 0.0
+    assert bucket.take(1) == pytest.approx(2.0)
+
+    clock.now += 2.0
+    assert bucket.take(1) == 0.0
+    assert not bucket.full
+
+
+def test_token_bucket_refill_is_capped(clock):
+    bucket = TokenBucket(rate=1.0, capacity=3)
+    bucket.take(3)
+
+    clock.now += 100
+    assert bucket.full
+    assert bucket.tokens == 3
+
+
+def test_admission_rejects_with_retry_after(clock, rate_limit):
+    controller = AdmissionController()
+    controller.admit(1, route="caption")
+    controller.admit(1, route="caption")
+
+    with pytest.raises(RateLimitExceededError) as error:
+        controller.admit(1, route="caption")
+    assert error.value.retry_after == pytest.approx(10.0)
+
+    # Outro usuário tem o próprio bucket
+    controller.admit(2, route="caption")
+
+
+def test_admission_caps_cost_at_burst(clock, rate_limit):
+    controller = AdmissionController()
+    # Um lote maior que o bucket esvazia o bucket, mas é aceito
+    controller.admit(1, cost=50, route="caption_batch")
+
+    with pytest.raises(RateLimitExceededError):
+        controller.admit(1, route="caption")
+
+
+def test_admit_generation_maps_to_429_with_retry_after(monkeypatch, clock, rate_limit):
+    from src.api.routes import content_generation
+
+    monkeypatch.setattr(content_generation, "admission", AdmissionController())
+    user = SimpleNamespace(id=7)
+    content_generation.admit_generation(user, "caption")
+    content_generation.admit_generation(user, "caption")
+
+    with pytest.raises(HTTPException) as error:
+        content_generation.admit_generation(user, "caption")
+    assert error.value.status_code == 429
+    assert error.value.headers == {"Retry-After": "10"}
+
+
+def test_refund_gives_tokens_back(clock, rate_limit):
+    controller = AdmissionController()
+    controller.admit(1, cost=2, route="job_caption_batch")
+
+    controller.refund(1, cost=2, route="job_caption_batch")
+    controller.admit(1, route="caption")
+    controller.admit(1, route="caption")
+
+    # Nunca acima da capacidade do bucket
+    controller.refund(1, cost=50)
+    controller.refund(1, cost=50)
+    assert controller._buckets["1"].tokens == 2
+
+
+async def test_job_rejected_by_unavailable_queue_is_not_charged(monkeypatch, clock, rate_limit):
+    from src.api.routes import content_generation
+    from src.services.job_queue import JobQueueUnavailableError
+
+    controller = AdmissionController()
+    monkeypatch.setattr(content_generation, "admission", controller)
+    monkeypatch.setattr(
+        content_generation, "get_user_persona", lambda db, persona_id, user_id: SimpleNamespace(id=persona_id))
+
+    def unavailable(*args, **kwargs):
+        raise JobQueueUnavailableError("Pool de workers não iniciado")
+
+    monkeypatch.setattr(content_generation.job_queue, "submit", unavailable)
+    body = {"type": "caption_batch", "params": {"persona_id": 1, "items": ["a", "b"]}}
+
+    with pytest.raises(HTTPException) as error:
+        await content_generation.submit_generation_job(body, current_user=SimpleNamespace(id=7), db=None)
+
+    assert error.value.status_code == 503
+    assert controller._buckets["7"].full
+
+
+async def _hold(semaphore: FairSemaphore, client: str, label: str, order: list):
+    set_current_client(client)
+    async with semaphore:
+        order.append(label)
+
+
+async def test_fair_semaphore_round_robin_between_clients():
+    semaphore = FairSemaphore("test", 1)
+    order: list = []
+
+    await semaphore.acquire()
+    # O cliente "a" enfileira três chamadas antes da única chamada de "b"
+    tasks = [
+        asyncio.create_task(_hold(semaphore, "a", "a1", order)),
+        asyncio.create_task(_hold(semaphore, "a", "a2", order)),
+        asyncio.create_task(_hold(semaphore, "a", "a3", order)),
+        asyncio.create_task(_hold(semaphore, "b", "b1", order)),
+    ]
+    await asyncio.sleep(0)
+    assert semaphore.stats()["queued"] == 4
+    assert semaphore.stats()["queued_clients"] == 2
+
+    semaphore.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["a1", "b1", "a2", "a3"]
+    assert semaphore.stats() == {"capacity": 1, "in_flight": 0, "queued": 0, "queued_clients": 0}
+
+
+async def test_fair_semaphore_grants_directly_without_queue():
+    semaphore = FairSemaphore("test", 2)
+
+    await semaphore.acquire()
+    await semaphore.acquire()
+    assert semaphore.stats()["in_flight"] == 2
+
+    semaphore.release()
+    semaphore.release()
+    assert semaphore.stats()["in_flight"] == 0
+
+
+async def test_fair_semaphore_cancelled_waiter_leaves_queue():
+    semaphore = FairSemaphore("test", 1)
+    order: list = []
+
+    await semaphore.acquire()
+    cancelled = asyncio.create_task(_hold(semaphore, "a", "a1", order))
+    waiting = asyncio.create_task(_hold(semaphore, "b", "b1", order))
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    assert semaphore.stats()["queued"] == 1
+
+    semaphore.release()
+    await waiting
+    assert order == ["b1"]
+    assert semaphore.stats()["in_flight"] == 0
+
+
+async def test_fair_semaphore_cancel_after_grant_passes_slot_on():
+    semaphore = FairSemaphore("test", 1)
+    order: list = []
+
+    await semaphore.acquire()
+    granted = asyncio.create_task(_hold(semaphore, "a", "a1", order))
+    waiting = asyncio.create_task(_hold(semaphore, "b", "b1", order))
+    await asyncio.sleep(0)
+
+    # A vaga é repassada a "a", que é cancelado antes de acordar
+    semaphore.release()
+    granted.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await granted
+
+    await waiting
+    assert order == ["b1"]
+    assert semaphore.stats()["in_flight"] == 0
@@ -0,0 +1,58 @@
+"""
+Testes do pool de operações bloqueantes: limite de pendentes e contadores
+de fila quando a operação é cancelada antes de rodar.
+"""
+
+import asyncio
+import threading
+
+from src.services.blocking_pool import BlockingPool
+
+
+async def test_runs_in_worker_thread():
+    pool = BlockingPool("test", 1, 0)
+    try:
+        name = await pool.run(lambda: threading.current_thread().name)
+        assert name.startswith("test")
+        assert pool.stats()["queued"] == 0
+    finally:
+        pool.shutdown()
+
+
+async def test_cancelled_before_running_leaves_queue():
+    pool = BlockingPool("test", 1, 2)
+    release = threading.Event()
+    try:
+        busy = asyncio.create_task(pool.run(release.wait))
+        queued = asyncio.create_task(pool.run(lambda: "nunca"))
+        await asyncio.sleep(0.05)
+        assert pool.stats()["queued"] == 1
+
+        queued.cancel()
+        await asyncio.sleep(0.01)
+        assert pool.stats()["queued"] == 0
+
+        release.set()
+        assert await busy is True
+        await asyncio.sleep(0.01)
+        assert pool.stats() == {"workers": 1, "max_pending": 2, "active": 0, "queued": 0, "waiting": 0}
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+async def test_shutdown_drops_queued_operations():
+    pool = BlockingPool("test", 1, 2)
+    release = threading.Event()
+    busy = asyncio.create_task(pool.run(release.wait))
+    queued = [asyncio.create_task(pool.run(lambda: "nunca")) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    assert pool.stats()["queued"] == 2
+
+    pool.shutdown()
+    release.set()
+    results = await asyncio.gather(busy, *queued, return_exceptions=True)
+
+    assert results[0] is True
+    assert all(isinstance(result, asyncio.CancelledError) for result in results[1:])
+    assert pool.stats()["queued"] == 0
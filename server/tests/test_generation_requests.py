@@ -0,0 +1,45 @@
+"""
+Testes da validação dos corpos das rotas de geração.
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.routes.content_generation import parse_batch_request
+from src.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def batch_limits(monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_MAX_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "BATCH_MAX_ITEMS", 10)
+
+
+def _batch(**fields):
+    return {"persona_id": 1, "items": ["verão", {"topic": "inverno", "style": "informativo"}], **fields}
+
+
+def test_batch_defaults():
+    params = parse_batch_request(_batch())
+
+    assert params["max_concurrency"] == 4
+    assert [item["topic"] for item in params["items"]] == ["verão", "inverno"]
+    assert params["items"][1]["style"] == "informativo"
+
+
+def test_batch_max_concurrency_is_capped():
+    assert parse_batch_request(_batch(max_concurrency=2))["max_concurrency"] == 2
+    assert parse_batch_request(_batch(max_concurrency=50))["max_concurrency"] == 4
+
+
+@pytest.mark.parametrize("value", [0, -3, "2", [2], 1.5, True])
+def test_batch_invalid_max_concurrency_is_400(value):
+    with pytest.raises(HTTPException) as error:
+        parse_batch_request(_batch(max_concurrency=value))
+    assert error.value.status_code == 400
+
+
+def test_batch_too_many_items_is_400():
+    with pytest.raises(HTTPException) as error:
+        parse_batch_request({"persona_id": 1, "items": ["tópico"] * 11})
+    assert error.value.status_code == 400
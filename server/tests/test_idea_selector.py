@@ -0,0 +1,56 @@
+"""
+Testes da seleção diversificada de ideias (MMR).
+"""
+
+from src.services.idea_selector import select_diverse
+
+# Duas ideias quase iguais (a, a2), uma diferente (b) e uma pouco relevante (c)
+ITEMS = ["a", "a2", "b", "c"]
+EMBEDDINGS = [
+    [1.0, 0.0, 0.0],
+    [0.99, 0.05, 0.0],
+    [0.6, 0.8, 0.0],
+    [0.0, 0.0, 1.0],
+]
+QUERY = [1.0, 0.0, 0.0]
+
+
+def test_near_duplicates_are_dropped():
+    selected, duplicates = select_diverse(ITEMS, EMBEDDINGS, QUERY, 3, 0.7, 0.95)
+
+    assert selected == ["a", "b", "c"]
+    assert duplicates == 1
+
+
+def test_relevance_only_ranks_by_query():
+    selected, duplicates = select_diverse(ITEMS, EMBEDDINGS, QUERY, 3, 1.0, 1.01)
+
+    assert selected == ["a", "a2", "b"]
+    assert duplicates == 0
+
+
+def test_diversity_prefers_distant_items():
+    # Depois de "a", o peso da diversidade troca "b" por "c" (ortogonal)
+    selected, _ = select_diverse(ITEMS, EMBEDDINGS, QUERY, 2, 0.3, 0.95)
+
+    assert selected == ["a", "c"]
+
+
+def test_without_query_uses_only_diversity():
+    selected, _ = select_diverse(ITEMS, EMBEDDINGS, None, 2, 0.5, 0.95)
+
+    assert len(selected) == 2
+    assert selected[0] == "a"
+    assert selected[1] == "c"
+
+
+def test_empty_or_zero_count():
+    assert select_diverse([], [], QUERY, 3, 0.7, 0.95) == ([], 0)
+    assert select_diverse(ITEMS, EMBEDDINGS, QUERY, 0, 0.7, 0.95) == ([], 0)
+
+
+def test_fewer_candidates_than_requested():
+    selected, duplicates = select_diverse(["a", "a2"], EMBEDDINGS[:2], QUERY, 5, 0.7, 0.95)
+
+    assert selected == ["a"]
+    assert duplicates == 1
@@ -0,0 +1,85 @@
+"""
+Testes da conversão da resposta de ideias: campos ausentes de várias
+ideias são completados em uma única chamada ao modelo.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.ai_service import ai_service
+
+PERSONA = {"id": 1, "name": "Persona de teste"}
+
+
+def _idea(title: str, **fields):
+    return {
+        "title": title,
+        "description": f"Descrição de {title}",
+        "content_type": "reels",
+        "engagement_goal": "alcance",
+        "key_elements": ["gancho"],
+        "trending_potential": "alto",
+        **fields,
+    }
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Substitui o modelo: registra os prompts e devolve as respostas da fila"""
+    fake = SimpleNamespace(calls=[], replies=[])
+
+    async def fake_generate_text(prompt, response_schema=None):
+        fake.calls.append((prompt, response_schema))
+        return fake.replies.pop(0)
+
+    monkeypatch.setattr(ai_service, "_generate_text", fake_generate_text)
+    return fake
+
+
+async def test_complete_ideas_need_no_repair(model):
+    response = json.dumps({"ideas": [_idea("A"), _idea("B")]})
+
+    ideas = await ai_service._parse_ideas_response(response, PERSONA)
+
+    assert [idea["title"] for idea in ideas] == ["A", "B"]
+    assert model.calls == []
+
+
+async def test_missing_fields_are_repaired_in_one_call(model):
+    raw = [_idea("A")]
+    for title in ("B", "C", "D"):
+        idea = _idea(title)
+        del idea["description"]
+        raw.append(idea)
+    raw.append({"description": "sem título"})
+    model.replies.append(json.dumps({"items": [
+        {"index": 1, "description": "Descrição B"},
+        {"index": 2, "description": "Descrição C"},
+        {"index": 3, "description": "Descrição D", "title": "Outro título"},
+    ]}))
+
+    ideas = await ai_service._parse_ideas_response(json.dumps({"ideas": raw}), PERSONA)
+
+    assert len(model.calls) == 1
+    prompt, schema = model.calls[0]
+    assert schema["schema"]["properties"]["items"]["type"] == "array"
+    assert set(schema["schema"]["properties"]["items"]["items"]["properties"]) == {"index", "description"}
+    assert [(idea["title"], idea["description"]) for idea in ideas] == [
+        ("A", "Descrição de A"),
+        ("B", "Descrição B"),
+        ("C", "Descrição C"),
+        # Só os campos ausentes são aplicados
+        ("D", "Descrição D"),
+    ]
+
+
+async def test_ideas_left_incomplete_are_dropped(model):
+    raw = [_idea("A"), {"title": "B"}, {"title": "C"}]
+    model.replies.append(json.dumps([{"index": 2, "description": "Descrição C"}]))
+
+    ideas = await ai_service._parse_ideas_response(json.dumps(raw), PERSONA)
+
+    assert len(model.calls) == 1
+    assert [idea["title"] for idea in ideas] == ["A", "C"]
@@ -0,0 +1,73 @@
+"""
+Testes da extração tolerante de JSON das respostas dos modelos.
+"""
+
+from src.services.json_extractor import StreamingJSONExtractor, extract_json
+
+
+def test_plain_json_is_not_recovered():
+    extractor = StreamingJSONExtractor()
+    extractor.feed('{"caption": "Olá", "hashtags": ["#a"]}')
+
+    assert extractor.finish() == {"caption": "Olá", "hashtags": ["#a"]}
+    assert not extractor.recovered
+
+
+def test_code_fence_and_surrounding_text():
+    text = 'Claro! Aqui está:\n```json\n{"caption": "Olá {mundo}"}\n```\nEspero ter ajudado.'
+    extractor = StreamingJSONExtractor()
+    extractor.feed(text)
+
+    assert extractor.finish() == {"caption": "Olá {mundo}"}
+    assert extractor.recovered
+
+
+def test_trailing_commas():
+    assert extract_json('{"hashtags": ["#a", "#b",], "caption": "x",}') == {
+        "hashtags": ["#a", "#b"],
+        "caption": "x",
+    }
+
+
+def test_invalid_candidate_is_skipped():
+    assert extract_json('use {chaves} assim: {"ok": true}') == {"ok": True}
+
+
+def test_truncated_string_and_list_are_closed():
+    text = '{"caption": "Olá", "hashtags": ["#a", "#b'
+    assert extract_json(text) == {"caption": "Olá", "hashtags": ["#a", "#b"]}
+
+
+def test_truncated_after_key_drops_the_key():
+    assert extract_json('{"caption": "Olá", "hashtags":') == {"caption": "Olá"}
+    assert extract_json('{"caption": "Olá", "hasht') == {"caption": "Olá"}
+
+
+def test_no_json_returns_none():
+    assert extract_json("Desculpe, não consigo ajudar.") is None
+    assert extract_json('["a", "b"]') is None
+    assert extract_json('["a", "b"]', allow_list=True) == ["a", "b"]
+
+
+def test_chunked_feed_matches_single_feed():
+    text = 'Resposta:\n```json\n{"ideas": [{"title": "A \\"citação\\"", "tags": ["x",]}]}\n```'
+    extractor = StreamingJSONExtractor()
+
+    values = [extractor.feed(char) for char in text]
+
+    expected = {"ideas": [{"title": 'A "citação"', "tags": ["x"]}]}
+    completed_at = text.index("}]}") + len("}]}") - 1
+    # O valor fica disponível assim que o objeto fecha, sem esperar o fim do texto
+    assert values[completed_at - 1] is None
+    assert values[completed_at] == expected
+    assert extractor.done
+    assert extractor.finish() == extract_json(text) == expected
+
+
+def test_feed_after_done_is_ignored():
+    extractor = StreamingJSONExtractor()
+    extractor.feed('{"a": 1}')
+    extractor.feed('{"b": 2}')
+
+    assert extractor.finish() == {"a": 1}
+    assert extractor.text == '{"a": 1}'
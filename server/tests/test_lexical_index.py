@@ -0,0 +1,150 @@
+"""
+Testes do índice lexical (FTS5): busca BM25, gravação em lotes e leituras
+que não esperam pela conexão de escrita.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.services import lexical_index as lexical_index_module
+from src.services.lexical_index import LexicalIndex, build_match_query
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.db"))
+    yield index
+    index.close()
+
+
+def _add(index, persona_id, chunks):
+    ids = [chunk_id for chunk_id, _, _ in chunks]
+    documents = [content for _, content, _ in chunks]
+    metadatas = [{"document_id": document_id, "kb_id": 1} for _, _, document_id in chunks]
+    index.add(persona_id, ids, documents, metadatas)
+
+
+def test_build_match_query():
+    assert build_match_query("Promoção #verão, promoção!") == '"promoção" OR "verão"'
+    assert build_match_query("!!! ???") is None
+
+
+def test_search_ranks_by_bm25_and_ignores_diacritics(index):
+    _add(index, 1, [
+        ("c1", "Receita de bolo de cenoura", "d1"),
+        ("c2", "Promoção de verão: bolo e promocao de café", "d1"),
+        ("c3", "Horário de funcionamento da loja", "d2"),
+    ])
+
+    results = index.search(1, "promoção", 5)
+
+    assert [result["id"] for result in results] == ["c2"]
+    assert results[0]["metadata"] == {"document_id": "d1", "kb_id": 1}
+    assert {result["id"] for result in index.search(1, "bolo", 5)} == {"c1", "c2"}
+    assert index.search(1, "bolo", 5, {"document_id": "d2"}) == []
+
+
+def test_unknown_persona_returns_nothing_without_creating_table(index):
+    assert index.search(99, "bolo", 5) == []
+    assert not index.has_persona(99)
+
+
+def test_add_writes_in_batches(index, monkeypatch):
+    monkeypatch.setattr(lexical_index_module, "WRITE_BATCH_SIZE", 2)
+    commits = []
+    connection = index._connect()
+    original_commit = connection.commit
+
+    class CountingConnection:
+        def __getattr__(self, name):
+            return getattr(connection, name)
+
+        def commit(self):
+            commits.append(1)
+            original_commit()
+
+    index._writer = CountingConnection()
+    _add(index, 1, [(f"c{i}", f"chunk número {i} sobre bolo", "d1") for i in range(5)])
+
+    # Criação da tabela + três lotes (2, 2, 1)
+    assert len(commits) == 4
+    assert len(index.search(1, "bolo", 10)) == 5
+
+
+def test_search_does_not_wait_for_writer(index):
+    _add(index, 1, [("c1", "bolo de cenoura", "d1")])
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Uma ingestão em andamento segura a conexão de escrita
+        with index._write_lock:
+            results = executor.submit(index.search, 1, "bolo", 5).result(timeout=5)
+
+    assert [result["id"] for result in results] == ["c1"]
+
+
+def test_reader_sees_committed_batches(index):
+    _add(index, 1, [("c1", "bolo de cenoura", "d1")])
+    assert len(index.search(1, "bolo", 5)) == 1
+
+    _add(index, 1, [("c2", "bolo de chocolate", "d2")])
+    assert len(index.search(1, "bolo", 5)) == 2
+
+
+def test_rebuild_replaces_table(index):
+    _add(index, 1, [("old", "bolo antigo", "d0")])
+
+    index.rebuild(1, ["c1", "c2"], ["bolo novo", "café"], [{"document_id": "d1"}, {"document_id": "d1"}])
+
+    assert [result["id"] for result in index.search(1, "bolo", 5)] == ["c1"]
+    tables = {
+        row[0] for row in index._reader().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'persona_1_chunks%'")
+    }
+    assert "persona_1_chunks_rebuild" not in tables
+
+
+def test_rebuild_with_no_chunks_creates_empty_table(index):
+    index.rebuild(2, [], [], [])
+
+    assert index.has_persona(2)
+    assert index.search(2, "bolo", 5) == []
+
+
+def test_deletes(index, monkeypatch):
+    monkeypatch.setattr(lexical_index_module, "WRITE_BATCH_SIZE", 2)
+    _add(index, 1, [
+        ("c1", "bolo um", "d1"),
+        ("c2", "bolo dois", "d1"),
+        ("c3", "bolo três", "d2"),
+        ("c4", "bolo quatro", "d3"),
+    ])
+
+    assert index.delete_document(1, "d1") == 2
+    index.delete_ids(1, ["c3", "c4", "inexistente"])
+    assert index.search(1, "bolo", 5) == []
+
+    index.drop_persona(1)
+    assert not index.has_persona(1)
+
+
+def test_reader_per_thread(index):
+    _add(index, 1, [("c1", "bolo", "d1")])
+    readers = set()
+    # Threads vivas ao mesmo tempo (idents distintos)
+    barrier = threading.Barrier(3)
+
+    def search():
+        index.search(1, "bolo", 5)
+        readers.add(id(index._reader()))
+        barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=search) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(readers) == 3
+    assert id(index._writer) not in readers
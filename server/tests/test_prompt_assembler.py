@@ -0,0 +1,82 @@
+"""
+Testes do orçamento de tokens do prompt.
+"""
+
+import pytest
+
+from src.core.config import settings
+from src.services.prompt_assembler import PromptAssembler, estimate_tokens, truncate_to_tokens
+
+
+@pytest.fixture
+def window(monkeypatch):
+    monkeypatch.setattr(settings, "AI_CONTEXT_WINDOW_TOKENS", 1000)
+    monkeypatch.setattr(settings, "MAX_TOKENS", 200)
+    monkeypatch.setattr(settings, "RAG_CONTEXT_MAX_TOKENS", 500)
+    monkeypatch.setattr(settings, "RAG_MIN_CHUNK_TOKENS", 10)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    # Olá (1) , (1) mundo (2) ! (1)
+    assert estimate_tokens("Olá, mundo!") == 5
+    assert estimate_tokens("#marketing") == 4
+
+
+def test_truncate_keeps_short_text():
+    assert truncate_to_tokens("Texto curto.", 10) == "Texto curto."
+    assert truncate_to_tokens("Qualquer texto", 0) == ""
+
+
+def test_truncate_fits_budget_and_prefers_sentence_end():
+    text = "Primeira frase completa aqui. Segunda frase que vai ser cortada no meio do caminho"
+    truncated = truncate_to_tokens(text, 12)
+
+    assert truncated == "Primeira frase completa aqui.…"
+    assert estimate_tokens(truncated) <= 12
+
+
+@pytest.mark.parametrize("max_tokens", [1, 2, 5, 13, 40])
+def test_truncate_never_exceeds_budget(max_tokens):
+    text = "Uma legenda longa, com vírgulas; pontuação e palavras compridíssimas " * 10
+
+    assert estimate_tokens(truncate_to_tokens(text, max_tokens)) <= max_tokens
+
+
+def test_rag_budget_subtracts_prompt_response_and_reserved(window):
+    assembler = PromptAssembler()
+    base = "palavra " * 100
+
+    assert assembler.rag_budget(base) == 500
+    assert assembler.rag_budget(base, reserved_tokens=350) == 1000 - 200 - 200 - 350
+
+
+def test_rag_budget_never_negative(window):
+    assert PromptAssembler().rag_budget("palavra " * 1000) == 0
+
+
+def test_select_chunks_fills_budget_and_truncates_last(window):
+    assembler = PromptAssembler()
+    docs = [
+        {"content": "um " * 30},
+        {"content": ""},
+        {"content": "dois " * 30},
+        {"content": "tres " * 100},
+        {"content": "quatro " * 5},
+    ]
+
+    selected = assembler.select_chunks(docs, budget_tokens=120)
+
+    assert [doc for doc, _ in selected] == [docs[0], docs[2], docs[3]]
+    used = sum(estimate_tokens(content) + assembler.CHUNK_HEADER_TOKENS for _, content in selected)
+    assert used <= 120
+    assert selected[2][1].endswith("…")
+
+
+def test_select_chunks_drops_too_small_remainder(window):
+    assembler = PromptAssembler()
+    docs = [{"content": "um " * 30}, {"content": "dois " * 100}]
+
+    selected = assembler.select_chunks(docs, budget_tokens=50)
+
+    assert [doc for doc, _ in selected] == [docs[0]]
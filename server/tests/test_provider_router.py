@@ -0,0 +1,269 @@
+"""
+Testes do roteamento entre providers de texto: fallback, hedge, circuit
+breaker e exploração de providers pouco amostrados.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import pytest
+
+from src.core.config import settings
+from src.services import provider_router as provider_router_module
+from src.services.circuit_breaker import CircuitBreaker
+from src.services.provider_router import ProviderRouter, ProviderUnavailableError
+from src.services.text_providers import TextProvider
+
+
+class FakeProvider(TextProvider):
+    """Provider com atraso e falha configuráveis"""
+
+    def __init__(self, name: str, delay: float = 0.0, error: Optional[Exception] = None):
+        self.name = name
+        super().__init__()
+        self.model_name = "fake"
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    @property
+    def max_concurrency(self) -> int:
+        return 10
+
+    async def _generate(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None) -> str:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return f"{self.name}: {prompt}"
+
+
+@pytest.fixture(autouse=True)
+def router_settings(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_ENABLED", False)
+    monkeypatch.setattr(settings, "AI_HEDGE_DELAY_MS", 0)
+    monkeypatch.setattr(settings, "AI_ROUTER_EXPLORE_RATE", 0.0)
+    monkeypatch.setattr(settings, "AI_ROUTER_MIN_SAMPLES", 5)
+    monkeypatch.setattr(settings, "AI_ROUTER_STALE_SECONDS", 300.0)
+    monkeypatch.setattr(settings, "AI_BREAKER_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "AI_BREAKER_RECOVERY_SECONDS", 30.0)
+    monkeypatch.setattr(settings, "AI_FALLBACK_ORDER", "")
+
+
+def _router(*providers: FakeProvider) -> ProviderRouter:
+    return ProviderRouter({provider.name: provider for provider in providers}, providers[0].name)
+
+
+async def test_primary_answers():
+    primary, backup = FakeProvider("a"), FakeProvider("b")
+    router = _router(primary, backup)
+
+    text, provider = await router.generate("oi")
+
+    assert (text, provider) == ("a: oi", primary)
+    assert backup.calls == 0
+
+
+async def test_falls_back_when_primary_fails():
+    primary, backup = FakeProvider("a", error=RuntimeError("500")), FakeProvider("b")
+    router = _router(primary, backup)
+
+    text, provider = await router.generate("oi")
+
+    assert provider is backup
+    assert router.stats["a"].error_rate == 1.0
+    assert router.stats["b"].error_rate == 0.0
+
+
+async def test_all_providers_failing_raises():
+    router = _router(
+        FakeProvider("a", error=RuntimeError("500")),
+        FakeProvider("b", error=RuntimeError("503")),
+    )
+
+    with pytest.raises(ProviderUnavailableError) as error:
+        await router.generate("oi")
+    assert str(error.value.__cause__) == "503"
+
+
+async def test_open_circuit_is_skipped(monkeypatch):
+    monkeypatch.setattr(settings, "AI_BREAKER_FAILURE_THRESHOLD", 1)
+    primary, backup = FakeProvider("a", error=RuntimeError("500")), FakeProvider("b")
+    router = _router(primary, backup)
+
+    await router.generate("oi")
+    assert router.breakers["a"].state == CircuitBreaker.OPEN
+    assert router.fallback_chain() == [backup]
+
+    await router.generate("oi")
+    assert primary.calls == 1
+
+
+async def test_configured_fallback_order(monkeypatch):
+    monkeypatch.setattr(settings, "AI_FALLBACK_ORDER", "a,c,b")
+    a, b, c = FakeProvider("a"), FakeProvider("b"), FakeProvider("c")
+    router = _router(a, b, c)
+
+    assert router.fallback_chain() == [a, c, b]
+
+
+async def test_ranking_prefers_faster_healthy_provider():
+    a, b = FakeProvider("a"), FakeProvider("b")
+    router = _router(a, b)
+    for _ in range(5):
+        router.stats["a"].record(0.9, True)
+        router.stats["b"].record(0.1, True)
+
+    assert router.ranked() == [b, a]
+
+    # Taxa de erro acima de AI_ROUTER_MAX_ERROR_RATE: vai para o fim
+    for _ in range(10):
+        router.stats["b"].record(0.1, False)
+    assert router.ranked() == [a, b]
+
+
+async def test_hedge_fires_backup_when_primary_is_slow(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "AI_HEDGE_DELAY_MS", 50)
+    primary, backup = FakeProvider("a", delay=5.0), FakeProvider("b")
+    router = _router(primary, backup)
+
+    started = time.perf_counter()
+    text, provider = await router.generate("oi")
+
+    assert provider is backup
+    assert time.perf_counter() - started < 1.0
+    await asyncio.sleep(0)
+    # A requisição perdedora é cancelada sem contar como falha do provider
+    assert primary.cancelled
+    assert len(router.stats["a"].outcomes) == 0
+
+
+async def test_hedge_keeps_primary_when_it_answers_in_time(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "AI_HEDGE_DELAY_MS", 500)
+    primary, backup = FakeProvider("a", delay=0.01), FakeProvider("b")
+    router = _router(primary, backup)
+
+    _, provider = await router.generate("oi")
+
+    assert provider is primary
+    assert backup.calls == 0
+
+
+async def test_hedge_starts_backup_immediately_when_primary_fails_early(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "AI_HEDGE_DELAY_MS", 5000)
+    primary = FakeProvider("a", error=RuntimeError("500"))
+    backup = FakeProvider("b")
+    router = _router(primary, backup)
+
+    started = time.perf_counter()
+    text, provider = await router.generate("oi")
+
+    # Sem esperar o atraso de hedge, e o primário não é tentado de novo
+    assert provider is backup
+    assert time.perf_counter() - started < 1.0
+    assert (primary.calls, backup.calls) == (1, 1)
+
+
+async def test_hedge_failure_continues_with_untried_providers(monkeypatch):
+    monkeypatch.setattr(settings, "AI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "AI_HEDGE_DELAY_MS", 10)
+    a = FakeProvider("a", error=RuntimeError("500"))
+    b = FakeProvider("b", error=RuntimeError("503"))
+    c = FakeProvider("c")
+    router = _router(a, b, c)
+
+    _, provider = await router.generate("oi")
+
+    assert provider is c
+    assert (a.calls, b.calls, c.calls) == (1, 1, 1)
+
+
+async def test_cancelled_call_releases_half_open_probe(monkeypatch):
+    primary = FakeProvider("a", delay=5.0)
+    router = _router(primary, FakeProvider("b"))
+    breaker = router.breakers["a"]
+    breaker._state = CircuitBreaker.HALF_OPEN
+
+    task = asyncio.create_task(router._call(primary, "oi"))
+    await asyncio.sleep(0.01)
+    assert not breaker.is_available()
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert breaker.is_available()
+
+
+async def test_exploration_sends_request_to_unsampled_provider(monkeypatch):
+    monkeypatch.setattr(settings, "AI_ROUTER_EXPLORE_RATE", 1.0)
+    a, b, c = FakeProvider("a"), FakeProvider("b"), FakeProvider("c")
+    router = _router(a, b, c)
+    for _ in range(10):
+        router.stats["a"].record(0.1, True)
+        router.stats["b"].record(0.2, True)
+
+    assert router.fallback_chain() == [a, b, c]
+    assert router.fallback_chain(explore=True) == [c, a, b]
+
+    _, provider = await router.generate("oi")
+    assert provider is c
+
+
+async def test_exploration_revisits_stale_provider(monkeypatch):
+    monkeypatch.setattr(settings, "AI_ROUTER_EXPLORE_RATE", 1.0)
+    a, b = FakeProvider("a"), FakeProvider("b")
+    router = _router(a, b)
+    for _ in range(10):
+        router.stats["a"].record(0.1, True)
+        router.stats["b"].record(0.2, True)
+
+    assert router.fallback_chain(explore=True) == [a, b]
+
+    router.stats["b"].last_sample_at = time.monotonic() - 301
+    assert router.fallback_chain(explore=True) == [b, a]
+
+
+async def test_exploration_respects_rate_and_health(monkeypatch):
+    a, b = FakeProvider("a"), FakeProvider("b")
+    router = _router(a, b)
+    for _ in range(10):
+        router.stats["a"].record(0.1, True)
+
+    monkeypatch.setattr(provider_router_module.random, "random", lambda: 0.5)
+    monkeypatch.setattr(settings, "AI_ROUTER_EXPLORE_RATE", 0.4)
+    assert router.fallback_chain(explore=True) == [a, b]
+
+    monkeypatch.setattr(settings, "AI_ROUTER_EXPLORE_RATE", 0.6)
+    assert router.fallback_chain(explore=True) == [b, a]
+
+    # Provider com muitas falhas não é explorado, mesmo sem amostras recentes
+    for _ in range(5):
+        router.stats["b"].record(0.1, False)
+    router.stats["b"].last_sample_at = time.monotonic() - 301
+    assert router.fallback_chain(explore=True) == [a, b]
+
+
+async def test_health_requires_min_samples(monkeypatch):
+    monkeypatch.setattr(settings, "AI_ROUTER_MIN_SAMPLES", 10)
+    a, b = FakeProvider("a"), FakeProvider("b")
+    router = _router(a, b)
+    for _ in range(10):
+        router.stats["a"].record(0.5, True)
+    for _ in range(8):
+        router.stats["b"].record(0.1, False)
+    router.stats["b"].record(0.1, True)
+
+    # Com menos de AI_ROUTER_MIN_SAMPLES amostras a taxa de erro ainda não conta
+    assert router.ranked() == [b, a]
+
+    router.stats["b"].record(0.1, False)
+    assert router.ranked() == [a, b]
@@ -0,0 +1,97 @@
+"""
+Testes da coalescência de requisições idênticas (single-flight).
+"""
+
+import asyncio
+
+import pytest
+
+from src.services.single_flight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"caption": "legenda"}
+
+    callers = [asyncio.create_task(flight.run("key", factory)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert flight.in_flight == 1
+
+    release.set()
+    outcomes = await asyncio.gather(*callers)
+
+    assert calls == 1
+    assert [shared for _, shared in outcomes] == [False, True, True]
+    results = [result for result, _ in outcomes]
+    assert all(result == {"caption": "legenda"} for result in results)
+    # Cada chamador recebe a sua cópia
+    assert len({id(result) for result in results}) == 3
+    assert flight.in_flight == 0
+
+
+async def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def factory(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    results = await asyncio.gather(
+        flight.run("a", lambda: factory("a")),
+        flight.run("b", lambda: factory("b")),
+    )
+
+    assert sorted(calls) == ["a", "b"]
+    assert results == [("a", False), ("b", False)]
+
+
+async def test_exception_reaches_every_caller_and_key_is_released():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise ValueError("falhou")
+
+    callers = [asyncio.create_task(flight.run("key", failing)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+
+    outcomes = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flight.in_flight == 0
+
+    async def succeeding():
+        return "ok"
+
+    # Depois da falha, a próxima chamada executa de novo
+    assert await flight.run("key", succeeding) == ("ok", False)
+
+
+async def test_cancelled_caller_does_not_cancel_shared_execution():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def factory():
+        await release.wait()
+        return "ok"
+
+    first = asyncio.create_task(flight.run("key", factory))
+    second = asyncio.create_task(flight.run("key", factory))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+    release.set()
+    assert await second == ("ok", True)
@@ -0,0 +1,116 @@
+"""
+Testes do registro de uso: gravação em segundo plano e upsert dos
+contadores agregados (usage_rollups).
+"""
+
+from datetime import datetime
+from itertools import count
+
+import pytest
+
+from src.core.database import SessionLocal, create_tables
+from src.models.generation_history import GenerationRecord, UsageRollup
+from src.services.usage_tracker import UsageTracker, period_buckets
+
+# Usuários distintos por teste (o banco de testes é compartilhado)
+_user_ids = count(1000)
+
+
+@pytest.fixture
+def tracker():
+    create_tables()
+    tracker = UsageTracker()
+    yield tracker
+    tracker.shutdown()
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _rollups(db, scope: str, scope_id: int):
+    rows = db.query(UsageRollup).filter_by(scope=scope, scope_id=scope_id).all()
+    return {(row.period, row.generation_type): row for row in rows}
+
+
+def test_period_buckets():
+    assert period_buckets(datetime(2025, 1, 31, 12)) == {
+        "day": "2025-01-31",
+        "week": "2025-W05",
+        "month": "2025-01",
+        "all": "all",
+    }
+
+
+def test_rollup_is_created_then_incremented(tracker, db):
+    user_id = next(_user_ids)
+
+    tracker.record(user_id, "caption", persona_id=user_id, prompt_tokens=100,
+                   output_tokens=20, latency_seconds=1.5)
+    tracker.record(user_id, "caption", persona_id=user_id, prompt_tokens=50,
+                   output_tokens=10, cached=True, latency_seconds=0.5)
+    tracker.record(user_id, "ideas", items=5, latency_seconds=2.0)
+
+    user_rollups = _rollups(db, "user", user_id)
+    assert {period for period, _ in user_rollups} == {"day", "week", "month", "all"}
+
+    caption = user_rollups[("all", "caption")]
+    assert caption.count == 2
+    assert caption.cached_count == 1
+    assert caption.items == 2
+    assert caption.total_latency_ms == 2000.0
+    assert caption.prompt_tokens == 150
+    assert caption.output_tokens == 30
+    assert caption.first_generated_at <= caption.last_generated_at
+
+    assert user_rollups[("day", "ideas")].items == 5
+    # Ideias sem persona só contam no escopo do usuário
+    persona_rollups = _rollups(db, "persona", user_id)
+    assert set(persona_rollups) == {(period, "caption") for period in ("day", "week", "month", "all")}
+    assert db.query(GenerationRecord).filter_by(user_id=user_id).count() == 3
+
+
+def test_summary_reads_current_buckets(tracker, db):
+    user_id = next(_user_ids)
+    for _ in range(3):
+        tracker.record(user_id, "hashtags", latency_seconds=0.2)
+
+    summary = tracker.summary(db, "user", user_id)
+
+    assert summary["totals"]["day"]["hashtags"] == 3
+    assert summary["totals"]["all"]["caption"] == 0
+    assert summary["by_type"]["hashtags"]["avg_latency_ms"] == 200.0
+    assert tracker.persona_counts(db, [user_id]) == {}
+
+
+async def test_records_in_event_loop_are_written_in_background(tracker, db):
+    user_id = next(_user_ids)
+
+    for index in range(5):
+        tracker.record(user_id, "caption", persona_id=user_id, latency_seconds=0.1 * (index + 1))
+    # record() só enfileira: nada foi gravado ainda
+    assert db.query(GenerationRecord).filter_by(user_id=user_id).count() == 0
+
+    await tracker.flush()
+
+    assert db.query(GenerationRecord).filter_by(user_id=user_id).count() == 5
+    rollup = _rollups(db, "persona", user_id)[("all", "caption")]
+    assert rollup.count == 5
+    assert rollup.total_latency_ms == pytest.approx(1500.0)
+    assert tracker.persona_counts(db, [user_id]) == {user_id: 5}
+
+
+def test_failed_batch_is_retried_one_by_one(tracker, db):
+    user_id = next(_user_ids)
+    valid = dict(user_id=user_id, persona_id=None, generation_type="caption", topic=None,
+                 provider=None, latency_ms=10.0, prompt_tokens=0, output_tokens=0, items=1,
+                 cached=False, created_at=datetime.utcnow())
+    invalid = {**valid, "created_at": "ontem"}
+
+    tracker._write_many([valid, invalid, dict(valid)])
+
+    assert db.query(GenerationRecord).filter_by(user_id=user_id).count() == 2
+    assert _rollups(db, "user", user_id)[("all", "caption")].count == 2
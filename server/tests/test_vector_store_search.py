@@ -0,0 +1,102 @@
+"""
+Testes da busca híbrida do banco vetorial: fusão por reciprocal rank fusion
+e queda para a busca só vetorial. As duas buscas são substituídas por listas
+fixas; ChromaDB e o modelo de embeddings não são usados.
+"""
+
+import pytest
+
+from src.core.config import settings
+from src.services.vector_store import VectorStoreService
+
+
+def _doc(chunk_id: str, **fields):
+    return {"id": chunk_id, "content": f"conteúdo {chunk_id}", "metadata": {}, **fields}
+
+
+VECTOR = [_doc("x", distance=0.1), _doc("y", distance=0.2), _doc("z", distance=0.3)]
+LEXICAL = [_doc("z", bm25=7.5), _doc("w", bm25=3.1)]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(settings, "RRF_K", 60)
+    monkeypatch.setattr(settings, "HYBRID_CANDIDATES", 20)
+    service = VectorStoreService()
+    calls = {"vector": [], "lexical": []}
+
+    async def get_or_create_collection(persona_id):
+        return object()
+
+    async def vector_search(collection, query, n_results, filter_metadata):
+        calls["vector"].append(n_results)
+        return [dict(doc) for doc in VECTOR]
+
+    async def lexical_search(persona_id, collection, query, n_results, filter_metadata):
+        calls["lexical"].append(n_results)
+        return [dict(doc) for doc in LEXICAL]
+
+    monkeypatch.setattr(service, "get_or_create_collection", get_or_create_collection)
+    monkeypatch.setattr(service, "_vector_search", vector_search)
+    monkeypatch.setattr(service, "_lexical_search", lexical_search)
+    service.calls = calls
+    return service
+
+
+def test_rrf_ranks_chunks_found_by_both_searches_first(service):
+    fused = service._reciprocal_rank_fusion({"vector": VECTOR, "lexical": LEXICAL}, 10)
+
+    assert [doc["id"] for doc in fused] == ["z", "x", "y", "w"]
+    assert fused[0]["sources"] == ["vector", "lexical"]
+    assert fused[0]["rrf_score"] == round(1 / 63 + 1 / 61, 6)
+    # Campos de cada busca são preservados
+    assert fused[0]["distance"] == 0.3
+    assert fused[0]["bm25"] == 7.5
+    assert fused[3]["sources"] == ["lexical"]
+
+
+def test_rrf_limits_results(service):
+    fused = service._reciprocal_rank_fusion({"vector": VECTOR, "lexical": LEXICAL}, 2)
+
+    assert [doc["id"] for doc in fused] == ["z", "x"]
+
+
+def test_rrf_uses_content_without_id(service):
+    fused = service._reciprocal_rank_fusion(
+        {"vector": [{"content": "a"}], "lexical": [{"content": "a"}, {"content": "b"}]}, 5)
+
+    assert [doc["content"] for doc in fused] == ["a", "b"]
+    assert fused[0]["sources"] == ["vector", "lexical"]
+
+
+async def test_hybrid_search_fuses_both_legs(service):
+    result = await service.search(1, "promoção de verão", n_results=3, mode="hybrid")
+
+    assert result["mode"] == "hybrid"
+    assert [doc["id"] for doc in result["results"]] == ["z", "x", "y"]
+    # Cada busca traz HYBRID_CANDIDATES candidatos antes da fusão
+    assert service.calls == {"vector": [20], "lexical": [20]}
+    assert {"vector", "lexical", "fusion", "total"} <= set(result["timings_ms"])
+
+
+async def test_vector_mode_skips_lexical(service):
+    result = await service.search(1, "promoção", n_results=2, mode="vector")
+
+    assert [doc["id"] for doc in result["results"]] == ["x", "y", "z"]
+    assert service.calls == {"vector": [2], "lexical": []}
+
+
+async def test_lexical_failure_falls_back_to_vectors(service, monkeypatch):
+    async def broken_lexical(*args):
+        raise RuntimeError("índice corrompido")
+
+    monkeypatch.setattr(service, "_lexical_search", broken_lexical)
+    result = await service.search(1, "promoção", n_results=2, mode="hybrid")
+
+    assert [doc["id"] for doc in result["results"]] == ["x", "y"]
+    assert all(doc["sources"] == ["vector"] for doc in result["results"])
+
+
+async def test_invalid_mode_is_rejected(service):
+    with pytest.raises(ValueError):
+        await service.search(1, "promoção", mode="bm25")